@@ -47,4 +47,27 @@ class ResetPasswordRequest(BaseModel):
     new_password: str = Field(..., min_length=6, max_length=72)
 
 class TokenData(BaseModel):
-    email: EmailStr
\ No newline at end of file
+    email: EmailStr
+
+class PatientFeatures(BaseModel):
+    male: int = 0
+    age: int = 0
+    currentSmoker: int = 0
+    cigsPerDay: float = 0
+    BPMeds: int = 0
+    prevalentStroke: int = 0
+    prevalentHyp: int = 0
+    diabetes: int = 0
+    totChol: float = 0
+    sysBP: float = 0
+    diaBP: float = 0
+    BMI: float = 0
+    glucose: float = 0
+    heart_rate: float
+
+class BatchPredictRequest(BaseModel):
+    patients: list[PatientFeatures] = Field(..., min_length=1, max_length=1000)
+
+class PatientSnapshotRequest(BaseModel):
+    user_ids: list[str] = Field(..., min_length=1, max_length=500)
+    include_features: bool = False
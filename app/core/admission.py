@@ -0,0 +1,235 @@
+import asyncio
+import json
+import math
+import os
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from app.core.metrics import Counter
+from app.core.securitycore import decode_token_email
+from jose import JWTError
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# admission control conf.
+# each expensive route group runs at most *_MAX_CONCURRENCY requests; up to *_QUEUE_SIZE more
+# wait (round-robin between clients) for at most ADMISSION_QUEUE_TIMEOUT seconds. Anything
+# beyond that is answered 503 + Retry-After straight away. Routes not listed are never queued.
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "true").lower() == "true"
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", 5.0))
+# how many requests one client may have waiting in a group's queue
+ADMISSION_PER_CLIENT_QUEUE = int(os.getenv("ADMISSION_PER_CLIENT_QUEUE", 4))
+PREDICT_MAX_CONCURRENCY = int(os.getenv("PREDICT_MAX_CONCURRENCY", 64))
+PREDICT_QUEUE_SIZE = int(os.getenv("PREDICT_QUEUE_SIZE", 128))
+ECG_MAX_CONCURRENCY = int(os.getenv("ECG_MAX_CONCURRENCY", 64))
+ECG_QUEUE_SIZE = int(os.getenv("ECG_QUEUE_SIZE", 128))
+PATIENTS_MAX_CONCURRENCY = int(os.getenv("PATIENTS_MAX_CONCURRENCY", 4))
+PATIENTS_QUEUE_SIZE = int(os.getenv("PATIENTS_QUEUE_SIZE", 8))
+
+ADMISSION_ROUTES = {
+    "/predict": "predict",
+    "/predict/stream": "predict",
+    "/ecg": "ecg",
+    "/ecg/stream": "ecg",
+    "/patients/snapshot": "patients",
+}
+
+admission_rejected_total = Counter(
+    "admission_rejected_total", "Requests or LLM calls turned away by admission control.", ("limiter", "reason")
+)
+
+# who the current request is for; used to queue fairly between clients
+client_key: ContextVar[str] = ContextVar("client_key", default="anonymous")
+
+
+class Overloaded(Exception):
+    def __init__(self, limiter: str, reason: str, retry_after: int):
+        super().__init__(f"{limiter} is overloaded ({reason})")
+        self.limiter = limiter
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class FairLimiter:
+    """At most `limit` holders at once, plus a bounded queue served round-robin per client.
+
+    A client can have at most `per_client` requests waiting, so one busy client
+    only ever delays itself. A full queue, or a wait longer than `timeout`,
+    raises Overloaded with a Retry-After estimate from recent hold times.
+    Event-loop only, no locking.
+    """
+
+    def __init__(self, name: str, limit: int, queue_size: int, timeout: float | None = None,
+                 per_client: int | None = None):
+        self.name = name
+        self.limit = limit
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.per_client = per_client
+        self.active = 0
+        self.queued = 0
+        self._waiters = OrderedDict()   # client -> deque of futures, in round-robin order
+        self._hold_ewma = 1.0
+        self.admitted = 0
+        self.rejected = 0
+
+    def retry_after(self) -> int:
+        # time for everything already queued to drain at the current service rate
+        return max(1, min(60, math.ceil((self.queued + 1) * self._hold_ewma / max(self.limit, 1))))
+
+    def _reject(self, reason: str):
+        self.rejected += 1
+        admission_rejected_total.inc(limiter=self.name, reason=reason)
+        raise Overloaded(self.name, reason, self.retry_after())
+
+    def _dequeue(self, key, future):
+        queue = self._waiters.get(key)
+        if queue is not None and future in queue:
+            queue.remove(future)
+            self.queued -= 1
+            if not queue:
+                del self._waiters[key]
+
+    async def acquire(self, key: str):
+        if self.active < self.limit and not self.queued:
+            self.active += 1
+            self.admitted += 1
+            return
+        if self.queued >= self.queue_size:
+            self._reject("queue_full")
+        if self.per_client is not None and len(self._waiters.get(key, ())) >= self.per_client:
+            self._reject("client_queue_full")
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(key, deque()).append(future)
+        self.queued += 1
+        try:
+            await asyncio.wait_for(future, self.timeout)
+        except BaseException as e:
+            if future.done() and not future.cancelled():
+                # the slot was handed over just as this waiter gave up
+                self.release(None)
+            else:
+                self._dequeue(key, future)
+            if isinstance(e, asyncio.TimeoutError):
+                self._reject("timeout")
+            raise
+        self.admitted += 1
+
+    def release(self, held: float | None):
+        if held is not None:
+            self._hold_ewma = 0.8 * self._hold_ewma + 0.2 * held
+        self.active -= 1
+        while self._waiters and self.active < self.limit:
+            key, queue = next(iter(self._waiters.items()))
+            future = queue.popleft()
+            self.queued -= 1
+            if queue:
+                self._waiters.move_to_end(key)
+            else:
+                del self._waiters[key]
+            if not future.done():
+                self.active += 1
+                future.set_result(None)
+
+    @asynccontextmanager
+    async def slot(self, key: str):
+        await self.acquire(key)
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(time.monotonic() - start)
+
+    def stats(self):
+        return {
+            "limit": self.limit,
+            "queue_size": self.queue_size,
+            "active": self.active,
+            "queued": self.queued,
+            "queued_clients": len(self._waiters),
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "mean_hold_s": round(self._hold_ewma, 4),
+        }
+
+
+route_limiters = {
+    "predict": FairLimiter("predict", PREDICT_MAX_CONCURRENCY, PREDICT_QUEUE_SIZE,
+                           ADMISSION_QUEUE_TIMEOUT, ADMISSION_PER_CLIENT_QUEUE),
+    "ecg": FairLimiter("ecg", ECG_MAX_CONCURRENCY, ECG_QUEUE_SIZE,
+                       ADMISSION_QUEUE_TIMEOUT, ADMISSION_PER_CLIENT_QUEUE),
+    "patients": FairLimiter("patients", PATIENTS_MAX_CONCURRENCY, PATIENTS_QUEUE_SIZE,
+                            ADMISSION_QUEUE_TIMEOUT, ADMISSION_PER_CLIENT_QUEUE),
+}
+
+
+def _client_of(scope):
+    # one fair share per verified user (the claims are cached, so this is a dict lookup after the
+    # first request); requests without a valid token all share one bucket, so rotating made-up
+    # tokens buys no extra queue slots
+    for name, value in scope.get("headers", ()):
+        if name == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            if scheme.lower() != "bearer" or not token:
+                break
+            try:
+                email = decode_token_email(token.strip())
+            except JWTError:
+                break
+            return f"user:{email}" if email else "anonymous"
+    return "anonymous"
+
+
+class AdmissionMiddleware:
+    """Pure ASGI middleware: queues or sheds requests to ADMISSION_ROUTES before they
+    reach the handler, and records the client for fair LLM queuing further down."""
+
+    def __init__(self, app, enabled: bool = ADMISSION_ENABLED):
+        self.app = app
+        self.enabled = enabled
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        key = _client_of(scope)
+        token = client_key.set(key)
+        try:
+            limiter = route_limiters.get(ADMISSION_ROUTES.get(scope["path"])) if self.enabled else None
+            if limiter is None:
+                await self.app(scope, receive, send)
+                return
+            try:
+                await limiter.acquire(key)
+            except Overloaded as e:
+                await _send_overloaded(send, e)
+                return
+            start = time.monotonic()
+            try:
+                await self.app(scope, receive, send)
+            finally:
+                limiter.release(time.monotonic() - start)
+        finally:
+            client_key.reset(token)
+
+
+async def _send_overloaded(send, error: Overloaded):
+    body = json.dumps({"detail": "Server busy, please retry shortly"}).encode()
+    await send({
+        "type": "http.response.start",
+        "status": 503,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(error.retry_after).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+def admission_stats():
+    return {name: limiter.stats() for name, limiter in route_limiters.items()}
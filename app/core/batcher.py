@@ -0,0 +1,105 @@
+import asyncio
+import time
+
+
+class MicroBatcher:
+    """Collects concurrent single-row scoring calls into one vectorized call.
+
+    The first waiting request opens a window of `window_ms`; everything that
+    arrives before it closes (or until `max_batch` rows are queued) is scored
+    together by `batch_fn(users, heart_rates)`, which must return one result
+    per row in order.
+    """
+
+    def __init__(self, batch_fn, max_batch: int = 64, window_ms: float = 2.0):
+        self.batch_fn = batch_fn
+        self.max_batch = max_batch
+        self.window = window_ms / 1000
+        self._queue = None
+        self._worker = None
+        self._loop = None
+        self.batches = 0
+        self.items = 0
+        self.max_batch_seen = 0
+        self.last_batch_size = 0
+        self.batch_size_counts = {}
+
+    def _ensure_worker(self):
+        loop = asyncio.get_running_loop()
+        if self._worker is None or self._worker.done() or self._loop is not loop:
+            self._queue = asyncio.Queue()
+            self._loop = loop
+            self._worker = loop.create_task(self._run())
+
+    async def submit(self, user_data: dict, heart_rate: float):
+        if self.window <= 0 or self.max_batch <= 1:
+            return self.batch_fn([user_data], [heart_rate])[0]
+        self._ensure_worker()
+        future = self._loop.create_future()
+        self._queue.put_nowait((user_data, heart_rate, future))
+        return await future
+
+    async def _run(self):
+        queue = self._queue
+        while True:
+            batch = [await queue.get()]
+            deadline = time.monotonic() + self.window
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(queue.get(), timeout=remaining))
+                except asyncio.TimeoutError:
+                    break
+            self._score(batch)
+
+    def _score(self, batch):
+        # callers that were cancelled while waiting are dropped before scoring
+        batch = [item for item in batch if not item[2].done()]
+        if not batch:
+            return
+        try:
+            results = self.batch_fn([item[0] for item in batch], [item[1] for item in batch])
+        except Exception as e:
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, _, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+        size = len(batch)
+        self.batches += 1
+        self.items += size
+        self.last_batch_size = size
+        self.max_batch_seen = max(self.max_batch_seen, size)
+        self.batch_size_counts[size] = self.batch_size_counts.get(size, 0) + 1
+
+    def metrics(self):
+        return {
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "window_ms": self.window * 1000,
+            "max_batch": self.max_batch,
+            "batches": self.batches,
+            "items": self.items,
+            "mean_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0,
+            "max_batch_size": self.max_batch_seen,
+            "last_batch_size": self.last_batch_size,
+            "batch_size_counts": dict(sorted(self.batch_size_counts.items())),
+        }
+
+    async def close(self):
+        if self._worker is not None and not self._worker.done():
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+        while self._queue is not None and not self._queue.empty():
+            _, _, future = self._queue.get_nowait()
+            if not future.done():
+                future.cancel()
+        self._worker = None
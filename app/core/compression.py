@@ -0,0 +1,91 @@
+import gzip
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# response compression conf.
+# RESPONSE_COMPRESSION: "off" (default), "gzip", or "br" (brotli, preferred when the client
+# accepts it; needs `pip install brotli` and falls back to gzip without it)
+RESPONSE_COMPRESSION = os.getenv("RESPONSE_COMPRESSION", "off").lower()
+# bodies smaller than this are sent as they are; compressing them costs more than it saves
+RESPONSE_COMPRESSION_MIN_SIZE = int(os.getenv("RESPONSE_COMPRESSION_MIN_SIZE", 1024))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", 6))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", 4))
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def _accepted(scope):
+    for name, value in scope.get("headers", ()):
+        if name == b"accept-encoding":
+            return {part.split(";")[0].strip() for part in value.decode("latin-1").lower().split(",")}
+    return set()
+
+
+class CompressionMiddleware:
+    """Pure ASGI middleware: gzip/brotli for complete response bodies above min_size.
+
+    Streamed responses (SSE, anything sent in several chunks) pass through
+    untouched, so events are never held back waiting for a buffer to fill.
+    """
+
+    def __init__(self, app, encoding: str = RESPONSE_COMPRESSION, min_size: int = RESPONSE_COMPRESSION_MIN_SIZE):
+        self.app = app
+        self.min_size = min_size
+        self.encodings = ("br", "gzip") if encoding == "br" and brotli is not None else ("gzip",)
+        if encoding == "br" and brotli is None:
+            print("[WARN] brotli is not installed; compressing responses with gzip only")
+
+    def _compress(self, body: bytes, encoding: str) -> bytes:
+        if encoding == "br":
+            return brotli.compress(body, quality=BROTLI_QUALITY)
+        return gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        accepted = _accepted(scope)
+        encoding = next((e for e in self.encodings if e in accepted), None)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start = None
+
+        async def send_compressed(message):
+            nonlocal start
+            if message["type"] == "http.response.start":
+                # held until the first body chunk shows whether this is worth compressing
+                start = message
+                return
+            if message["type"] != "http.response.body" or start is None:
+                await send(message)
+                return
+
+            response_start, start = start, None
+            body = message.get("body", b"")
+            headers = dict(response_start.get("headers", ()))
+            if (message.get("more_body", False) or len(body) < self.min_size
+                    or b"content-encoding" in headers
+                    or headers.get(b"content-type", b"").startswith(b"text/event-stream")):
+                await send(response_start)
+                await send(message)
+                return
+
+            compressed = self._compress(body, encoding)
+            raw = [(k, v) for k, v in response_start.get("headers", ()) if k not in (b"content-length", b"vary")]
+            vary = headers.get(b"vary")
+            raw += [
+                (b"content-encoding", encoding.encode()),
+                (b"content-length", str(len(compressed)).encode()),
+                (b"vary", vary + b", Accept-Encoding" if vary else b"Accept-Encoding"),
+            ]
+            await send({**response_start, "headers": raw})
+            await send({**message, "body": compressed})
+
+        await self.app(scope, receive, send_compressed)
@@ -0,0 +1,138 @@
+import os
+from datetime import datetime
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.errors import OperationFailure, PyMongoError
+from app.core.scorer import PROFILE_FEATURES
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# MongoDB connection (one pooled client per process, opened in the app lifespan)
+MONGO_URL = os.getenv("MONGO_URL")
+DB_NAME = os.getenv("DB_NAME")
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", 100))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", 10))
+MONGO_MAX_IDLE_TIME_MS = int(os.getenv("MONGO_MAX_IDLE_TIME_MS", 60000))
+MONGO_TIMEOUT_MS = int(os.getenv("MONGO_TIMEOUT_MS", 5000))
+
+_client: AsyncIOMotorClient | None = None
+
+
+async def connect_to_mongo():
+    global _client
+    if _client is not None:
+        return _client
+    _client = AsyncIOMotorClient(
+        MONGO_URL,
+        maxPoolSize=MONGO_MAX_POOL_SIZE,
+        minPoolSize=MONGO_MIN_POOL_SIZE,
+        maxIdleTimeMS=MONGO_MAX_IDLE_TIME_MS,
+        serverSelectionTimeoutMS=MONGO_TIMEOUT_MS,
+        connectTimeoutMS=MONGO_TIMEOUT_MS,
+        retryWrites=True,
+    )
+    print(f"[INFO] MongoDB client ready (pool {MONGO_MIN_POOL_SIZE}-{MONGO_MAX_POOL_SIZE})")
+    return _client
+
+
+def close_mongo_connection():
+    global _client
+    if _client is not None:
+        _client.close()
+        _client = None
+        print("[INFO] MongoDB client closed")
+
+
+def get_db():
+    if _client is None:
+        raise RuntimeError("MongoDB client is not initialised; connect_to_mongo() must run at startup")
+    return _client[DB_NAME]
+
+
+def users_collection():
+    return get_db()["users"]
+
+
+# per use case projections, so each read only ships the fields the route needs
+# (in particular the bcrypt hash never leaves Mongo except for /login)
+# the risk job's bookkeeping stays in Mongo; profile_updated_at is loaded for Last-Modified
+# but is not part of the profile returned to the user (see USER_RESPONSE_EXCLUDED)
+USER_PUBLIC_PROJECTION = {"password": 0, "risk_fingerprint": 0, "risk_scored_at": 0}
+USER_RESPONSE_EXCLUDED = ("profile_updated_at",)
+USER_HASH_PROJECTION = {"password": 1}
+USER_EXISTS_PROJECTION = {"_id": 1}
+USER_FEATURE_PROJECTION = {field: 1 for field in PROFILE_FEATURES}
+
+
+# set once the unique email index is confirmed; until then registration checks for duplicates itself
+_email_index_ready = False
+# duplicate key, and an existing index on email with other options or another name
+_INDEX_CONFLICT_CODES = {11000, 85, 86}
+
+
+def email_index_ready() -> bool:
+    return _email_index_ready
+
+
+async def ensure_indexes():
+    # email is the lookup key of every request; unique also makes registration race-free
+    global _email_index_ready
+    try:
+        await users_collection().create_index("email", unique=True, name="email_unique")
+        _email_index_ready = True
+        print("[INFO] Users index on email ensured")
+    except OperationFailure as e:
+        if e.code in _INDEX_CONFLICT_CODES:
+            # existing duplicate emails or a clashing index; nothing would enforce uniqueness, so refuse to start
+            raise RuntimeError(f"Could not create unique index on users.email: {e}") from e
+        # typically a database user without the createIndex privilege; the index may already be in place
+        print(f"[WARN] Could not create users index on email ({e.code}): {e}")
+        _email_index_ready = await _has_unique_email_index()
+        if _email_index_ready:
+            print("[INFO] Existing unique index on users.email found")
+        else:
+            print("[ERROR] No unique index on users.email; registration checks for duplicates itself")
+    except PyMongoError as e:
+        # Mongo unreachable at boot: serve anyway (requests fail until it is back) and let
+        # registration fall back to an explicit duplicate check; retried on next start
+        print(f"[ERROR] Could not ensure users indexes, MongoDB unavailable: {type(e).__name__}")
+
+
+async def _has_unique_email_index() -> bool:
+    try:
+        indexes = await users_collection().index_information()
+    except PyMongoError as e:
+        print(f"[WARN] Could not list users indexes: {type(e).__name__}")
+        return False
+    return any(index.get("unique") and index.get("key") == [("email", 1)] for index in indexes.values())
+
+
+# user repository
+async def find_user_by_email(email: str, projection: dict | None = None):
+    return await users_collection().find_one({"email": email}, projection)
+
+
+async def find_users_by_ids(ids: list, projection: dict | None = None):
+    return await users_collection().find({"_id": {"$in": ids}}, projection).to_list(None)
+
+
+async def insert_user(user_doc: dict):
+    return await users_collection().insert_one(user_doc)
+
+
+async def update_user_by_email(email: str, fields: dict):
+    return await users_collection().update_one({"email": email}, {"$set": fields})
+
+
+async def update_profile_by_email(email: str, fields: dict):
+    # matches only if some field really changes, so modified_count stays 0 for no-op updates
+    # and profile_updated_at (what the risk job rescans by) is only bumped on real changes
+    changed = [{key: {"$ne": value}} for key, value in fields.items()]
+    return await users_collection().update_one(
+        {"email": email, "$or": changed},
+        {"$set": {**fields, "profile_updated_at": datetime.utcnow()}},
+    )
+
+
+async def delete_user_by_email(email: str):
+    return await users_collection().delete_one({"email": email})
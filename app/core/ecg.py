@@ -0,0 +1,192 @@
+import os
+import numpy as np
+
+# The device samples the AD8232 once per loop iteration (delay(20) in de.cpp), ~50 Hz
+ECG_SAMPLE_RATE = float(os.getenv("ECG_SAMPLE_RATE", 50))
+
+BRADYCARDIA_BPM = 60
+TACHYCARDIA_BPM = 100
+IRREGULAR_RR_CV = 0.15       # coefficient of variation of RR above which rhythm is irregular
+PAUSE_RR_S = 2.0
+REFRACTORY_S = 0.25          # no two R peaks closer than this (240 bpm)
+
+
+def _moving_average(x: np.ndarray, width: int) -> np.ndarray:
+    if width <= 1:
+        return x
+    c = np.cumsum(np.concatenate(([0.0], x)))
+    out = (c[width:] - c[:-width]) / width
+    # pad back to len(x), centred
+    left = (width - 1) // 2
+    return np.pad(out, (left, len(x) - len(out) - left), mode="edge")
+
+
+def bandpass(x: np.ndarray, fs: float, low: float = 0.5, high: float = 40.0) -> np.ndarray:
+    """Zero-phase FFT band-pass; also removes baseline wander below `low` Hz."""
+    n = len(x)
+    spectrum = np.fft.rfft(x - x.mean())
+    freqs = np.fft.rfftfreq(n, d=1.0 / fs)
+    spectrum[(freqs < low) | (freqs > min(high, fs / 2))] = 0
+    return np.fft.irfft(spectrum, n)
+
+
+def detect_r_peaks(filtered: np.ndarray, fs: float) -> np.ndarray:
+    """Pan-Tompkins style detector: derivative, squaring, window integration, thresholding."""
+    if len(filtered) < 3:
+        return np.empty(0, dtype=np.int64)
+    energy = np.diff(filtered, prepend=filtered[0]) ** 2
+    integrated = _moving_average(energy, max(1, int(round(0.15 * fs))))
+
+    mid = integrated[1:-1]
+    candidates = np.flatnonzero((mid > integrated[:-2]) & (mid >= integrated[2:])) + 1
+    if candidates.size == 0:
+        return candidates
+    threshold = 0.3 * np.percentile(integrated, 99)
+    candidates = candidates[integrated[candidates] > threshold]
+
+    # refractory period: of two candidates closer than REFRACTORY_S keep the stronger one
+    refractory = int(REFRACTORY_S * fs)
+    kept = []
+    for idx in candidates:
+        if kept and idx - kept[-1] < refractory:
+            if integrated[idx] > integrated[kept[-1]]:
+                kept[-1] = idx
+            continue
+        kept.append(idx)
+    if not kept:
+        return np.empty(0, dtype=np.int64)
+
+    # integration smears energy forward, so look back for the actual R maximum
+    search = max(1, int(0.1 * fs))
+    offsets = np.arange(-search, search + 1)
+    window = np.clip(np.asarray(kept)[:, None] + offsets[None, :], 0, len(filtered) - 1)
+    peaks = window[np.arange(len(kept)), np.argmax(filtered[window], axis=1)]
+    return np.unique(peaks)
+
+
+def analyze_ecg(samples, fs: float = ECG_SAMPLE_RATE, include_peaks: bool = False) -> dict:
+    x = np.asarray(samples, dtype=np.float64)
+    n = int(x.size)
+    result = {
+        "sample_rate_hz": fs,
+        "n_samples": n,
+        "duration_s": round(n / fs, 2) if fs else 0.0,
+        "r_peak_count": 0,
+        "heart_rate_bpm": None,
+        "rr_mean_ms": None,
+        "sdnn_ms": None,
+        "rmssd_ms": None,
+        "rhythm": "insufficient data",
+        "flags": {
+            "bradycardia": False,
+            "tachycardia": False,
+            "irregular_rhythm": False,
+            "possible_afib": False,
+            "pause": False,
+            "low_signal_quality": False,
+        },
+    }
+    if n < int(fs):
+        return result
+    if np.ptp(x) < 1e-6 or not np.isfinite(x).all():
+        result["flags"]["low_signal_quality"] = True
+        return result
+
+    filtered = bandpass(x, fs)
+    peaks = detect_r_peaks(filtered, fs)
+    result["r_peak_count"] = int(peaks.size)
+    if include_peaks:
+        result["r_peaks"] = peaks.tolist()
+    if peaks.size < 3:
+        return result
+
+    rr = np.diff(peaks) / fs
+    rr_mean = rr.mean()
+    sdnn = rr.std(ddof=1)
+    rmssd = np.sqrt(np.mean(np.diff(rr) ** 2))
+    hr = 60.0 / rr_mean
+    cv = sdnn / rr_mean
+
+    flags = result["flags"]
+    flags["bradycardia"] = bool(hr < BRADYCARDIA_BPM)
+    flags["tachycardia"] = bool(hr > TACHYCARDIA_BPM)
+    flags["irregular_rhythm"] = bool(cv > IRREGULAR_RR_CV)
+    flags["possible_afib"] = bool(flags["irregular_rhythm"] and rr.size >= 8)
+    flags["pause"] = bool((rr > PAUSE_RR_S).any())
+
+    if flags["possible_afib"]:
+        rhythm = "irregularly irregular (possible AFib)"
+    elif flags["irregular_rhythm"]:
+        rhythm = "irregular rhythm"
+    elif flags["bradycardia"]:
+        rhythm = "sinus bradycardia"
+    elif flags["tachycardia"]:
+        rhythm = "sinus tachycardia"
+    else:
+        rhythm = "normal sinus rhythm"
+
+    result.update({
+        "heart_rate_bpm": round(float(hr), 1),
+        "rr_mean_ms": round(float(rr_mean * 1000), 1),
+        "sdnn_ms": round(float(sdnn * 1000), 1),
+        "rmssd_ms": round(float(rmssd * 1000), 1),
+        "rhythm": rhythm,
+    })
+    return result
+
+
+# (offset s, width s, amplitude mV) for P, Q, R, S, T
+NORMAL_BEAT = np.array([
+    (-0.20, 0.025, 0.12),
+    (-0.03, 0.010, -0.15),
+    (0.00, 0.012, 1.00),
+    (0.03, 0.010, -0.25),
+    (0.25, 0.040, 0.30),
+])
+# premature ventricular beat: no P wave, wide tall QRS, discordant T
+PVC_BEAT = np.array([
+    (-0.04, 0.030, -0.30),
+    (0.02, 0.035, 1.30),
+    (0.30, 0.060, -0.40),
+])
+
+
+def synthesize_ecg(n_samples: int, fs: float = ECG_SAMPLE_RATE, heart_rate: float = 72.0,
+                   noise: float = 0.02, rr_jitter: float = 0.0, baseline_wander: float = 0.05,
+                   seed: int | None = None, pvc_rate: float = 0.0) -> np.ndarray:
+    """Synthetic P-QRS-T waveform (sum of Gaussians per beat) in millivolts.
+
+    `rr_jitter` is the relative standard deviation of RR intervals; values
+    around 0.2-0.3 give an AFib-like irregular rhythm. `pvc_rate` is the
+    fraction of beats replaced by premature ventricular contractions.
+    """
+    rng = np.random.default_rng(seed)
+    t = np.arange(n_samples) / fs
+    duration = n_samples / fs
+    rr_mean = 60.0 / heart_rate
+    count = int(duration / rr_mean * 1.5) + 2
+    rr = np.clip(rr_mean * (1 + rr_jitter * rng.standard_normal(count)), 0.3, 2.5)
+    beats = np.cumsum(rr) - rr[0] / 2
+    beats = beats[beats < duration + 1]
+    pvc = np.zeros(beats.size, dtype=bool)
+    if pvc_rate > 0:
+        pvc = rng.random(beats.size) < pvc_rate
+        # fires early; the next sinus beat stays put, leaving a compensatory pause
+        beats[pvc] -= 0.35 * rr_mean
+
+    signal = np.zeros(n_samples)
+    for beat_times, waves in ((beats[~pvc], NORMAL_BEAT), (beats[pvc], PVC_BEAT)):
+        if not beat_times.size:
+            continue
+        for offset, width, amp in waves:
+            centres = beat_times + offset
+            # only evaluate each wave within +-5 widths of its centre
+            span = int(np.ceil(5 * width * fs))
+            idx = np.round(centres * fs).astype(np.int64)[:, None] + np.arange(-span, span + 1)[None, :]
+            valid = (idx >= 0) & (idx < n_samples)
+            contrib = amp * np.exp(-0.5 * ((t[np.clip(idx, 0, n_samples - 1)] - centres[:, None]) / width) ** 2)
+            np.add.at(signal, idx[valid], contrib[valid])
+
+    signal += baseline_wander * np.sin(2 * np.pi * 0.3 * t)
+    signal += noise * rng.standard_normal(n_samples)
+    return signal
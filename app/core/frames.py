@@ -0,0 +1,93 @@
+import struct
+import numpy as np
+
+# Binary device frame (little-endian), many frames back to back per request:
+#
+#   magic      2s   b"HF"
+#   version    u8   1
+#   flags      u8   reserved, 0
+#   user_id    12s  raw ObjectId bytes (the 24-hex USER_ID in de.cpp)
+#   timestamp  u64  epoch milliseconds of the last ECG sample
+#   sample_hz  u16  ECG sample rate
+#   hr_x10     u16  heart rate * 10, 0 when there is no reading
+#   n_samples  u16  ECG sample count
+#   payload    i16 * n_samples: first sample, then n_samples - 1 deltas
+FRAME_MAGIC = b"HF"
+FRAME_VERSION = 1
+FRAME_HEADER = struct.Struct("<2sBB12sQHHH")
+
+
+class FrameError(ValueError):
+    pass
+
+
+def encode_frame(user_id: str, timestamp_ms: int, ecg, heart_rate: float | None = None, sample_hz: int = 50) -> bytes:
+    samples = np.asarray(ecg, dtype=np.int16)
+    payload = np.empty(samples.size, dtype="<i2")
+    if samples.size:
+        payload[0] = samples[0]
+        # int16 wrap-around is undone by the int16 cumsum on decode
+        payload[1:] = np.diff(samples).astype(np.int16)
+    hr_x10 = int(round(heart_rate * 10)) if heart_rate else 0
+    header = FRAME_HEADER.pack(FRAME_MAGIC, FRAME_VERSION, 0, bytes.fromhex(user_id), int(timestamp_ms),
+                               int(sample_hz), min(hr_x10, 0xFFFF), samples.size)
+    return header + payload.tobytes()
+
+
+def decode_frames(body: bytes):
+    """Yields (user_id, timestamp_ms, sample_hz, heart_rate, ecg) for every frame in `body`.
+
+    `ecg` is reconstructed from a zero-copy np.frombuffer view of the payload.
+    """
+    view = memoryview(body)
+    offset = 0
+    end = len(body)
+    while offset < end:
+        if end - offset < FRAME_HEADER.size:
+            raise FrameError(f"truncated frame header at byte {offset}")
+        magic, version, _, uid, ts, hz, hr_x10, n = FRAME_HEADER.unpack_from(view, offset)
+        if magic != FRAME_MAGIC or version != FRAME_VERSION:
+            raise FrameError(f"bad frame magic/version at byte {offset}")
+        if hz == 0:
+            raise FrameError(f"sample rate must be positive (frame at byte {offset})")
+        offset += FRAME_HEADER.size
+        if end - offset < 2 * n:
+            raise FrameError(f"truncated ECG payload at byte {offset}")
+        deltas = np.frombuffer(body, dtype="<i2", count=n, offset=offset)
+        offset += 2 * n
+        ecg = np.cumsum(deltas, dtype=np.int16)
+        yield uid.hex(), ts, hz, (hr_x10 / 10 if hr_x10 else None), ecg
+
+
+def group_frames(body: bytes):
+    """Decodes a request body and groups samples per user for batched writes.
+
+    Returns {user_id: {"frames", "hr_ts", "hr", "ecg_ts", "ecg", "latest"}} with NumPy
+    arrays sorted by timestamp, ready for a single Series.append per metric;
+    "latest" is the newest frame as (timestamp_ms, sample_hz, heart_rate, ecg).
+    """
+    grouped = {}
+    for user_id, ts, hz, hr, ecg in decode_frames(body):
+        g = grouped.setdefault(user_id, {"frames": 0, "hr_ts": [], "hr": [], "ecg_ts": [], "ecg": [], "latest": None})
+        g["frames"] += 1
+        if hr is not None:
+            g["hr_ts"].append(ts)
+            g["hr"].append(hr)
+        if ecg.size:
+            step = 1000.0 / hz
+            g["ecg_ts"].append(ts - np.round(np.arange(ecg.size - 1, -1, -1) * step).astype(np.int64))
+            g["ecg"].append(ecg)
+        if g["latest"] is None or ts >= g["latest"][0]:
+            g["latest"] = (ts, hz, hr, ecg)
+
+    for g in grouped.values():
+        g["hr_ts"] = np.asarray(g["hr_ts"], dtype=np.int64)
+        g["hr"] = np.asarray(g["hr"], dtype=np.float32)
+        g["ecg_ts"] = np.concatenate(g["ecg_ts"]) if g["ecg_ts"] else np.empty(0, dtype=np.int64)
+        g["ecg"] = np.concatenate(g["ecg"]) if g["ecg"] else np.empty(0, dtype=np.int16)
+        # devices that buffered offline may upload frames out of order
+        for ts_key, val_key in (("hr_ts", "hr"), ("ecg_ts", "ecg")):
+            if g[ts_key].size > 1 and np.any(np.diff(g[ts_key]) < 0):
+                order = np.argsort(g[ts_key], kind="stable")
+                g[ts_key], g[val_key] = g[ts_key][order], g[val_key][order]
+    return grouped
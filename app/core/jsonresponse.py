@@ -0,0 +1,36 @@
+import numpy as np
+import orjson
+from bson import ObjectId
+from fastapi.responses import JSONResponse
+
+# numpy arrays/scalars are written natively; NaN and inf come out as null
+ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+
+def _default(obj):
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    # orjson hands back the numpy values it cannot write directly (strided views, float16)
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+def dumps(content) -> bytes:
+    return orjson.dumps(content, default=_default, option=ORJSON_OPTIONS)
+
+
+class ORJSONResponse(JSONResponse):
+    """Default response class.
+
+    Plain route return values still go through FastAPI's jsonable_encoder first,
+    which does not know numpy. Routes that return numpy arrays or ObjectIds hand
+    back ORJSONResponse(content) themselves, so _default sees them instead.
+    """
+
+    def render(self, content) -> bytes:
+        return dumps(content)
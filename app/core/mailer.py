@@ -0,0 +1,276 @@
+import asyncio
+import os
+import random
+import smtplib
+import time
+from collections import deque
+from email.mime.text import MIMEText
+from email.mime.multipart import MIMEMultipart
+from app.core.metrics import Counter, Gauge, Histogram
+from dotenv import load_dotenv
+
+load_dotenv()
+
+SMTP_SERVER = os.getenv("SMTP_SERVER", "smtp.gmail.com")
+SMTP_PORT = int(os.getenv("SMTP_PORT", 587))
+SMTP_USER = os.getenv("SMTP_USER")
+SMTP_PASSWORD = os.getenv("SMTP_PASSWORD")
+EMAIL_FROM = os.getenv("EMAIL_FROM") or SMTP_USER or "no-reply@localhost"
+# set to false for plain local sinks such as `python -m aiosmtpd -n`
+SMTP_STARTTLS = os.getenv("SMTP_STARTTLS", "true").lower() == "true"
+
+# email queue conf.
+EMAIL_WORKERS = int(os.getenv("EMAIL_WORKERS", 2))                  # one persistent SMTP session each
+EMAIL_QUEUE_SIZE = int(os.getenv("EMAIL_QUEUE_SIZE", 1000))
+EMAIL_MAX_ATTEMPTS = int(os.getenv("EMAIL_MAX_ATTEMPTS", 4))
+EMAIL_RETRY_BASE_DELAY = float(os.getenv("EMAIL_RETRY_BASE_DELAY", 1.0))
+EMAIL_RETRY_MAX_DELAY = float(os.getenv("EMAIL_RETRY_MAX_DELAY", 60.0))
+EMAIL_SMTP_TIMEOUT = float(os.getenv("EMAIL_SMTP_TIMEOUT", 10))
+# servers drop idle sessions after a few minutes; reconnect instead of finding out mid-send
+EMAIL_SMTP_IDLE_TIMEOUT = float(os.getenv("EMAIL_SMTP_IDLE_TIMEOUT", 120))
+EMAIL_DEAD_LETTER_SIZE = int(os.getenv("EMAIL_DEAD_LETTER_SIZE", 500))
+EMAIL_DRAIN_TIMEOUT = float(os.getenv("EMAIL_DRAIN_TIMEOUT", 5))
+
+email_sent_total = Counter("email_sent_total", "Emails accepted by the SMTP server.")
+email_retries_total = Counter("email_retries_total", "Email delivery attempts that will be retried.", ("error",))
+email_dead_letters_total = Counter("email_dead_letters_total", "Emails given up on.", ("reason",))
+email_send_seconds = Histogram("email_send_seconds", "Time to hand one email to the SMTP server.")
+email_smtp_connects_total = Counter("email_smtp_connects_total", "SMTP sessions opened (connect, STARTTLS, login).")
+email_queue_depth = Gauge("email_queue_depth", "Emails waiting for a worker.")
+
+
+def build_message(to_email: str, subject: str, message: str):
+    msg = MIMEMultipart()
+    msg["From"] = EMAIL_FROM
+    msg["To"] = to_email
+    msg["Subject"] = subject
+    msg.attach(MIMEText(message, "plain"))
+    return msg
+
+
+def _is_permanent(error: Exception) -> bool:
+    # only network errors and 4xx replies are worth retrying (SMTPException is an OSError);
+    # 5xx replies, refused addresses, bad credentials and bugs will not get better
+    if not isinstance(error, OSError):
+        return True
+    if isinstance(error, (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused,
+                          smtplib.SMTPAuthenticationError, smtplib.SMTPNotSupportedError)):
+        return True
+    return isinstance(error, smtplib.SMTPResponseException) and error.smtp_code >= 500
+
+
+class SMTPSession:
+    """One authenticated SMTP connection, reused across messages.
+
+    Blocking (smtplib); each dispatcher worker owns one and drives it from a thread.
+    """
+
+    def __init__(self):
+        self._smtp = None
+        self.last_used = 0.0
+
+    def _connect(self):
+        self.close()
+        smtp = smtplib.SMTP(SMTP_SERVER, SMTP_PORT, timeout=EMAIL_SMTP_TIMEOUT)
+        try:
+            if SMTP_STARTTLS:
+                smtp.starttls()
+            if SMTP_USER:
+                smtp.login(SMTP_USER, SMTP_PASSWORD)
+        except Exception:
+            smtp.close()
+            raise
+        self._smtp = smtp
+        email_smtp_connects_total.inc()
+
+    def send(self, msg):
+        if self._smtp is None or time.monotonic() - self.last_used > EMAIL_SMTP_IDLE_TIMEOUT:
+            self._connect()
+        try:
+            self._smtp.send_message(msg)
+        except smtplib.SMTPServerDisconnected:
+            # the kept-alive session went away between messages; one fresh session, one more try
+            self._connect()
+            self._smtp.send_message(msg)
+        self.last_used = time.monotonic()
+
+    def close(self):
+        if self._smtp is not None:
+            try:
+                self._smtp.quit()
+            except Exception:
+                self._smtp.close()
+            self._smtp = None
+
+
+class _Job:
+    __slots__ = ("to", "subject", "message", "attempts", "queued_at", "last_error")
+
+    def __init__(self, to, subject, message):
+        self.to = to
+        self.subject = subject
+        self.message = message
+        self.attempts = 0
+        self.queued_at = time.time()
+        self.last_error = None
+
+
+class EmailDispatcher:
+    """Background email delivery.
+
+    Routes call `enqueue()`, which returns immediately. Worker tasks keep
+    SMTP sessions open, retry transient failures with jittered exponential
+    backoff, and move messages that keep failing to a bounded dead-letter list.
+    Before `start()` (scripts, tests) `enqueue()` sends synchronously instead.
+    """
+
+    def __init__(self, workers: int = EMAIL_WORKERS, queue_size: int = EMAIL_QUEUE_SIZE):
+        self.workers = workers
+        self.queue_size = queue_size
+        self._queue = None
+        self._tasks = []
+        self._retry_handles = set()
+        self.dead_letters = deque(maxlen=EMAIL_DEAD_LETTER_SIZE)
+        self.sent = 0
+        self.retried = 0
+        self.failed = 0
+        self.rejected = 0
+
+    @property
+    def running(self):
+        return bool(self._tasks)
+
+    async def start(self):
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+        print(f"[INFO] Email dispatcher started with {self.workers} SMTP workers")
+
+    async def stop(self, timeout: float = EMAIL_DRAIN_TIMEOUT):
+        if not self.running:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            print(f"[WARN] Email dispatcher stopped with {self._queue.qsize()} emails still queued")
+        for handle in self._retry_handles:
+            handle.cancel()
+        if self._retry_handles:
+            print(f"[WARN] Dropped {len(self._retry_handles)} scheduled email retries on shutdown")
+        self._retry_handles.clear()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def enqueue(self, to_email: str, subject: str, message: str) -> bool:
+        job = _Job(to_email, subject, message)
+        if not self.running:
+            return self._send_now(job)
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            self.rejected += 1
+            print(f"[WARN] Email queue full, rejected message to {to_email}")
+            return False
+        email_queue_depth.set(self._queue.qsize())
+        return True
+
+    def _send_now(self, job):
+        session = SMTPSession()
+        try:
+            session.send(build_message(job.to, job.subject, job.message))
+            self._record_sent(job)
+            return True
+        except Exception as e:
+            print(f"[ERROR] Failed to send email: {e}")
+            return False
+        finally:
+            session.close()
+
+    async def _worker(self, index: int):
+        session = SMTPSession()
+        try:
+            while True:
+                job = await self._queue.get()
+                email_queue_depth.set(self._queue.qsize())
+                try:
+                    await self._deliver(session, job)
+                finally:
+                    self._queue.task_done()
+        finally:
+            await asyncio.to_thread(session.close)
+
+    async def _deliver(self, session: SMTPSession, job: _Job):
+        job.attempts += 1
+        start = time.perf_counter()
+        try:
+            await asyncio.to_thread(session.send, build_message(job.to, job.subject, job.message))
+        except Exception as e:
+            if not isinstance(e, (smtplib.SMTPResponseException, smtplib.SMTPRecipientsRefused)):
+                # not a clean SMTP reply, so the session may be half-broken; the next message reconnects
+                await asyncio.to_thread(session.close)
+            job.last_error = f"{type(e).__name__}: {e}"
+            if _is_permanent(e):
+                self._dead_letter(job, "permanent")
+            elif job.attempts >= EMAIL_MAX_ATTEMPTS:
+                self._dead_letter(job, "attempts_exhausted")
+            else:
+                self._schedule_retry(job, type(e).__name__)
+            return
+        email_send_seconds.observe(time.perf_counter() - start)
+        self._record_sent(job)
+
+    def _record_sent(self, job):
+        self.sent += 1
+        email_sent_total.inc()
+        print(f"[INFO] Email sent to {job.to}")
+
+    def _schedule_retry(self, job, error_name):
+        self.retried += 1
+        email_retries_total.inc(error=error_name)
+        delay = random.uniform(0, min(EMAIL_RETRY_MAX_DELAY, EMAIL_RETRY_BASE_DELAY * (2 ** (job.attempts - 1))))
+        print(f"[WARN] Email to {job.to} failed ({job.last_error}), retry {job.attempts}/{EMAIL_MAX_ATTEMPTS - 1} in {delay:.1f}s")
+        loop = asyncio.get_running_loop()
+        handle = None
+
+        def requeue():
+            self._retry_handles.discard(handle)
+            try:
+                self._queue.put_nowait(job)
+            except asyncio.QueueFull:
+                self._dead_letter(job, "queue_full")
+
+        handle = loop.call_later(delay, requeue)
+        self._retry_handles.add(handle)
+
+    def _dead_letter(self, job, reason):
+        self.failed += 1
+        email_dead_letters_total.inc(reason=reason)
+        self.dead_letters.append({
+            "to": job.to,
+            "subject": job.subject,
+            "attempts": job.attempts,
+            "reason": reason,
+            "error": job.last_error,
+            "queued_at": job.queued_at,
+            "failed_at": time.time(),
+        })
+        print(f"[ERROR] Giving up on email to {job.to} after {job.attempts} attempt(s): {job.last_error}")
+
+    def stats(self):
+        return {
+            "running": self.running,
+            "workers": self.workers,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "scheduled_retries": len(self._retry_handles),
+            "sent": self.sent,
+            "retried": self.retried,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "dead_letters": len(self.dead_letters),
+        }
+
+
+email_dispatcher = EmailDispatcher()
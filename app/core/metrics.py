@@ -0,0 +1,226 @@
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# metrics conf.
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+# adds a Server-Timing header (per-stage durations) to every response
+METRICS_SERVER_TIMING = os.getenv("METRICS_SERVER_TIMING", "false").lower() == "true"
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_registry = []
+
+
+def _format_labels(names, values):
+    if not names:
+        return ""
+    pairs = []
+    for name, value in zip(names, values):
+        value = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        pairs.append(f'{name}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _key(self, labels):
+        return tuple(labels.get(name, "") for name in self.labels)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}")
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # per-bucket (non-cumulative) counts, then sum and count
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][i] += 1
+            state[1] += value
+            state[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted((key, (list(s[0]), s[1], s[2])) for key, s in self._values.items())
+        names = self.labels + ("le",)
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                labels = _format_labels(names, key + (_format_value(bound),))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labels, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+def render_metrics() -> str:
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+http_requests_total = Counter("http_requests_total", "HTTP requests by route and status.", ("method", "route", "status"))
+http_request_duration_seconds = Histogram("http_request_duration_seconds", "HTTP request latency.", ("method", "route"))
+http_requests_in_progress = Gauge("http_requests_in_progress", "HTTP requests currently being served.")
+stage_duration_seconds = Histogram("stage_duration_seconds", "Latency of internal request stages.", ("stage",))
+stage_errors_total = Counter("stage_errors_total", "Stages that raised an exception.", ("stage", "error"))
+llm_requests_total = Counter("llm_requests_total", "LLM calls by outcome.", ("call", "outcome"))
+llm_tokens_total = Counter("llm_tokens_total", "LLM tokens consumed.", ("call", "kind"))
+
+
+# --- spans --------------------------------------------------------------
+
+# per-request {stage: seconds}, set by MetricsMiddleware and read back for Server-Timing
+_request_timings: ContextVar[dict | None] = ContextVar("request_timings", default=None)
+
+
+@contextmanager
+def span(stage: str, request_timing: bool = True):
+    """Times a block as `stage`; works around awaits too.
+
+    Pass request_timing=False for work shared by several requests (batches),
+    which should not be attributed to whichever request happens to own the task.
+    """
+    if not METRICS_ENABLED:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    except GeneratorExit:
+        # a streaming client went away; not a failure of the stage
+        raise
+    except BaseException as e:
+        stage_errors_total.inc(stage=stage, error=type(e).__name__)
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        stage_duration_seconds.observe(elapsed, stage=stage)
+        timings = _request_timings.get() if request_timing else None
+        if timings is not None:
+            timings[stage] = timings.get(stage, 0.0) + elapsed
+
+
+def record_llm_usage(call: str, usage):
+    if usage is None:
+        return
+    input_tokens = getattr(usage, "input_tokens", None) or 0
+    output_tokens = getattr(usage, "output_tokens", None) or 0
+    if input_tokens:
+        llm_tokens_total.inc(input_tokens, call=call, kind="input")
+    if output_tokens:
+        llm_tokens_total.inc(output_tokens, call=call, kind="output")
+
+
+def _route_label(scope):
+    route = scope.get("route")
+    path = getattr(route, "path", None)
+    return path or "unmatched"
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware: request counters/latency per route template, plus
+    the optional Server-Timing header built from the request's spans."""
+
+    def __init__(self, app, server_timing: bool = METRICS_SERVER_TIMING):
+        self.app = app
+        self.server_timing = server_timing
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        timings = {}
+        token = _request_timings.set(timings)
+        start = time.perf_counter()
+        status_code = 500
+        http_requests_in_progress.inc()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if self.server_timing:
+                    total = (time.perf_counter() - start) * 1000
+                    parts = [f"{stage};dur={seconds * 1000:.2f}" for stage, seconds in timings.items()]
+                    parts.append(f"app;dur={total:.2f}")
+                    message["headers"] = list(message.get("headers", [])) + [(b"server-timing", ", ".join(parts).encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _request_timings.reset(token)
+            http_requests_in_progress.dec()
+            route = _route_label(scope)
+            elapsed = time.perf_counter() - start
+            http_requests_total.inc(method=method, route=route, status=str(status_code))
+            http_request_duration_seconds.observe(elapsed, method=method, route=route)
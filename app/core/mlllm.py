@@ -1,57 +1,184 @@
 import os
-import joblib
-import pandas as pd
+import asyncio
+import random
+import time
 import numpy as np
-from openai import OpenAI
-import warnings
-import requests
+from app.core.scorer import build_feature_matrix, format_prediction
+from app.core.modelstore import model_store
+from app.core.batcher import MicroBatcher
+from app.core.reportcache import report_cache, report_key, ecg_key
+from app.core.metrics import span, llm_requests_total, record_llm_usage
+from app.core.admission import FairLimiter, client_key
 
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
-warnings.filterwarnings("ignore", message="Trying to unpickle estimator LogisticRegression")
+# LLM client conf.
+LLM_MODEL = os.getenv("LLM_MODEL", "gpt-4.1-mini")
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", 8))
+# calls beyond LLM_MAX_CONCURRENCY wait in a per-client round-robin queue of LLM_QUEUE_SIZE
+# (LLM_QUEUE_PER_CLIENT each) for up to LLM_QUEUE_TIMEOUT seconds; past that, Overloaded is
+# raised and the routes answer without the AI text
+LLM_QUEUE_SIZE = int(os.getenv("LLM_QUEUE_SIZE", 32))
+LLM_QUEUE_PER_CLIENT = int(os.getenv("LLM_QUEUE_PER_CLIENT", 2))
+LLM_QUEUE_TIMEOUT = float(os.getenv("LLM_QUEUE_TIMEOUT", 5))
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", 30))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", 2))
+LLM_RETRY_BASE_DELAY = float(os.getenv("LLM_RETRY_BASE_DELAY", 0.5))
 
-MODEL_PATH = os.getenv("MODEL_PATH")
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-client = OpenAI(api_key=OPENAI_API_KEY)
-
-def load_model():
-    if MODEL_PATH.startswith("http"):
-        print(f"[INFO] Downloading model from {MODEL_PATH} ...")
-        response = requests.get(MODEL_PATH)
-        if response.status_code == 200:
-            from io import BytesIO
-            model_bytes = BytesIO(response.content)
-            model = joblib.load(model_bytes)
-            print("[INFO] Model loaded successfully from URL.")
-            return model
-        else:
-            raise FileNotFoundError(f"Failed to download model. HTTP {response.status_code}")
-    else:
-        if not os.path.exists(MODEL_PATH):
-            raise FileNotFoundError("Model file not found")
-        print(f"[INFO] Loading model from local path: {MODEL_PATH}")
-        return joblib.load(MODEL_PATH)
-
-model = load_model()
+# the openai package takes most of a second to import, so it is only loaded on first use
+_client = None
+_retryable_llm_errors = None
+
+
+def get_llm_client():
+    global _client
+    if _client is None:
+        from openai import AsyncOpenAI
+        # the SDK's own retries are disabled so retry/jitter is handled in one place below
+        _client = AsyncOpenAI(api_key=OPENAI_API_KEY, timeout=LLM_TIMEOUT, max_retries=0)
+    return _client
+
+
+def retryable_llm_errors():
+    global _retryable_llm_errors
+    if _retryable_llm_errors is None:
+        import openai
+        _retryable_llm_errors = (
+            openai.APITimeoutError,
+            openai.APIConnectionError,
+            openai.RateLimitError,
+            openai.InternalServerError,
+            asyncio.TimeoutError,
+        )
+    return _retryable_llm_errors
 
+
+# the model itself is loaded by model_store in the app lifespan; until then scoring raises ModelNotReady
 def predict_cardiovascular_risk(user_data: dict, heart_rate: float):
-    features = [
-        "male", "age", "currentSmoker", "cigsPerDay", "BPMeds",
-        "prevalentStroke", "prevalentHyp", "diabetes", "totChol",
-        "sysBP", "diaBP", "BMI", "glucose", "heart_rate"
-    ]
-    input_data = {**user_data, "heart_rate": heart_rate}
-    for f in features:
-        if f not in input_data: input_data[f] = 0
-    df = pd.DataFrame([input_data], columns=features)
-    risk_prob = model.predict_proba(df.values)[0][1]
-
-    return {
-        "risk_probability": float(np.round(risk_prob, 3)),
-        "risk_percentage": float(np.round(risk_prob * 100, 2))
-    }
-
-def generate_medical_report(user_data: dict, prediction: dict):
-    prompt = f"""
+    risk_prob = model_store.get().score(build_feature_matrix([user_data], [heart_rate]))[0]
+    return format_prediction(risk_prob)
+
+def predict_cardiovascular_risk_batch(users: list[dict], heart_rates: list[float]):
+    scorer = model_store.get()
+    # one batch serves several requests, so it is not attributed to any single one
+    with span("model_score", request_timing=False):
+        probs = scorer.score(build_feature_matrix(users, heart_rates))
+    return [format_prediction(p) for p in probs]
+
+def score_risk_probabilities(users: list[dict], heart_rates) -> np.ndarray:
+    """One probability per user, NaN where the heart rate is missing."""
+    scorer = model_store.get()
+    hr = np.asarray(heart_rates, dtype=np.float64)
+    probs = np.full(len(users), np.nan)
+    has_hr = ~np.isnan(hr)
+    if has_hr.any():
+        with span("model_score"):
+            probs[has_hr] = scorer.score(build_feature_matrix(users, hr)[has_hr])
+    return probs
+
+# micro-batching scheduler for concurrent /predict calls (PREDICT_BATCH_WINDOW_MS=0 disables it)
+PREDICT_BATCH_WINDOW_MS = float(os.getenv("PREDICT_BATCH_WINDOW_MS", 2))
+PREDICT_BATCH_MAX = int(os.getenv("PREDICT_BATCH_MAX", 64))
+risk_batcher = MicroBatcher(predict_cardiovascular_risk_batch, max_batch=PREDICT_BATCH_MAX, window_ms=PREDICT_BATCH_WINDOW_MS)
+
+REPORT_PARSE_FAILED = "LLM response parsing failed."
+ECG_PARSE_FAILED = "ECG analysis failed to parse from LLM output."
+
+_llm_slots = None
+_llm_slots_loop = None
+
+
+def llm_queue_stats():
+    return _llm_slots.stats() if _llm_slots is not None else None
+
+
+def _get_llm_slots():
+    global _llm_slots, _llm_slots_loop
+    loop = asyncio.get_running_loop()
+    if _llm_slots is None or _llm_slots_loop is not loop:
+        _llm_slots = FairLimiter("llm", LLM_MAX_CONCURRENCY, LLM_QUEUE_SIZE, LLM_QUEUE_TIMEOUT, LLM_QUEUE_PER_CLIENT)
+        _llm_slots_loop = loop
+    return _llm_slots
+
+
+async def _backoff(attempt: int):
+    # full jitter: sleep somewhere in [0, base * 2^attempt]
+    await asyncio.sleep(random.uniform(0, LLM_RETRY_BASE_DELAY * (2 ** attempt)))
+
+
+async def _acquire_llm_slot():
+    slots = _get_llm_slots()
+    with span("llm_slot_wait"):
+        await slots.acquire(client_key.get())
+    return slots, time.monotonic()
+
+
+async def _complete(prompt: str, call: str = "report"):
+    slots, acquired_at = await _acquire_llm_slot()
+    try:
+        for attempt in range(LLM_MAX_RETRIES + 1):
+            try:
+                with span(f"llm_{call}"):
+                    response = await asyncio.wait_for(
+                        get_llm_client().responses.create(model=LLM_MODEL, input=prompt, temperature=0.3),
+                        timeout=LLM_TIMEOUT,
+                    )
+                llm_requests_total.inc(call=call, outcome="ok")
+                record_llm_usage(call, getattr(response, "usage", None))
+                return response
+            except retryable_llm_errors() as e:
+                if attempt == LLM_MAX_RETRIES:
+                    llm_requests_total.inc(call=call, outcome="error")
+                    raise
+                llm_requests_total.inc(call=call, outcome="retry")
+                print(f"[WARN] LLM call failed ({type(e).__name__}), retry {attempt + 1}/{LLM_MAX_RETRIES}")
+                await _backoff(attempt)
+            except Exception:
+                llm_requests_total.inc(call=call, outcome="error")
+                raise
+    finally:
+        slots.release(time.monotonic() - acquired_at)
+
+
+async def stream_completion(prompt: str, call: str = "report"):
+    """Yields text deltas as the model produces them.
+
+    Retries only happen before the first delta has been sent to the caller.
+    """
+    slots, acquired_at = await _acquire_llm_slot()
+    try:
+        for attempt in range(LLM_MAX_RETRIES + 1):
+            started = False
+            try:
+                with span(f"llm_{call}_stream"):
+                    stream = await asyncio.wait_for(
+                        get_llm_client().responses.create(model=LLM_MODEL, input=prompt, temperature=0.3, stream=True),
+                        timeout=LLM_TIMEOUT,
+                    )
+                    async for event in stream:
+                        if event.type == "response.output_text.delta":
+                            started = True
+                            yield event.delta
+                        elif event.type == "response.completed":
+                            record_llm_usage(call, getattr(event.response, "usage", None))
+                llm_requests_total.inc(call=call, outcome="ok")
+                return
+            except retryable_llm_errors() as e:
+                if started or attempt == LLM_MAX_RETRIES:
+                    llm_requests_total.inc(call=call, outcome="error")
+                    raise
+                llm_requests_total.inc(call=call, outcome="retry")
+                print(f"[WARN] LLM stream failed ({type(e).__name__}), retry {attempt + 1}/{LLM_MAX_RETRIES}")
+                await _backoff(attempt)
+            except Exception:
+                llm_requests_total.inc(call=call, outcome="error")
+                raise
+    finally:
+        slots.release(time.monotonic() - acquired_at)
+
+
+def medical_report_prompt(user_data: dict, prediction: dict):
+    return f"""
     You are a medical AI assistant. Given the following patient details and model prediction,
     provide a short diagnostic summary and structured lifestyle advice.
 
@@ -70,28 +197,18 @@ def generate_medical_report(user_data: dict, prediction: dict):
     }}
     """
 
-    response = client.responses.create(
-        model="gpt-4.1-mini",
-        input=prompt,
-        temperature=0.3
-    )
-    try:
-        text = response.output[0].content[0].text
-    except Exception:
-        text = "LLM response parsing failed."
-    return text
-
-def analyze_ecg_with_llm(user_data: dict, heart_rate: float, ecg_data: list):
-    prompt = f"""
-    You are a medical AI cardiology assistant. Analyze the following ECG signal data
-    and provide a structured medical insight.
+def ecg_prompt(user_data: dict, heart_rate: float, ecg_features: dict):
+    return f"""
+    You are a medical AI cardiology assistant. The following ECG features were extracted
+    on the server from the patient's full ECG window (R-peak detection, RR intervals, HRV).
+    Write a short structured medical narrative of these findings.
 
     Patient Info: {user_data}
-    Heart Rate: {heart_rate}
-    ECG Data (sampled): {ecg_data[:500]}
+    Device Heart Rate: {heart_rate}
+    ECG Features: {ecg_features}
 
-    Analyze for rhythm, abnormalities (like AFib, bradycardia, tachycardia, ischemia),
-    and include medical interpretation and suggested actions.
+    Interpret rhythm and the flagged abnormalities (bradycardia, tachycardia, irregular rhythm /
+    possible AFib, pauses, signal quality); do not invent findings that are not in the features.
 
     Output format (JSON only):
     {{
@@ -103,13 +220,57 @@ def analyze_ecg_with_llm(user_data: dict, heart_rate: float, ecg_data: list):
     }}
     """
 
-    response = client.responses.create(
-        model="gpt-4.1-mini",
-        input=prompt,
-        temperature=0.3
-    )
+async def generate_medical_report(user_data: dict, prediction: dict):
+    response = await _complete(medical_report_prompt(user_data, prediction), "report")
+    try:
+        text = response.output[0].content[0].text
+    except Exception:
+        text = REPORT_PARSE_FAILED
+    return text
 
+async def analyze_ecg_with_llm(user_data: dict, heart_rate: float, ecg_features: dict):
+    response = await _complete(ecg_prompt(user_data, heart_rate, ecg_features), call="ecg")
     try:
         return response.output[0].content[0].text
     except Exception:
-        return "ECG analysis failed to parse from LLM output."
\ No newline at end of file
+        return ECG_PARSE_FAILED
+
+
+# cached entry points used by the routes; parse failures are never cached
+async def cached_medical_report(user_data: dict, prediction: dict):
+    key = report_key(user_data, prediction)
+    text = await report_cache.get(key)
+    if text is None:
+        text = await generate_medical_report(user_data, prediction)
+        if text != REPORT_PARSE_FAILED:
+            await report_cache.set(key, text)
+    return text
+
+async def cached_ecg_analysis(user_data: dict, heart_rate: float, ecg_features: dict):
+    key = ecg_key(user_data, heart_rate, ecg_features)
+    text = await report_cache.get(key)
+    if text is None:
+        text = await analyze_ecg_with_llm(user_data, heart_rate, ecg_features)
+        if text != ECG_PARSE_FAILED:
+            await report_cache.set(key, text)
+    return text
+
+
+# streaming entry points: serve a cached text in one chunk, otherwise stream and cache the result
+async def _stream_cached(key: str, prompt: str, call: str):
+    text = await report_cache.get(key)
+    if text is not None:
+        yield text
+        return
+    parts = []
+    async for delta in stream_completion(prompt, call):
+        parts.append(delta)
+        yield delta
+    if parts:
+        await report_cache.set(key, "".join(parts))
+
+def stream_medical_report(user_data: dict, prediction: dict):
+    return _stream_cached(report_key(user_data, prediction), medical_report_prompt(user_data, prediction), "report")
+
+def stream_ecg_analysis(user_data: dict, heart_rate: float, ecg_features: dict):
+    return _stream_cached(ecg_key(user_data, heart_rate, ecg_features), ecg_prompt(user_data, heart_rate, ecg_features), "ecg")
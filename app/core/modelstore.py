@@ -0,0 +1,265 @@
+import asyncio
+import hashlib
+import json
+import os
+import random
+import time
+import warnings
+from app.core.scorer import RiskScorer
+from dotenv import load_dotenv
+
+load_dotenv()
+
+MODEL_PATH = os.getenv("MODEL_PATH")
+# optional StandardScaler fitted alongside the model (e.g. logistic_scaler.pkl)
+SCALER_PATH = os.getenv("SCALER_PATH")
+
+# model loading conf.
+# downloaded models and the reduced scorer (weights + bias) are kept here between boots
+MODEL_CACHE_DIR = os.getenv("MODEL_CACHE_DIR", ".model_cache")
+# optional sha256 the model file must have; a mismatching download or file is refused
+MODEL_SHA256 = os.getenv("MODEL_SHA256")
+MODEL_DOWNLOAD_TIMEOUT = float(os.getenv("MODEL_DOWNLOAD_TIMEOUT", 30))
+MODEL_LOAD_RETRY_BASE_DELAY = float(os.getenv("MODEL_LOAD_RETRY_BASE_DELAY", 1.0))
+MODEL_LOAD_RETRY_MAX_DELAY = float(os.getenv("MODEL_LOAD_RETRY_MAX_DELAY", 30.0))
+
+
+class ModelNotReady(Exception):
+    pass
+
+
+def _sha256_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _write_atomic(path: str, data: bytes):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.tmp{os.getpid()}"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+class ModelStore:
+    """Loads the risk model once, off the import path.
+
+    `load()` resolves MODEL_PATH (local file, or URL downloaded into
+    MODEL_CACHE_DIR and revalidated with its ETag / Last-Modified), then
+    builds the RiskScorer. The scorer's weights are cached next to it under
+    the model's sha256, so a warm boot never unpickles anything and does not
+    import sklearn at all. `start()` runs the same thing in the background,
+    retrying with backoff, so a briefly unreachable model URL delays
+    readiness instead of crashing the worker.
+    """
+
+    def __init__(self, model_path: str = MODEL_PATH, scaler_path: str = SCALER_PATH,
+                 cache_dir: str = MODEL_CACHE_DIR):
+        self.model_path = model_path
+        self.scaler_path = scaler_path
+        self.cache_dir = cache_dir
+        self.scorer = None
+        self.state = "cold"          # cold -> loading -> ready, or failed between retries
+        self.source = None
+        self.sha256 = None
+        self.error = None
+        self.attempts = 0
+        self.load_seconds = None
+        self.loaded_at = None
+        self._task = None
+        self._ready = None
+
+    @property
+    def ready(self):
+        return self.scorer is not None
+
+    def get(self) -> RiskScorer:
+        if self.scorer is None:
+            raise ModelNotReady(f"Model is {self.state}")
+        return self.scorer
+
+    # --- resolving the model file -----------------------------------------
+
+    def _cache_path(self, name: str) -> str:
+        return os.path.join(self.cache_dir, name)
+
+    def _check_pin(self, sha: str, what: str):
+        if MODEL_SHA256 and sha != MODEL_SHA256.lower():
+            raise ValueError(f"{what} sha256 {sha[:12]}... does not match MODEL_SHA256")
+
+    def _fetch_local(self):
+        if not self.model_path or not os.path.exists(self.model_path):
+            raise FileNotFoundError("Model file not found")
+        sha = _sha256_file(self.model_path)
+        self._check_pin(sha, "Model file")
+        return self.model_path, sha, "file"
+
+    def _fetch_url(self):
+        import requests
+
+        path = self._cache_path("model.pkl")
+        meta_path = self._cache_path("model.json")
+        meta = {}
+        if os.path.exists(path) and os.path.exists(meta_path):
+            with open(meta_path) as f:
+                meta = json.load(f)
+            if meta.get("url") != self.model_path or _sha256_file(path) != meta.get("sha256"):
+                # another URL, or a torn/edited file: download from scratch
+                meta = {}
+
+        headers = {}
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+
+        try:
+            response = requests.get(self.model_path, headers=headers, timeout=MODEL_DOWNLOAD_TIMEOUT)
+        except requests.RequestException as e:
+            if meta:
+                print(f"[WARN] Model URL unreachable ({type(e).__name__}), using cached copy {meta['sha256'][:12]}")
+                return path, meta["sha256"], "cache"
+            raise
+
+        if response.status_code == 304 and meta:
+            print("[INFO] Cached model is current (304 Not Modified)")
+            return path, meta["sha256"], "cache"
+        if response.status_code != 200:
+            if meta and response.status_code >= 500:
+                print(f"[WARN] Model URL returned HTTP {response.status_code}, using cached copy")
+                return path, meta["sha256"], "cache"
+            raise FileNotFoundError(f"Failed to download model. HTTP {response.status_code}")
+
+        sha = hashlib.sha256(response.content).hexdigest()
+        self._check_pin(sha, "Downloaded model")
+        _write_atomic(path, response.content)
+        meta = {
+            "url": self.model_path,
+            "sha256": sha,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "size": len(response.content),
+            "fetched_at": time.time(),
+        }
+        _write_atomic(meta_path, json.dumps(meta).encode())
+        print(f"[INFO] Model downloaded from {self.model_path} ({len(response.content)} bytes, sha256 {sha[:12]})")
+        return path, sha, "download"
+
+    # --- building the scorer ----------------------------------------------
+
+    def _build(self, model_file: str, sha: str):
+        scaler_sha = None
+        if self.scaler_path:
+            if not os.path.exists(self.scaler_path):
+                raise FileNotFoundError("Scaler file not found")
+            scaler_sha = _sha256_file(self.scaler_path)
+
+        key = sha[:16] + (f"-{scaler_sha[:16]}" if scaler_sha else "")
+        scorer_path = self._cache_path(f"scorer-{key}.npz")
+        if os.path.exists(scorer_path):
+            try:
+                return RiskScorer.load(scorer_path), True
+            except Exception as e:
+                print(f"[WARN] Ignoring unreadable scorer cache {scorer_path}: {e}")
+
+        # the slow path: unpickling pulls in sklearn (and whatever the pickle references)
+        import joblib
+
+        with warnings.catch_warnings():
+            warnings.filterwarnings("ignore", message="Trying to unpickle estimator")
+            print(f"[INFO] Loading model from {model_file}")
+            model = joblib.load(model_file)
+            scaler = None
+            if self.scaler_path:
+                print(f"[INFO] Loading scaler from local path: {self.scaler_path}")
+                scaler = joblib.load(self.scaler_path)
+        scorer = RiskScorer.from_estimator(model, scaler)
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            scorer.save(scorer_path)
+        except OSError as e:
+            print(f"[WARN] Could not write scorer cache {scorer_path}: {e}")
+        return scorer, False
+
+    def load(self) -> RiskScorer:
+        """Blocking load; safe to call from a thread or before the event loop exists."""
+        if not self.model_path:
+            raise FileNotFoundError("MODEL_PATH is not set")
+        start = time.perf_counter()
+        self.attempts += 1
+        if self.model_path.startswith("http"):
+            model_file, sha, source = self._fetch_url()
+        else:
+            model_file, sha, source = self._fetch_local()
+        scorer, cached = self._build(model_file, sha)
+
+        self.scorer = scorer
+        self.state = "ready"
+        self.source = source
+        self.sha256 = sha
+        self.error = None
+        self.loaded_at = time.time()
+        self.load_seconds = round(time.perf_counter() - start, 4)
+        print(f"[INFO] Model ready in {self.load_seconds * 1000:.0f} ms "
+              f"(source {source}, {'cached scorer' if cached else 'unpickled'}, sha256 {sha[:12]})")
+        return scorer
+
+    # --- background loading -----------------------------------------------
+
+    async def _load_with_retries(self):
+        attempt = 0
+        while self.scorer is None:
+            self.state = "loading"
+            try:
+                await asyncio.to_thread(self.load)
+            except Exception as e:
+                self.state = "failed"
+                self.error = f"{type(e).__name__}: {e}"
+                delay = random.uniform(0, min(MODEL_LOAD_RETRY_MAX_DELAY, MODEL_LOAD_RETRY_BASE_DELAY * (2 ** attempt)))
+                attempt += 1
+                print(f"[ERROR] Model load failed ({self.error}), retry in {delay:.1f}s")
+                await asyncio.sleep(delay)
+        self._ready.set()
+
+    async def start(self):
+        self._ready = asyncio.Event()
+        if self.scorer is not None:
+            # already loaded (e.g. before the server forked its workers)
+            self._ready.set()
+            return
+        self._task = asyncio.create_task(self._load_with_retries())
+
+    async def wait_ready(self, timeout: float | None = None) -> bool:
+        if self.scorer is not None:
+            return True
+        if self._ready is None:
+            return False
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        return self.scorer is not None
+
+    async def stop(self):
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    def stats(self):
+        return {
+            "ready": self.ready,
+            "state": self.state,
+            "source": self.source,
+            "sha256": self.sha256,
+            "attempts": self.attempts,
+            "load_seconds": self.load_seconds,
+            "loaded_at": self.loaded_at,
+            "error": self.error,
+        }
+
+
+model_store = ModelStore()
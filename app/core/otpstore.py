@@ -0,0 +1,201 @@
+import hashlib
+import heapq
+import hmac
+import os
+import time
+from datetime import datetime, timezone
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from app.core.database import get_db
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# OTP store conf.
+# OTP_STORE_BACKEND: "memory" (single process) or "mongo" (shared by every worker/instance)
+OTP_STORE_BACKEND = os.getenv("OTP_STORE_BACKEND", "memory")
+OTP_TTL = float(os.getenv("OTP_TTL", 300))
+OTP_MAX_ATTEMPTS = int(os.getenv("OTP_MAX_ATTEMPTS", 5))             # wrong guesses before the code is burned
+OTP_SEND_LIMIT = int(os.getenv("OTP_SEND_LIMIT", 3))                 # codes per email per window
+OTP_SEND_WINDOW = float(os.getenv("OTP_SEND_WINDOW", 900))
+OTP_MAX_ENTRIES = int(os.getenv("OTP_MAX_ENTRIES", 100000))          # memory backend only
+SECRET_KEY = os.getenv("SECRET_KEY", "your_secret_key_here")
+
+# verification outcomes
+OTP_OK = "ok"
+OTP_INVALID = "invalid"
+OTP_MISSING = "missing"          # never sent, already used, or expired
+OTP_LOCKED = "locked"            # too many wrong attempts; the code is gone
+
+
+class OTPRateLimited(Exception):
+    def __init__(self, retry_after: float):
+        super().__init__(f"OTP send limit reached, retry in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+def otp_digest(email: str, otp: str) -> str:
+    # codes are never stored in clear; keyed so a leaked store can't be brute-forced offline cheaply
+    return hmac.new(SECRET_KEY.encode(), f"{email}:{otp}".encode(), hashlib.sha256).hexdigest()
+
+
+def _send_window(now: float):
+    start = now - (now % OTP_SEND_WINDOW)
+    return int(start), start + OTP_SEND_WINDOW
+
+
+class MemoryOTPStore:
+    """Codes and send counters in dicts, expired through one min-heap of deadlines.
+
+    Every operation first pops whatever has expired, so memory is bounded by
+    live entries (and OTP_MAX_ENTRIES) instead of by how many emails ever asked.
+    """
+
+    def __init__(self, max_entries: int = OTP_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._codes = {}     # email -> [digest, attempts, expires_at]
+        self._sends = {}     # email -> [window_start, count, expires_at]
+        self._heap = []      # (expires_at, kind, email)
+
+    def _drop(self, expires_at, kind, email):
+        table = self._codes if kind == "code" else self._sends
+        entry = table.get(email)
+        # stale heap entries (the record was replaced since) are skipped
+        if entry is not None and entry[-1] == expires_at:
+            del table[email]
+
+    def _sweep(self, now: float):
+        while self._heap and self._heap[0][0] <= now:
+            self._drop(*heapq.heappop(self._heap))
+
+    def _evict_if_full(self):
+        # under abuse, drop the entries closest to expiry first
+        while len(self._codes) + len(self._sends) >= self.max_entries and self._heap:
+            self._drop(*heapq.heappop(self._heap))
+
+    async def allow_send(self, email: str) -> float:
+        """Counts one send; returns 0 if allowed, else seconds until the window resets."""
+        now = time.time()
+        self._sweep(now)
+        window_start, window_end = _send_window(now)
+        entry = self._sends.get(email)
+        if entry is None or entry[0] != window_start:
+            self._evict_if_full()
+            entry = self._sends[email] = [window_start, 0, window_end]
+            heapq.heappush(self._heap, (window_end, "send", email))
+        if entry[1] >= OTP_SEND_LIMIT:
+            return window_end - now
+        entry[1] += 1
+        return 0.0
+
+    async def put(self, email: str, digest: str, ttl: float = OTP_TTL):
+        now = time.time()
+        self._sweep(now)
+        if email not in self._codes:
+            self._evict_if_full()
+        expires_at = now + ttl
+        self._codes[email] = [digest, 0, expires_at]
+        heapq.heappush(self._heap, (expires_at, "code", email))
+
+    async def discard(self, email: str):
+        self._codes.pop(email, None)
+
+    async def check(self, email: str, digest: str) -> str:
+        now = time.time()
+        self._sweep(now)
+        entry = self._codes.get(email)
+        if entry is None:
+            return OTP_MISSING
+        if hmac.compare_digest(entry[0], digest):
+            del self._codes[email]
+            return OTP_OK
+        entry[1] += 1
+        if entry[1] >= OTP_MAX_ATTEMPTS:
+            del self._codes[email]
+            return OTP_LOCKED
+        return OTP_INVALID
+
+    def stats(self):
+        return {"backend": "memory", "codes": len(self._codes), "send_windows": len(self._sends),
+                "heap": len(self._heap)}
+
+
+class MongoOTPStore:
+    """Codes and send counters keyed by email, so every lookup is an _id hit.
+
+    A TTL index on expires_at removes old documents; since the TTL monitor only
+    runs about once a minute, reads also filter on expires_at themselves.
+    """
+
+    def __init__(self, codes: str = "otp_codes", sends: str = "otp_sends"):
+        self.codes_name = codes
+        self.sends_name = sends
+        self._indexed = False
+
+    async def _collections(self):
+        db = get_db()
+        codes, sends = db[self.codes_name], db[self.sends_name]
+        if not self._indexed:
+            await codes.create_index("expires_at", expireAfterSeconds=0)
+            await sends.create_index("expires_at", expireAfterSeconds=0)
+            self._indexed = True
+        return codes, sends
+
+    async def allow_send(self, email: str) -> float:
+        _, sends = await self._collections()
+        now = time.time()
+        window_start, window_end = _send_window(now)
+        query = {"_id": f"{email}:{window_start}"}
+        update = {"$inc": {"count": 1}, "$setOnInsert": {"expires_at": datetime.fromtimestamp(window_end, tz=timezone.utc)}}
+        try:
+            doc = await sends.find_one_and_update(query, update, upsert=True, return_document=ReturnDocument.AFTER)
+        except DuplicateKeyError:
+            # two workers raced to create the window document; the retry just increments it
+            doc = await sends.find_one_and_update(query, update, upsert=True, return_document=ReturnDocument.AFTER)
+        return 0.0 if doc["count"] <= OTP_SEND_LIMIT else window_end - now
+
+    async def put(self, email: str, digest: str, ttl: float = OTP_TTL):
+        codes, _ = await self._collections()
+        expires_at = datetime.fromtimestamp(time.time() + ttl, tz=timezone.utc)
+        await codes.update_one(
+            {"_id": email},
+            {"$set": {"digest": digest, "expires_at": expires_at, "attempts": 0}},
+            upsert=True,
+        )
+
+    async def discard(self, email: str):
+        codes, _ = await self._collections()
+        await codes.delete_one({"_id": email})
+
+    async def check(self, email: str, digest: str) -> str:
+        codes, _ = await self._collections()
+        now = datetime.now(timezone.utc)
+        # the matching code is consumed atomically, so two workers can't both accept it
+        doc = await codes.find_one_and_delete(
+            {"_id": email, "digest": digest, "expires_at": {"$gt": now}, "attempts": {"$lt": OTP_MAX_ATTEMPTS}}
+        )
+        if doc is not None:
+            return OTP_OK
+        doc = await codes.find_one_and_update(
+            {"_id": email, "expires_at": {"$gt": now}},
+            {"$inc": {"attempts": 1}},
+            return_document=ReturnDocument.AFTER,
+        )
+        if doc is None:
+            return OTP_MISSING
+        if doc["attempts"] >= OTP_MAX_ATTEMPTS:
+            await codes.delete_one({"_id": email, "attempts": {"$gte": OTP_MAX_ATTEMPTS}})
+            return OTP_LOCKED
+        return OTP_INVALID
+
+    def stats(self):
+        return {"backend": "mongo"}
+
+
+def _make_store():
+    if OTP_STORE_BACKEND == "mongo":
+        return MongoOTPStore()
+    return MemoryOTPStore()
+
+
+otp_store = _make_store()
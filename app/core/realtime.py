@@ -0,0 +1,322 @@
+import asyncio
+import math
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from dotenv import load_dotenv
+
+load_dotenv()
+
+FIREBASE_CRED_PATH = os.getenv("FIREBASE_CRED_PATH")
+FIREBASE_DB_URL = os.getenv("FIREBASE_DB_URL")
+
+# realtime snapshot cache conf.
+# REALTIME_MODE: "listen" (Firebase streaming on /users), "poll" (one bulk /users read
+# every REALTIME_POLL_INTERVAL seconds) or "off" (read Firebase on every request; snapshots
+# posted to /ingest are still kept and served)
+REALTIME_MODE = os.getenv("REALTIME_MODE", "listen")
+REALTIME_POLL_INTERVAL = float(os.getenv("REALTIME_POLL_INTERVAL", 15))
+# devices upload once per UPLOAD_INTERVAL (60 s), so three missed uploads mark a snapshot stale
+REALTIME_STALE_AFTER = float(os.getenv("REALTIME_STALE_AFTER", 180))
+# concurrent per-user Firebase reads for bulk lookups that miss the cache
+REALTIME_BULK_CONCURRENCY = int(os.getenv("REALTIME_BULK_CONCURRENCY", 16))
+
+
+def heart_rate_of(realtime) -> float | None:
+    """The snapshot's heart rate, or None when it is missing, not a number or not finite."""
+    value = realtime.get("heart_rate") if isinstance(realtime, dict) else None
+    if value is None or isinstance(value, bool):
+        return None
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return value if math.isfinite(value) else None
+
+
+def parse_device_timestamp(value, default_ms: int | None) -> int | None:
+    # devices send "%Y-%m-%d %H:%M:%S" in UTC (configTime(0, 0, ...) in de.cpp)
+    if isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value):
+        return int(value if value > 1e12 else value * 1000)
+    if isinstance(value, str):
+        try:
+            dt = datetime.strptime(value, "%Y-%m-%d %H:%M:%S").replace(tzinfo=timezone.utc)
+            return int(dt.timestamp() * 1000)
+        except ValueError:
+            pass
+    return default_ms
+
+
+def _ref(path: str):
+    from firebase_admin import db
+    return db.reference(path)
+
+
+def init_firebase():
+    # firebase_admin (and google-auth behind it) is imported here, not at app import time
+    import firebase_admin
+    from firebase_admin import credentials
+
+    if firebase_admin._apps:
+        return
+    if os.getenv("FIREBASE_DATABASE_EMULATOR_HOST"):
+        # emulator / local fake: the SDK authenticates with its own emulator credentials
+        firebase_admin.initialize_app(options={'databaseURL': FIREBASE_DB_URL})
+    else:
+        cred = credentials.Certificate(FIREBASE_CRED_PATH)
+        firebase_admin.initialize_app(cred, {'databaseURL': FIREBASE_DB_URL})
+
+
+class RealtimeStore:
+    """Latest `/users/{id}/realtime` snapshot per user, kept in memory.
+
+    Snapshots are written from the Firebase listener thread (or the poll task)
+    and read by the routes without any network I/O. Each user's snapshot dict
+    is replaced, never mutated, so readers always see a consistent value.
+    """
+
+    def __init__(self, mode: str = REALTIME_MODE):
+        self.mode = mode
+        self.ready = False
+        self._snapshots = {}
+        self._lock = threading.Lock()
+        self._listener = None
+        self._poll_task = None
+        self._loop = None
+        self.subscribers = []
+        self.events = 0
+        self.fallback_reads = 0
+        self.last_event_at = None
+
+    # --- snapshot bookkeeping -------------------------------------------
+
+    def _store(self, user_id: str, realtime, notify: bool = True):
+        with self._lock:
+            current = self._snapshots.get(user_id)
+            if current is not None and current["data"] == realtime:
+                return
+            if realtime is None:
+                self._snapshots.pop(user_id, None)
+                return
+            self._snapshots[user_id] = {
+                "data": realtime,
+                "version": (current["version"] + 1) if current else 1,
+                "received_at": time.time(),
+            }
+        if notify:
+            self._notify(user_id, realtime)
+
+    def update_local(self, user_id: str, realtime: dict):
+        # snapshots that arrive outside Firebase (e.g. POST /ingest); subscribers are not
+        # notified because the ingest path already wrote them to history
+        self._store(user_id, realtime, notify=False)
+
+    def _notify(self, user_id, realtime):
+        if not self.subscribers or self._loop is None:
+            return
+        for callback in self.subscribers:
+            if self._loop.is_closed():
+                return
+            self._loop.call_soon_threadsafe(callback, user_id, realtime)
+
+    def _replace_all(self, users):
+        users = users if isinstance(users, dict) else {}
+        with self._lock:
+            gone = [uid for uid in self._snapshots if uid not in users]
+        for uid in gone:
+            self._store(uid, None)
+        for uid, node in users.items():
+            self._store(uid, node.get("realtime") if isinstance(node, dict) else None)
+
+    def _put(self, segments, data):
+        # segments are relative to /users
+        if not segments:
+            self._replace_all(data)
+            return
+        user_id, rest = segments[0], segments[1:]
+        if not rest:
+            self._store(user_id, data.get("realtime") if isinstance(data, dict) else None)
+            return
+        if rest[0] != "realtime":
+            return
+        rest = rest[1:]
+        if not rest:
+            self._store(user_id, data if isinstance(data, dict) else None)
+            return
+
+        with self._lock:
+            current = self._snapshots.get(user_id)
+            realtime = _copy_tree(current["data"]) if current else {}
+        node = realtime
+        for key in rest[:-1]:
+            child = node.get(key)
+            if not isinstance(child, dict):
+                child = node[key] = {}
+            node = child
+        if data is None:
+            node.pop(rest[-1], None)
+        else:
+            node[rest[-1]] = data
+        self._store(user_id, realtime or None)
+
+    def apply_event(self, event_type: str, path: str, data):
+        segments = [s for s in path.split("/") if s]
+        if event_type == "patch" and isinstance(data, dict):
+            for key, value in data.items():
+                self._put(segments + [s for s in key.split("/") if s], value)
+        elif event_type == "put":
+            self._put(segments, data)
+        self.events += 1
+        self.last_event_at = time.time()
+        if not segments and event_type == "put":
+            self.ready = True
+
+    def _on_event(self, event):
+        try:
+            self.apply_event(event.event_type, event.path, event.data)
+        except Exception as e:
+            print(f"[ERROR] Failed to apply realtime event at {event.path}: {e}")
+
+    # --- lifecycle ------------------------------------------------------
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        if self.mode == "listen":
+            try:
+                self._listener = await asyncio.to_thread(_ref("/users").listen, self._on_event)
+                print("[INFO] Realtime snapshot cache listening on /users")
+            except Exception as e:
+                print(f"[WARN] Firebase listen failed ({e}); falling back to per-request reads")
+                self.mode = "off"
+        elif self.mode == "poll":
+            try:
+                await self.refresh()
+            except Exception as e:
+                print(f"[WARN] Initial realtime poll failed: {e}")
+            self._poll_task = asyncio.create_task(self._poll_loop())
+            print(f"[INFO] Realtime snapshot cache polling /users every {REALTIME_POLL_INTERVAL}s")
+
+    async def refresh(self):
+        # one bulk read of /users (poll mode, and batch jobs running outside the app)
+        users = await asyncio.to_thread(_ref("/users").get)
+        self.apply_event("put", "/", users)
+
+    async def _poll_loop(self):
+        while True:
+            await asyncio.sleep(REALTIME_POLL_INTERVAL)
+            try:
+                await self.refresh()
+            except Exception as e:
+                print(f"[WARN] Realtime poll failed: {e}")
+
+    async def stop(self):
+        if self._poll_task is not None:
+            self._poll_task.cancel()
+            try:
+                await self._poll_task
+            except asyncio.CancelledError:
+                pass
+            self._poll_task = None
+        if self._listener is not None:
+            await asyncio.to_thread(self._listener.close)
+            self._listener = None
+        self.ready = False
+
+    # --- reads ----------------------------------------------------------
+
+    def snapshot(self, user_id: str):
+        with self._lock:
+            return self._snapshots.get(user_id)
+
+    def all_snapshots(self):
+        with self._lock:
+            return dict(self._snapshots)
+
+    def cached(self, user_id: str):
+        """(realtime_data, metadata) when memory can answer for this user, else None."""
+        # with the cache off the only snapshots held are local ones (POST /ingest), and those
+        # are still served; otherwise a miss is only final once the cache is warm
+        snap = self.snapshot(user_id)
+        if snap is None and not (self.ready and self.mode != "off"):
+            return None
+        return (snap["data"] if snap else None), self._meta(snap)
+
+    async def read_remote(self, user_id: str):
+        """Reads this user's snapshot from Firebase (and keeps it, unless the cache is off)."""
+        data = await asyncio.to_thread(_ref(f"/users/{user_id}/realtime").get)
+        self.fallback_reads += 1
+        if self.mode != "off":
+            self._store(user_id, data)
+            snap = self.snapshot(user_id)
+        else:
+            snap = {"data": data, "version": None, "received_at": time.time()} if data is not None else None
+        return (snap["data"] if snap else None), self._meta(snap)
+
+    async def get(self, user_id: str):
+        """Returns (realtime_data, staleness metadata) for one user."""
+        cached = self.cached(user_id)
+        return cached if cached is not None else await self.read_remote(user_id)
+
+    async def get_many(self, user_ids):
+        """{user_id: (realtime_data, metadata)}; cache hits first, misses read concurrently.
+
+        Reading the /users parent instead would pull every user's ECG window, so
+        misses are fetched one path each, at most REALTIME_BULK_CONCURRENCY at a time.
+        """
+        results = {}
+        missing = []
+        for user_id in user_ids:
+            cached = self.cached(user_id)
+            if cached is None:
+                missing.append(user_id)
+            else:
+                results[user_id] = cached
+        if missing:
+            slots = asyncio.Semaphore(REALTIME_BULK_CONCURRENCY)
+
+            async def read(user_id):
+                async with slots:
+                    results[user_id] = await self.read_remote(user_id)
+
+            await asyncio.gather(*(read(user_id) for user_id in missing))
+        return results
+
+    def _meta(self, snap):
+        if snap is None:
+            return {"source": self.mode, "version": None, "received_at": None, "age_s": None, "stale": True}
+        # age is how old the reading is, not when this process last (re)loaded it; a restart or a
+        # poll refresh re-receives every snapshot. Only without a usable device time is receipt used.
+        data = snap["data"] if isinstance(snap["data"], dict) else {}
+        device_ms = parse_device_timestamp(data.get("timestamp"), None)
+        taken_at = device_ms / 1000 if device_ms is not None else snap["received_at"]
+        age = max(0.0, time.time() - taken_at)
+        return {
+            "source": self.mode,
+            "version": snap["version"],
+            "received_at": datetime.fromtimestamp(snap["received_at"], tz=timezone.utc).isoformat(),
+            "device_timestamp": data.get("timestamp"),
+            "age_s": round(age, 1),
+            "stale": age > REALTIME_STALE_AFTER,
+        }
+
+    def stats(self):
+        with self._lock:
+            users = len(self._snapshots)
+        return {
+            "mode": self.mode,
+            "ready": self.ready,
+            "users": users,
+            "events": self.events,
+            "fallback_reads": self.fallback_reads,
+            "last_event_at": self.last_event_at,
+        }
+
+
+def _copy_tree(node):
+    if isinstance(node, dict):
+        return {k: _copy_tree(v) for k, v in node.items()}
+    return node
+
+
+realtime_store = RealtimeStore()
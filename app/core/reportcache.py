@@ -0,0 +1,170 @@
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from app.core.cache import TTLCache
+from app.core.database import get_db
+
+# LLM report cache config.
+# REPORT_CACHE_BACKEND: "memory" (default), "sqlite" or "mongo" for entries that survive restarts
+REPORT_CACHE_BACKEND = os.getenv("REPORT_CACHE_BACKEND", "memory")
+REPORT_CACHE_SIZE = int(os.getenv("REPORT_CACHE_SIZE", 5000))
+REPORT_CACHE_TTL = float(os.getenv("REPORT_CACHE_TTL", 6 * 3600))
+REPORT_CACHE_SQLITE_PATH = os.getenv("REPORT_CACHE_SQLITE_PATH", "report_cache.sqlite3")
+
+# bucket width per feature; values inside one bucket share a report
+FEATURE_BUCKETS = {
+    "age": 1,
+    "cigsPerDay": 5,
+    "totChol": 10,
+    "sysBP": 5,
+    "diaBP": 5,
+    "BMI": 1,
+    "glucose": 5,
+    "heart_rate": 5,
+}
+
+
+def _bucket(name, value):
+    width = FEATURE_BUCKETS.get(name)
+    if width is None or not isinstance(value, (int, float)) or isinstance(value, bool):
+        return value
+    return round(float(value) / width) * width
+
+
+def _digest(payload) -> str:
+    raw = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def report_key(user_data: dict, prediction: dict) -> str:
+    features = {k: _bucket(k, v) for k, v in user_data.items()}
+    risk = round(float(prediction.get("risk_probability", 0)), 2) if prediction else None
+    return "report:" + _digest({"features": features, "risk": risk})
+
+
+def ecg_key(user_data: dict, heart_rate, ecg_features: dict) -> str:
+    hr = _bucket("heart_rate", heart_rate) if heart_rate is not None else None
+    return "ecg:" + _digest({"patient": user_data, "heart_rate": hr, "features": ecg_features})
+
+
+class SQLiteReportStore:
+    def __init__(self, path: str):
+        self.path = path
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS reports (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._conn.commit()
+        return self._conn
+
+    def _get(self, key):
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT value FROM reports WHERE key = ? AND expires_at > ?", (key, time.time())
+            ).fetchone()
+        return row[0] if row else None
+
+    def _set(self, key, value, ttl):
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO reports (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, value, time.time() + ttl),
+            )
+            conn.execute("DELETE FROM reports WHERE expires_at <= ?", (time.time(),))
+            conn.commit()
+
+    async def get(self, key):
+        return await asyncio.to_thread(self._get, key)
+
+    async def set(self, key, value, ttl):
+        await asyncio.to_thread(self._set, key, value, ttl)
+
+
+class MongoReportStore:
+    def __init__(self, collection_name: str = "report_cache"):
+        self.collection_name = collection_name
+        self._indexed = False
+
+    async def _collection(self):
+        collection = get_db()[self.collection_name]
+        if not self._indexed:
+            await collection.create_index("expires_at", expireAfterSeconds=0)
+            self._indexed = True
+        return collection
+
+    async def get(self, key):
+        doc = await (await self._collection()).find_one({"_id": key}, {"value": 1, "expires_at": 1})
+        if doc is None or doc["expires_at"].replace(tzinfo=timezone.utc).timestamp() <= time.time():
+            return None
+        return doc["value"]
+
+    async def set(self, key, value, ttl):
+        expires_at = datetime.fromtimestamp(time.time() + ttl, tz=timezone.utc)
+        await (await self._collection()).update_one(
+            {"_id": key}, {"$set": {"value": value, "expires_at": expires_at}}, upsert=True
+        )
+
+
+class ReportCache:
+    def __init__(self, maxsize: int, ttl: float, store=None):
+        self.memory = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.ttl = ttl
+        self.store = store
+        self.counters = {}
+
+    def _count(self, kind, outcome):
+        key = f"{kind}_{outcome}"
+        self.counters[key] = self.counters.get(key, 0) + 1
+
+    async def get(self, key):
+        kind = key.split(":", 1)[0]
+        value = self.memory.get(key)
+        if value is not None:
+            self._count(kind, "hits")
+            return value
+        if self.store is not None:
+            try:
+                value = await self.store.get(key)
+            except Exception as e:
+                print(f"[WARN] Report cache backend read failed: {e}")
+                value = None
+            if value is not None:
+                self.memory.set(key, value)
+                self._count(kind, "persistent_hits")
+                return value
+        self._count(kind, "misses")
+        return None
+
+    async def set(self, key, value):
+        self.memory.set(key, value)
+        if self.store is not None:
+            try:
+                await self.store.set(key, value, self.ttl)
+            except Exception as e:
+                print(f"[WARN] Report cache backend write failed: {e}")
+
+    def stats(self):
+        backend = type(self.store).__name__ if self.store is not None else "memory"
+        return {"backend": backend, "size": len(self.memory), **self.counters}
+
+
+def _make_store():
+    if REPORT_CACHE_BACKEND == "sqlite":
+        return SQLiteReportStore(REPORT_CACHE_SQLITE_PATH)
+    if REPORT_CACHE_BACKEND == "mongo":
+        return MongoReportStore()
+    return None
+
+
+report_cache = ReportCache(REPORT_CACHE_SIZE, REPORT_CACHE_TTL, _make_store())
@@ -0,0 +1,81 @@
+import hashlib
+import json
+import os
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from app.core.cache import TTLCache
+from app.core.metrics import Counter
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# computed /predict and /ecg results, keyed by the version of their inputs
+RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", 10000))
+RESULT_CACHE_TTL = float(os.getenv("RESULT_CACHE_TTL", 600))
+
+conditional_requests_total = Counter(
+    "conditional_requests_total", "Polls of versioned routes by outcome.", ("route", "outcome")
+)
+
+
+def _digest(*parts) -> str:
+    raw = json.dumps(parts, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.blake2b(raw.encode(), digest_size=12).hexdigest()
+
+
+def profile_version(features: dict) -> str:
+    # the feature values themselves, so every worker derives the same version
+    return _digest(features)
+
+
+def realtime_version(realtime_data, realtime_meta: dict):
+    """The device's upload timestamp; snapshots without one fall back to when they were received."""
+    if not realtime_data:
+        return None
+    return realtime_data.get("timestamp") or realtime_meta.get("received_at")
+
+
+def result_etag(route: str, user_id: str, *inputs) -> str:
+    # weak: the body also carries realtime age, which moves on without the result changing
+    return f'W/"{_digest(route, user_id, *inputs)}"'
+
+
+def last_modified(user_doc: dict, realtime_meta: dict):
+    times = []
+    updated = user_doc.get("profile_updated_at")
+    if isinstance(updated, datetime):
+        times.append(updated if updated.tzinfo else updated.replace(tzinfo=timezone.utc))
+    if realtime_meta.get("received_at"):
+        times.append(datetime.fromisoformat(realtime_meta["received_at"]))
+    return format_datetime(max(times), usegmt=True) if times else None
+
+
+def not_modified(headers, etag: str, modified: str | None) -> bool:
+    """True when the client's copy is current; If-None-Match wins over If-Modified-Since."""
+    if_none_match = headers.get("if-none-match")
+    if if_none_match is not None:
+        if if_none_match.strip() == "*":
+            return True
+        opaque = etag[2:] if etag.startswith("W/") else etag
+        for tag in if_none_match.split(","):
+            tag = tag.strip()
+            if (tag[2:] if tag.startswith("W/") else tag) == opaque:
+                return True
+        return False
+    if_modified_since = headers.get("if-modified-since")
+    if if_modified_since and modified:
+        try:
+            return parsedate_to_datetime(modified) <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def version_headers(etag: str, modified: str | None) -> dict:
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if modified:
+        headers["Last-Modified"] = modified
+    return headers
+
+
+result_cache = TTLCache(maxsize=RESULT_CACHE_SIZE, ttl=RESULT_CACHE_TTL)
@@ -0,0 +1,328 @@
+"""
+Population risk scoring job.
+
+Streams the users collection in chunks, joins each user's latest heart rate
+from the realtime snapshot cache, scores whole chunks with the model in one
+vectorized call and writes `risk_probability` / `risk_percentage` back with a
+fingerprint of the inputs (features, heart rate and model hash).
+
+A full run visits every user. An incremental run only visits users that were
+never scored, whose profile changed (`profile_updated_at`) or whose realtime
+snapshot changed since the previous run started; users whose fingerprint is
+unchanged are not written.
+
+Inside the app it runs every RISK_JOB_INTERVAL seconds (0 disables it). A
+Mongo lease makes sure only one worker/instance runs it at a time. Run by hand:
+
+    python -m app.core.riskjob            # incremental
+    python -m app.core.riskjob --full
+"""
+import asyncio
+import hashlib
+import os
+import socket
+import time
+import uuid
+from datetime import datetime, timedelta
+import numpy as np
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError
+from bson import ObjectId
+from app.core.database import get_db, users_collection, USER_FEATURE_PROJECTION
+from app.core.modelstore import model_store
+from app.core.realtime import realtime_store, heart_rate_of
+from app.core.scorer import build_feature_matrix, format_prediction
+from app.core.metrics import Counter, Gauge, Histogram
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# risk job conf.
+RISK_JOB_INTERVAL = float(os.getenv("RISK_JOB_INTERVAL", 0))         # seconds between incremental runs
+RISK_JOB_CHUNK_SIZE = int(os.getenv("RISK_JOB_CHUNK_SIZE", 5000))
+RISK_JOB_PROGRESS_EVERY = float(os.getenv("RISK_JOB_PROGRESS_EVERY", 10))
+RISK_JOB_LEASE = float(os.getenv("RISK_JOB_LEASE", 300))            # renewed on every progress report
+
+JOB_ID = "risk_scores"
+RISK_JOB_PROJECTION = {**USER_FEATURE_PROJECTION, "risk_fingerprint": 1}
+
+risk_job_users_total = Counter("risk_job_users_total", "Users visited by the risk job.", ("outcome",))
+risk_job_runs_total = Counter("risk_job_runs_total", "Risk job runs.", ("mode", "outcome"))
+risk_job_duration_seconds = Histogram("risk_job_duration_seconds", "Risk job run time.", ("mode",),
+                                      buckets=(1, 5, 15, 30, 60, 120, 300, 600, 1800, 3600))
+risk_job_running = Gauge("risk_job_running", "1 while this process runs the risk job.")
+
+
+def latest_heart_rates(since: float | None = None):
+    """{user_id: heart rate} from the realtime cache; with `since`, only snapshots received after it."""
+    rates = {}
+    for user_id, snap in realtime_store.all_snapshots().items():
+        if since is not None and snap["received_at"] < since:
+            continue
+        hr = heart_rate_of(snap["data"])
+        rates[user_id] = np.nan if hr is None else hr
+    return rates
+
+
+def score_chunk(docs: list[dict], heart_rates: dict, scorer, model_key: bytes, scored_at: datetime):
+    """Scores one chunk; returns (bulk write ops, counts). Pure CPU, run off the event loop."""
+    hr = np.array([heart_rates.get(str(doc["_id"]), np.nan) for doc in docs], dtype=np.float64)
+    X = build_feature_matrix(docs, hr)
+    has_hr = ~np.isnan(hr)
+    probs = np.full(len(docs), np.nan)
+    if has_hr.any():
+        probs[has_hr] = scorer.score(X[has_hr])
+
+    ops = []
+    unchanged = 0
+    for i, doc in enumerate(docs):
+        fingerprint = hashlib.blake2b(X[i].tobytes(), digest_size=8, key=model_key).hexdigest()
+        if doc.get("risk_fingerprint") == fingerprint:
+            unchanged += 1
+            continue
+        update = {"risk_fingerprint": fingerprint, "risk_scored_at": scored_at}
+        if has_hr[i]:
+            # rounded exactly as /predict rounds, so stored and live scores agree
+            update.update(format_prediction(probs[i]))
+        # without a heart rate the previous score (if any) is kept; the user is only marked visited
+        ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": update}))
+    counts = {"scored": int(has_hr.sum()), "no_heart_rate": int((~has_hr).sum()), "unchanged": unchanged}
+    return ops, counts
+
+
+class RiskJob:
+    def __init__(self, chunk_size: int = RISK_JOB_CHUNK_SIZE, interval: float = RISK_JOB_INTERVAL):
+        self.chunk_size = chunk_size
+        self.interval = interval
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.running = False
+        self.progress = {}
+        self.last_run = None
+        self._task = None
+        self._indexed = False
+
+    # --- lease ------------------------------------------------------------
+
+    def _jobs(self):
+        return get_db()["jobs"]
+
+    async def _acquire(self):
+        now = datetime.utcnow()
+        try:
+            return await self._jobs().find_one_and_update(
+                {"_id": JOB_ID, "$or": [{"lease_until": {"$lt": now}}, {"lease_until": {"$exists": False}}]},
+                {"$set": {"lease_owner": self.owner, "lease_until": now + timedelta(seconds=RISK_JOB_LEASE)}},
+                upsert=True, return_document=ReturnDocument.AFTER,
+            )
+        except DuplicateKeyError:
+            # the document exists and its lease is held by someone else
+            return None
+
+    async def _renew(self):
+        await self._jobs().update_one(
+            {"_id": JOB_ID, "lease_owner": self.owner},
+            {"$set": {"lease_until": datetime.utcnow() + timedelta(seconds=RISK_JOB_LEASE)}},
+        )
+
+    async def _release(self, completed_from: datetime | None):
+        update = {"lease_until": datetime.utcnow()}
+        if completed_from is not None:
+            update["last_started_at"] = completed_from
+        await self._jobs().update_one({"_id": JOB_ID, "lease_owner": self.owner}, {"$set": update})
+
+    async def _ensure_indexes(self):
+        if self._indexed:
+            return
+        users = users_collection()
+        await users.create_index("profile_updated_at", sparse=True)
+        await users.create_index("risk_scored_at")
+        # triage: "highest risk first"
+        await users.create_index([("risk_probability", -1)])
+        self._indexed = True
+
+    # --- one run ----------------------------------------------------------
+
+    async def run(self, full: bool = False):
+        """Runs once if no one else holds the lease; returns the run summary, or None if skipped."""
+        if self.running:
+            return None
+        lease = await self._acquire()
+        if lease is None:
+            print("[INFO] Risk job already running elsewhere, skipping")
+            return None
+
+        mode = "full" if full or not lease.get("last_started_at") else "incremental"
+        started_at = datetime.utcnow()
+        start_wall, start = time.time(), time.perf_counter()
+        self.running = True
+        risk_job_running.set(1)
+        outcome = "error"
+        try:
+            await self._ensure_indexes()
+            scorer = model_store.get()
+            model_key = bytes.fromhex(model_store.sha256 or "")[:32]
+            since = lease.get("last_started_at")
+            summary = await self._run(mode, scorer, model_key, since, started_at, start)
+            outcome = "ok"
+        except Exception as e:
+            print(f"[ERROR] Risk job ({mode}) failed: {type(e).__name__}: {e}")
+            self.last_run = {"mode": mode, "outcome": "error", "error": f"{type(e).__name__}: {e}",
+                             "started_at": start_wall}
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            risk_job_runs_total.inc(mode=mode, outcome=outcome)
+            risk_job_duration_seconds.observe(elapsed, mode=mode)
+            risk_job_running.set(0)
+            self.running = False
+            await self._release(started_at if outcome == "ok" else None)
+
+        self.last_run = summary
+        print(f"[INFO] Risk job ({mode}) done: {summary['visited']} users in {summary['seconds']}s "
+              f"({summary['users_per_s']} users/s), {summary['written']} written, "
+              f"{summary['unchanged']} unchanged, {summary['no_heart_rate']} without heart rate")
+        return summary
+
+    def _candidates(self, mode, since):
+        users = users_collection()
+        if mode == "full":
+            query = {}
+        else:
+            query = {"$or": [{"risk_scored_at": {"$exists": False}}, {"profile_updated_at": {"$gte": since}}]}
+        return query, users.find(query, RISK_JOB_PROJECTION, batch_size=self.chunk_size)
+
+    async def _run(self, mode, scorer, model_key, since, started_at, start):
+        users = users_collection()
+        heart_rates = latest_heart_rates()
+        query, cursor = self._candidates(mode, since)
+        total = await users.estimated_document_count() if mode == "full" else await users.count_documents(query)
+
+        hr_changed = []
+        if mode == "incremental":
+            # users whose snapshot arrived since the last run; the profile query above may miss them
+            cutoff = since.timestamp() if since.tzinfo else (since - datetime(1970, 1, 1)).total_seconds()
+            hr_changed = [uid for uid in latest_heart_rates(cutoff) if ObjectId.is_valid(uid)]
+            total += len(hr_changed)
+
+        self.progress = {"mode": mode, "total": total, "visited": 0, "written": 0, "scored": 0,
+                         "unchanged": 0, "no_heart_rate": 0, "users_per_s": 0.0, "eta_s": None}
+        print(f"[INFO] Risk job ({mode}) started, ~{total} users to visit")
+        pending = None
+        next_report = time.perf_counter() + RISK_JOB_PROGRESS_EVERY
+        seen = set() if mode == "incremental" else None
+
+        async def flush(chunk):
+            nonlocal pending, next_report
+            ops, counts = await asyncio.to_thread(score_chunk, chunk, heart_rates, scorer, model_key, started_at)
+            # one chunk's writes overlap with reading and scoring the next one
+            if pending is not None:
+                await pending
+            pending = asyncio.ensure_future(users.bulk_write(ops, ordered=False)) if ops else None
+            self._count(len(chunk), len(ops), counts, start)
+            if time.perf_counter() >= next_report:
+                next_report = time.perf_counter() + RISK_JOB_PROGRESS_EVERY
+                self._report()
+                await self._renew()
+
+        chunk = []
+        async for doc in cursor:
+            if seen is not None:
+                seen.add(str(doc["_id"]))
+            chunk.append(doc)
+            if len(chunk) >= self.chunk_size:
+                await flush(chunk)
+                chunk = []
+        if chunk:
+            await flush(chunk)
+
+        remaining = [ObjectId(uid) for uid in hr_changed if uid not in seen] if hr_changed else []
+        for i in range(0, len(remaining), self.chunk_size):
+            ids = remaining[i:i + self.chunk_size]
+            docs = await users.find({"_id": {"$in": ids}}, RISK_JOB_PROJECTION).to_list(None)
+            if docs:
+                await flush(docs)
+        if pending is not None:
+            await pending
+
+        elapsed = time.perf_counter() - start
+        return {**self.progress, "eta_s": 0, "seconds": round(elapsed, 2),
+                "users_per_s": round(self.progress["visited"] / elapsed, 1) if elapsed else 0.0,
+                "started_at": started_at.isoformat() + "Z", "outcome": "ok"}
+
+    def _count(self, visited, written, counts, start):
+        p = self.progress
+        p["visited"] += visited
+        p["written"] += written
+        for key, n in counts.items():
+            p[key] += n
+        risk_job_users_total.inc(counts["scored"], outcome="scored")
+        risk_job_users_total.inc(counts["no_heart_rate"], outcome="no_heart_rate")
+        risk_job_users_total.inc(counts["unchanged"], outcome="unchanged")
+        elapsed = time.perf_counter() - start
+        p["users_per_s"] = round(p["visited"] / elapsed, 1) if elapsed else 0.0
+        left = max(0, p["total"] - p["visited"])
+        p["eta_s"] = round(left / p["users_per_s"], 1) if p["users_per_s"] else None
+
+    def _report(self):
+        p = self.progress
+        pct = 100 * p["visited"] / p["total"] if p["total"] else 100.0
+        print(f"[INFO] Risk job ({p['mode']}): {p['visited']}/{p['total']} users ({pct:.1f}%), "
+              f"{p['users_per_s']} users/s, {p['written']} written, eta {p['eta_s']}s")
+
+    # --- scheduling -------------------------------------------------------
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            # without heart rates every user would come out unscored
+            if not model_store.ready or not realtime_store.ready:
+                print("[WARN] Risk job skipped: model or realtime cache not ready")
+                continue
+            try:
+                await self.run()
+            except Exception:
+                pass  # already logged; try again next interval
+
+    async def start(self):
+        if self.interval <= 0 or self._task is not None:
+            return
+        self._task = asyncio.create_task(self._loop())
+        print(f"[INFO] Risk job scheduled every {self.interval:.0f}s")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def stats(self):
+        return {"running": self.running, "interval_s": self.interval, "progress": self.progress,
+                "last_run": self.last_run}
+
+
+risk_job = RiskJob()
+
+
+async def _main(args):
+    from app.core.database import connect_to_mongo, close_mongo_connection
+    from app.core.realtime import init_firebase
+
+    await connect_to_mongo()
+    model_store.load()
+    if not args.no_realtime:
+        init_firebase()
+        await realtime_store.refresh()
+        print(f"[INFO] Loaded {realtime_store.stats()['users']} realtime snapshots")
+    job = RiskJob(chunk_size=args.chunk_size, interval=0)
+    await job.run(full=args.full)
+    close_mongo_connection()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--full", action="store_true", help="rescore every user, not only changed ones")
+    parser.add_argument("--chunk-size", type=int, default=RISK_JOB_CHUNK_SIZE)
+    parser.add_argument("--no-realtime", action="store_true", help="skip the Firebase read (no heart rates)")
+    asyncio.run(_main(parser.parse_args()))
@@ -0,0 +1,72 @@
+import numpy as np
+
+FEATURES = [
+    "male", "age", "currentSmoker", "cigsPerDay", "BPMeds",
+    "prevalentStroke", "prevalentHyp", "diabetes", "totChol",
+    "sysBP", "diaBP", "BMI", "glucose", "heart_rate"
+]
+PROFILE_FEATURES = FEATURES[:-1]
+
+
+class RiskScorer:
+    """Logistic-regression scorer reduced to one weight vector and a bias.
+
+    The optional StandardScaler is folded into the weights once, so scoring is
+    a single matrix-vector product followed by a sigmoid.
+    """
+
+    def __init__(self, coef, intercept, mean=None, scale=None):
+        weights = np.asarray(coef, dtype=np.float64).ravel()
+        bias = float(np.ravel(intercept)[0])
+        if mean is not None and scale is not None:
+            scale = np.asarray(scale, dtype=np.float64).ravel()
+            mean = np.asarray(mean, dtype=np.float64).ravel()
+            weights = weights / scale
+            bias = bias - float(np.dot(weights, mean))
+        if weights.shape[0] != len(FEATURES):
+            raise ValueError(f"Model expects {weights.shape[0]} features, scorer knows {len(FEATURES)}")
+        self.weights = np.ascontiguousarray(weights)
+        self.bias = bias
+
+    @classmethod
+    def from_estimator(cls, model, scaler=None):
+        # sklearn Pipeline(scaler, classifier) is unpacked as well
+        if hasattr(model, "steps"):
+            scaler = scaler or next((step for _, step in model.steps[:-1] if hasattr(step, "mean_")), None)
+            model = model.steps[-1][1]
+        mean = getattr(scaler, "mean_", None) if scaler is not None else None
+        scale = getattr(scaler, "scale_", None) if scaler is not None else None
+        return cls(model.coef_, model.intercept_, mean, scale)
+
+    def save(self, path: str):
+        with open(path, "wb") as f:
+            np.savez(f, weights=self.weights, bias=np.float64(self.bias))
+
+    @classmethod
+    def load(cls, path: str):
+        # the reduced form only; scaler folding already happened before save()
+        with np.load(path) as data:
+            return cls(data["weights"], [float(data["bias"])])
+
+    def score(self, X) -> np.ndarray:
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X[None, :]
+        z = X @ self.weights + self.bias
+        # stable sigmoid: 1 / (1 + exp(-z)) without overflow for large |z|
+        return np.exp(-np.logaddexp(0.0, -z))
+
+
+def build_feature_matrix(users: list[dict], heart_rates) -> np.ndarray:
+    X = np.zeros((len(users), len(FEATURES)), dtype=np.float64)
+    for i, user in enumerate(users):
+        X[i, :-1] = [user.get(f) or 0 for f in PROFILE_FEATURES]
+    X[:, -1] = np.asarray(heart_rates, dtype=np.float64)
+    return X
+
+
+def format_prediction(prob: float):
+    return {
+        "risk_probability": float(np.round(prob, 3)),
+        "risk_percentage": float(np.round(prob * 100, 2))
+    }
@@ -4,17 +4,18 @@ from pydantic import BaseModel, EmailStr, Field
 from passlib.context import CryptContext
 from datetime import datetime, timedelta
 from jose import jwt, JWTError
-from pymongo import MongoClient
+from app.core.database import find_user_by_email, USER_PUBLIC_PROJECTION, USER_RESPONSE_EXCLUDED
+from app.core.cache import TTLCache
+from app.core.metrics import span
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+import asyncio
+import hashlib
+import time
 import os
 from dotenv import load_dotenv
 
 load_dotenv()
 
-# MongoDB connection
-client = MongoClient(os.getenv("MONGO_URL"))
-db = client[os.getenv("DB_NAME")]
-users_collection = db["users"]
-
 # security conf.
 SECRET_KEY = os.getenv("SECRET_KEY", "your_secret_key_here")
 ALGORITHM = "HS256"
@@ -37,7 +38,136 @@ def verify_password(plain_password: str, hashed_password: str):
     return pwd_context.verify(plain_password, hashed_password)
 
 
+# bcrypt worker pool, keeps hashing off the event loop.
+# At most HASH_WORKERS hashes run at once and HASH_QUEUE_SIZE more may wait;
+# anything beyond that waits HASH_QUEUE_TIMEOUT seconds and is then rejected with 503.
+HASH_POOL = os.getenv("HASH_POOL", "thread")  # "thread" or "process"
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", 4))
+HASH_QUEUE_SIZE = int(os.getenv("HASH_QUEUE_SIZE", 64))
+HASH_QUEUE_TIMEOUT = float(os.getenv("HASH_QUEUE_TIMEOUT", 2.0))
+
+_hash_executor = None
+_hash_slots = None
+_hash_slots_loop = None
+_hash_in_flight = 0
+
+
+def _get_hash_executor():
+    global _hash_executor
+    if _hash_executor is None:
+        if HASH_POOL == "process":
+            _hash_executor = ProcessPoolExecutor(max_workers=HASH_WORKERS)
+        else:
+            _hash_executor = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix="bcrypt")
+    return _hash_executor
+
+
+def _get_hash_slots():
+    global _hash_slots, _hash_slots_loop
+    loop = asyncio.get_running_loop()
+    if _hash_slots is None or _hash_slots_loop is not loop:
+        _hash_slots = asyncio.Semaphore(HASH_WORKERS + HASH_QUEUE_SIZE)
+        _hash_slots_loop = loop
+    return _hash_slots
+
+
+async def _run_in_hash_pool(func, *args):
+    global _hash_in_flight
+    slots = _get_hash_slots()
+    try:
+        await asyncio.wait_for(slots.acquire(), timeout=HASH_QUEUE_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Server busy, please retry shortly",
+            headers={"Retry-After": "1"},
+        )
+    _hash_in_flight += 1
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_get_hash_executor(), func, *args)
+    finally:
+        _hash_in_flight -= 1
+        slots.release()
+
+
+async def hash_password_async(password: str):
+    return await _run_in_hash_pool(get_password_hash, password)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str):
+    return await _run_in_hash_pool(verify_password, plain_password, hashed_password)
+
+
+def hash_pool_stats():
+    return {
+        "pool": HASH_POOL,
+        "workers": HASH_WORKERS,
+        "queue_size": HASH_QUEUE_SIZE,
+        "in_flight": _hash_in_flight,
+    }
+
+
+def shutdown_hash_pool():
+    global _hash_executor
+    if _hash_executor is not None:
+        _hash_executor.shutdown(wait=False, cancel_futures=True)
+        _hash_executor = None
+
+
+# authenticated-user caches (per process).
+# Verified JWT claims live until the token's own exp; profiles live USER_CACHE_TTL
+# seconds and are dropped explicitly whenever the user document is written.
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", 10000))
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", 30))
+CLAIMS_CACHE_SIZE = int(os.getenv("CLAIMS_CACHE_SIZE", 10000))
+
+claims_cache = TTLCache(maxsize=CLAIMS_CACHE_SIZE)
+user_cache = TTLCache(maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL)
+
+
+def invalidate_user_cache(email: str):
+    user_cache.pop(email)
+
+
+def decode_token_email(token: str):
+    """The verified subject of a bearer token, or None; raises JWTError for an invalid token."""
+    digest = hashlib.sha256(token.encode()).hexdigest()
+    email = claims_cache.get(digest)
+    if email is not None:
+        return email
+
+    payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    email = payload.get("sub")
+    if email is None:
+        return None
+    exp = payload.get("exp")
+    if exp is not None:
+        ttl = exp - time.time()
+        if ttl > 0:
+            claims_cache.set(digest, email, ttl=ttl)
+    return email
+
+
 # current user function
+async def load_user_profile(email: str):
+    """Public profile (no password hash) for `email`, served from user_cache when warm."""
+    user = user_cache.get(email)
+    if user is None:
+        with span("mongo_user"):
+            user = await find_user_by_email(email, USER_PUBLIC_PROJECTION)
+        if user is None:
+            return None
+        user["_id"] = str(user["_id"])
+        user_cache.set(email, user)
+    return dict(user)
+
+
+def public_profile(user: dict) -> dict:
+    """The loaded profile as sent back to its owner, without server-side bookkeeping."""
+    return {k: v for k, v in user.items() if k not in USER_RESPONSE_EXCLUDED}
+
+
 async def get_current_user(token: str = Depends(oauth2_scheme)):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -46,17 +176,24 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
     )
 
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email: str = payload.get("sub")
+        with span("jwt_decode"):
+            email = decode_token_email(token)
         if email is None:
             raise credentials_exception
     except JWTError:
         raise credentials_exception
 
-    user = users_collection.find_one({"email": email})
+    user = await load_user_profile(email)
     if user is None:
         raise credentials_exception
+    return user
+
+
+# roles are set on the user document by an operator; registration never grants one
+CLINICIAN_ROLES = {r.strip() for r in os.getenv("CLINICIAN_ROLES", "clinician,admin").split(",") if r.strip()}
+
 
-    user["_id"] = str(user["_id"])
-    user.pop("password", None)
-    return user
\ No newline at end of file
+async def require_clinician(current_user: dict = Depends(get_current_user)):
+    if current_user.get("role") not in CLINICIAN_ROLES:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Clinician access required")
+    return current_user
@@ -1,17 +1,7 @@
-import os
 import random
-import time
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+from app.core.mailer import email_dispatcher
+from app.core.otpstore import otp_store, otp_digest, OTPRateLimited, OTP_TTL, OTP_OK, OTP_MISSING, OTP_LOCKED
 
-# env variables
-SMTP_SERVER = os.getenv("SMTP_SERVER", "smtp.gmail.com")
-SMTP_PORT = int(os.getenv("SMTP_PORT", 587))
-SMTP_USER = os.getenv("SMTP_USER") 
-SMTP_PASSWORD = os.getenv("SMTP_PASSWORD") 
-
-otp_store = {}
 TEST_EMAIL = "test@example.com"
 TEST_OTP = "1000"
 
@@ -21,66 +11,49 @@ def generate_otp(length=4) -> str:
 
 # send email and otp functions
 def send_email(to_email: str, subject: str, message: str) -> bool:
-    try:
-        msg = MIMEMultipart()
-        msg["From"] = SMTP_USER
-        msg["To"] = to_email
-        msg["Subject"] = subject
-
-        msg.attach(MIMEText(message, "plain"))
-
-        with smtplib.SMTP(SMTP_SERVER, SMTP_PORT) as server:
-            server.starttls()
-            server.login(SMTP_USER, SMTP_PASSWORD)
-            server.send_message(msg)
-
-        print(f"[INFO] OTP email sent to {to_email}")
-        return True
+    # hands the message to the background dispatcher; True means it was accepted for delivery
+    return email_dispatcher.enqueue(to_email, subject, message)
 
-    except Exception as e:
-        print(f"[ERROR] Failed to send email: {e}")
-        return False
 
-
-def send_otp(email: str) -> bool:
+async def send_otp(email: str) -> bool:
     if email == TEST_EMAIL:
-        otp_store[email] = {"otp": TEST_OTP, "timestamp": time.time()}
+        await otp_store.put(email, otp_digest(email, TEST_OTP))
         print(f"[INFO] Test OTP '{TEST_OTP}' stored for {email}")
         return True
 
+    retry_after = await otp_store.allow_send(email)
+    if retry_after:
+        print(f"[WARN] OTP send limit reached for {email}")
+        raise OTPRateLimited(retry_after)
+
     otp = generate_otp()
     subject = "Your Verification Code"
-    message = f"Your OTP for verification is: {otp}\n\nThis code will expire in 5 minutes."
+    message = f"Your OTP for verification is: {otp}\n\nThis code will expire in {int(OTP_TTL // 60)} minutes."
 
-    sent = send_email(email, subject, message)
-    if sent:
-        otp_store[email] = {"otp": otp, "timestamp": time.time()}
-        print(f"[INFO] OTP '{otp}' stored for {email}")
+    # stored before delivery: the queued email can reach the user before the
+    # route returns, and verification must already work by then
+    await otp_store.put(email, otp_digest(email, otp))
+    if send_email(email, subject, message):
+        print(f"[INFO] OTP stored for {email}")
         return True
-    else:
-        print(f"[ERROR] Could not send OTP to {email}")
-        return False
+    await otp_store.discard(email)
+    print(f"[ERROR] Could not send OTP to {email}")
+    return False
 
 
-def verify_otp(email: str, user_input_otp: str) -> bool:
+async def verify_otp(email: str, user_input_otp: str) -> bool:
     if email == TEST_EMAIL and user_input_otp == TEST_OTP:
         print(f"[INFO] Test OTP verified for {email}")
         return True
 
-    record = otp_store.get(email)
-    if not record:
-        print(f"[WARN] No OTP found for {email}")
-        return False
-
-    if time.time() - record['timestamp'] > 300:
-        print(f"[WARN] OTP expired for {email}")
-        del otp_store[email]
-        return False
-
-    if record['otp'] == user_input_otp:
+    outcome = await otp_store.check(email, otp_digest(email, user_input_otp))
+    if outcome == OTP_OK:
         print(f"[INFO] OTP verified for {email}")
-        del otp_store[email]
         return True
+    if outcome == OTP_MISSING:
+        print(f"[WARN] No valid OTP found for {email}")
+    elif outcome == OTP_LOCKED:
+        print(f"[WARN] Too many invalid OTP attempts for {email}; code discarded")
     else:
         print(f"[WARN] Invalid OTP for {email}")
-        return False
+    return False
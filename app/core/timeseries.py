@@ -0,0 +1,300 @@
+import asyncio
+import os
+import threading
+import time
+import zlib
+import numpy as np
+from app.core.ecg import ECG_SAMPLE_RATE
+from app.core.realtime import heart_rate_of, parse_device_timestamp
+
+# time-series store conf.
+TS_CHUNK_SIZE = int(os.getenv("TS_CHUNK_SIZE", 4096))             # samples per raw chunk
+TS_MAX_RAW_CHUNKS = int(os.getenv("TS_MAX_RAW_CHUNKS", 512))      # sealed raw chunks kept per series
+TS_MAX_ROLLUP_BUCKETS = int(os.getenv("TS_MAX_ROLLUP_BUCKETS", 60 * 24 * 90))  # per series and resolution
+TS_INGEST_DEBOUNCE_S = float(os.getenv("TS_INGEST_DEBOUNCE_S", 2.0))
+
+ROLLUP_RESOLUTIONS = {"1m": 60_000, "1h": 3_600_000}
+
+
+_INT32_MAX = np.iinfo(np.int32).max
+
+
+class _SealedChunk:
+    __slots__ = ("t_start", "t_end", "count", "payload", "delta_dtype")
+
+    def __init__(self, t_start, t_end, count, payload, delta_dtype=np.int32):
+        self.t_start = t_start
+        self.t_end = t_end
+        self.count = count
+        self.payload = payload
+        self.delta_dtype = delta_dtype
+
+
+class _Rollup:
+    """Per-bucket count/sum/min/max held in parallel growable arrays."""
+
+    def __init__(self, width_ms: int):
+        self.width = width_ms
+        self.size = 0
+        self.start = np.empty(64, dtype=np.int64)
+        self.count = np.empty(64, dtype=np.int64)
+        self.sum = np.empty(64, dtype=np.float64)
+        self.min = np.empty(64, dtype=np.float32)
+        self.max = np.empty(64, dtype=np.float32)
+
+    def _grow(self, needed):
+        cap = len(self.start)
+        if needed <= cap:
+            return
+        cap = max(needed, cap * 2)
+        for name in ("start", "count", "sum", "min", "max"):
+            arr = getattr(self, name)
+            grown = np.empty(cap, dtype=arr.dtype)
+            grown[:self.size] = arr[:self.size]
+            setattr(self, name, grown)
+
+    def add(self, ts: np.ndarray, values: np.ndarray):
+        buckets = ts // self.width * self.width
+        order = np.argsort(buckets, kind="stable")
+        buckets, vals = buckets[order], values[order].astype(np.float64)
+        starts, first = np.unique(buckets, return_index=True)
+        counts = np.diff(np.append(first, len(buckets)))
+        sums = np.add.reduceat(vals, first)
+        mins = np.minimum.reduceat(vals, first)
+        maxs = np.maximum.reduceat(vals, first)
+
+        # buckets that already exist are merged in place, new ones are inserted in order
+        pos = np.searchsorted(self.start[:self.size], starts)
+        exists = np.zeros(len(starts), dtype=bool)
+        inside = pos < self.size
+        exists[inside] = self.start[pos[inside]] == starts[inside]
+        if exists.any():
+            p = pos[exists]
+            self.count[p] += counts[exists]
+            self.sum[p] += sums[exists]
+            self.min[p] = np.minimum(self.min[p], mins[exists])
+            self.max[p] = np.maximum(self.max[p], maxs[exists])
+        new = ~exists
+        if new.any():
+            n_new = int(new.sum())
+            if self.size == 0 or starts[new][0] > self.start[self.size - 1]:
+                # common case: appending newer buckets at the end
+                self._grow(self.size + n_new)
+                sl = slice(self.size, self.size + n_new)
+                self.start[sl], self.count[sl], self.sum[sl] = starts[new], counts[new], sums[new]
+                self.min[sl], self.max[sl] = mins[new], maxs[new]
+                self.size += n_new
+            else:
+                at = pos[new]
+                merged = {}
+                for name, add in (("start", starts), ("count", counts), ("sum", sums), ("min", mins), ("max", maxs)):
+                    merged[name] = np.insert(getattr(self, name)[:self.size], at, add[new])
+                self.size += n_new
+                self._grow(self.size)
+                for name, arr in merged.items():
+                    getattr(self, name)[:self.size] = arr
+
+        if self.size > TS_MAX_ROLLUP_BUCKETS:
+            drop = self.size - TS_MAX_ROLLUP_BUCKETS
+            for name in ("start", "count", "sum", "min", "max"):
+                arr = getattr(self, name)
+                arr[:self.size - drop] = arr[drop:self.size]
+            self.size -= drop
+
+    def query(self, t_from: int, t_to: int):
+        lo = np.searchsorted(self.start[:self.size], t_from - self.width + 1)
+        hi = np.searchsorted(self.start[:self.size], t_to, side="right")
+        count = self.count[lo:hi]
+        return {
+            "t": self.start[lo:hi],
+            "mean": self.sum[lo:hi] / np.maximum(count, 1),
+            "min": self.min[lo:hi],
+            "max": self.max[lo:hi],
+            "count": count,
+        }
+
+    def nbytes(self):
+        return sum(getattr(self, n).nbytes for n in ("start", "count", "sum", "min", "max"))
+
+
+class Series:
+    """Append-only series: one open chunk of numpy arrays plus zlib-compressed sealed chunks.
+
+    Timestamps are epoch milliseconds. Sealed chunks store delta-encoded
+    timestamps and raw values, so regular sampling compresses very well.
+    """
+
+    def __init__(self, dtype, rollups=("1m", "1h")):
+        self.dtype = np.dtype(dtype)
+        # the open chunk starts small and doubles up to TS_CHUNK_SIZE, so idle users stay cheap
+        self._ts = np.empty(min(64, TS_CHUNK_SIZE), dtype=np.int64)
+        self._vals = np.empty(min(64, TS_CHUNK_SIZE), dtype=self.dtype)
+        self._n = 0
+        self.chunks = []
+        self.dropped_chunks = 0
+        self.total = 0
+        self.rollups = {name: _Rollup(ROLLUP_RESOLUTIONS[name]) for name in rollups}
+        self._lock = threading.Lock()
+
+    def append(self, ts, values):
+        ts = np.asarray(ts, dtype=np.int64)
+        values = np.asarray(values).astype(self.dtype, copy=False)
+        if ts.size == 0:
+            return
+        with self._lock:
+            for rollup in self.rollups.values():
+                rollup.add(ts, values)
+            i = 0
+            while i < ts.size:
+                take = min(TS_CHUNK_SIZE - self._n, ts.size - i)
+                self._reserve(self._n + take)
+                self._ts[self._n:self._n + take] = ts[i:i + take]
+                self._vals[self._n:self._n + take] = values[i:i + take]
+                self._n += take
+                i += take
+                if self._n == TS_CHUNK_SIZE:
+                    self._seal()
+            self.total += ts.size
+
+    def _reserve(self, needed):
+        cap = len(self._ts)
+        if needed <= cap:
+            return
+        cap = min(TS_CHUNK_SIZE, max(needed, cap * 2))
+        ts, vals = np.empty(cap, dtype=np.int64), np.empty(cap, dtype=self.dtype)
+        ts[:self._n], vals[:self._n] = self._ts[:self._n], self._vals[:self._n]
+        self._ts, self._vals = ts, vals
+
+    def _seal(self):
+        order = np.argsort(self._ts[:self._n], kind="stable")
+        ts = self._ts[:self._n][order]
+        vals = self._vals[:self._n][order]
+        deltas = np.diff(ts, prepend=ts[0])
+        # int32 deltas cover gaps of up to ~24.8 days; a chunk spanning a longer gap keeps int64
+        delta_dtype = np.int32 if deltas.max() <= _INT32_MAX else np.int64
+        deltas = deltas.astype(delta_dtype)
+        header = np.array([ts[0]], dtype=np.int64).tobytes()
+        payload = zlib.compress(header + deltas.tobytes() + vals.tobytes(), 6)
+        self.chunks.append(_SealedChunk(int(ts[0]), int(ts[-1]), self._n, payload, delta_dtype))
+        # out-of-order chunks are rare; keep the list sorted by start time
+        if len(self.chunks) > 1 and self.chunks[-2].t_start > self.chunks[-1].t_start:
+            self.chunks.sort(key=lambda c: c.t_start)
+        if len(self.chunks) > TS_MAX_RAW_CHUNKS:
+            drop = len(self.chunks) - TS_MAX_RAW_CHUNKS
+            del self.chunks[:drop]
+            self.dropped_chunks += drop
+        self._n = 0
+
+    def _decode(self, chunk: _SealedChunk):
+        raw = zlib.decompress(chunk.payload)
+        n = chunk.count
+        t0 = np.frombuffer(raw, dtype=np.int64, count=1)[0]
+        deltas = np.frombuffer(raw, dtype=chunk.delta_dtype, count=n, offset=8)
+        vals = np.frombuffer(raw, dtype=self.dtype, count=n, offset=8 + deltas.nbytes)
+        ts = t0 + np.cumsum(deltas, dtype=np.int64)
+        return ts, vals
+
+    def range(self, t_from: int, t_to: int):
+        with self._lock:
+            parts = [c for c in self.chunks if c.t_end >= t_from and c.t_start <= t_to]
+            open_ts = self._ts[:self._n].copy()
+            open_vals = self._vals[:self._n].copy()
+        ts_parts, val_parts = [], []
+        for chunk in parts:
+            ts, vals = self._decode(chunk)
+            lo, hi = np.searchsorted(ts, t_from), np.searchsorted(ts, t_to, side="right")
+            ts_parts.append(ts[lo:hi])
+            val_parts.append(vals[lo:hi])
+        if open_ts.size:
+            mask = (open_ts >= t_from) & (open_ts <= t_to)
+            order = np.argsort(open_ts[mask], kind="stable")
+            ts_parts.append(open_ts[mask][order])
+            val_parts.append(open_vals[mask][order])
+        if not ts_parts:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=self.dtype)
+        return np.concatenate(ts_parts), np.concatenate(val_parts)
+
+    def rollup(self, resolution: str, t_from: int, t_to: int):
+        with self._lock:
+            result = self.rollups[resolution].query(t_from, t_to)
+            return {k: v.copy() for k, v in result.items()}
+
+    def nbytes(self):
+        return (sum(len(c.payload) for c in self.chunks) + self._ts.nbytes + self._vals.nbytes
+                + sum(r.nbytes() for r in self.rollups.values()))
+
+
+def to_ecg_int16(values) -> np.ndarray:
+    """ECG is stored as int16 ADC counts; fractional (mV) input is stored in microvolts."""
+    arr = np.asarray(values, dtype=np.float64)
+    if arr.size and not np.all(arr == np.rint(arr)):
+        arr = arr * 1000
+    return np.clip(np.rint(arr), -32768, 32767).astype(np.int16)
+
+
+class TimeSeriesStore:
+    def __init__(self):
+        self._series = {}
+        self._lock = threading.Lock()
+        self._last_ingested = {}
+        self._pending = {}
+
+    def series(self, user_id: str, metric: str, create: bool = True):
+        key = (user_id, metric)
+        with self._lock:
+            s = self._series.get(key)
+            if s is None and create:
+                s = self._series[key] = Series(np.float32 if metric == "hr" else np.int16,
+                                               rollups=("1m", "1h") if metric == "hr" else ())
+            return s
+
+    def append_hr(self, user_id: str, ts_ms, values):
+        self.series(user_id, "hr").append(ts_ms, values)
+
+    def append_ecg(self, user_id: str, end_ts_ms: int, samples, fs: float = ECG_SAMPLE_RATE):
+        samples = to_ecg_int16(samples)
+        # the window is timestamped at upload time, i.e. at its last sample
+        step = 1000.0 / fs
+        ts = end_ts_ms - np.round(np.arange(samples.size - 1, -1, -1) * step).astype(np.int64)
+        self.series(user_id, "ecg").append(ts, samples)
+
+    def ingest_snapshot(self, user_id: str, realtime: dict):
+        if not isinstance(realtime, dict):
+            return
+        ts = parse_device_timestamp(realtime.get("timestamp"), int(time.time() * 1000))
+        if self._last_ingested.get(user_id) == ts:
+            return
+        self._last_ingested[user_id] = ts
+        hr = heart_rate_of(realtime)
+        if hr is not None:
+            self.append_hr(user_id, [ts], [hr])
+        ecg = realtime.get("ecg_data")
+        if isinstance(ecg, list) and ecg:
+            self.append_ecg(user_id, ts, ecg)
+
+    def on_realtime_update(self, user_id: str, realtime):
+        # device writes land as several events (HR, timestamp, ECG); ingest once they settle
+        handle = self._pending.pop(user_id, None)
+        if handle is not None:
+            handle.cancel()
+        loop = asyncio.get_running_loop()
+        self._pending[user_id] = loop.call_later(TS_INGEST_DEBOUNCE_S, self._flush, user_id, realtime)
+
+    def _flush(self, user_id, realtime):
+        self._pending.pop(user_id, None)
+        try:
+            self.ingest_snapshot(user_id, realtime)
+        except Exception as e:
+            print(f"[ERROR] Failed to ingest realtime snapshot for {user_id}: {e}")
+
+    def stats(self):
+        with self._lock:
+            series = list(self._series.values())
+        return {
+            "series": len(series),
+            "samples": sum(s.total for s in series),
+            "bytes": sum(s.nbytes() for s in series),
+        }
+
+
+timeseries_store = TimeSeriesStore()
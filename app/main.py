@@ -1,22 +1,76 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
+from app.core.database import connect_to_mongo, close_mongo_connection, ensure_indexes
+from app.core.securitycore import shutdown_hash_pool
 from app.routes.user import router as user_router
 from app.routes.predict import router as predict_router
-import os, time
+from app.routes.history import router as history_router
+from app.routes.ingest import router as ingest_router
+from app.routes.metrics import router as metrics_router
+from app.routes.health import router as health_router
+from app.routes.patients import router as patients_router
+from app.core.metrics import MetricsMiddleware
+from app.core.admission import AdmissionMiddleware
+from app.core.compression import CompressionMiddleware, RESPONSE_COMPRESSION
+from app.core.jsonresponse import ORJSONResponse
+from app.core.mailer import email_dispatcher
+from app.core.mlllm import risk_batcher
+from app.core.modelstore import model_store
+from app.core.riskjob import risk_job
+from app.core.realtime import init_firebase, realtime_store
+from app.core.timeseries import timeseries_store
+import os
 
 load_dotenv()
 
-app = FastAPI()
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # the model loads in the background; /ready reports when it is warm
+    await model_store.start()
+    await connect_to_mongo()
+    await ensure_indexes()
+    init_firebase()
+    # every new realtime snapshot is also appended to the per-user history
+    realtime_store.subscribers.append(timeseries_store.on_realtime_update)
+    await realtime_store.start()
+    await email_dispatcher.start()
+    await risk_job.start()
+    yield
+    await risk_job.stop()
+    await email_dispatcher.stop()
+    await realtime_store.stop()
+    await risk_batcher.close()
+    await model_store.stop()
+    close_mongo_connection()
+    shutdown_hash_pool()
+
+
+# route return values are serialized by orjson
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
+
+# innermost, so shed requests still get CORS headers and show up in the request metrics
+app.add_middleware(AdmissionMiddleware)
+if RESPONSE_COMPRESSION != "off":
+    app.add_middleware(CompressionMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # ETag so cross-origin clients can send If-None-Match on /me, /predict and /ecg
+    expose_headers=["Server-Timing", "ETag"],
 )
+# outermost, so request latency includes CORS handling
+app.add_middleware(MetricsMiddleware)
 
 app.include_router(user_router)
 app.include_router(predict_router)
-
+app.include_router(history_router)
+app.include_router(ingest_router)
+app.include_router(metrics_router)
+app.include_router(health_router)
+app.include_router(patients_router)
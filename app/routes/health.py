@@ -0,0 +1,28 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+from app.core.modelstore import model_store
+from app.core.realtime import realtime_store
+from dotenv import load_dotenv
+
+load_dotenv()
+
+router = APIRouter()
+
+
+# liveness: the process is up and serving
+@router.get("/health", include_in_schema=False)
+async def health():
+    return {"status": "ok"}
+
+
+# readiness: 503 until the risk model is loaded, so load balancers hold traffic back
+@router.get("/ready", include_in_schema=False)
+async def ready():
+    body = {
+        "status": "ready" if model_store.ready else "starting",
+        "model": model_store.stats(),
+        "realtime": {"mode": realtime_store.mode, "ready": realtime_store.ready},
+    }
+    if not model_store.ready:
+        return JSONResponse(body, status_code=503, headers={"Retry-After": "2"})
+    return body
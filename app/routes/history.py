@@ -0,0 +1,103 @@
+from fastapi import APIRouter, HTTPException, Depends, status, Query
+from datetime import datetime, timedelta, timezone
+from app.core.securitycore import get_current_user
+from app.core.timeseries import timeseries_store, ROLLUP_RESOLUTIONS
+from app.core.jsonresponse import ORJSONResponse
+import numpy as np
+
+router = APIRouter(prefix="/history")
+
+MAX_RAW_POINTS = 20000
+
+
+def _time_range(t_from: datetime | None, t_to: datetime | None, default_span: timedelta):
+    now = datetime.now(timezone.utc)
+    t_to = t_to or now
+    t_from = t_from or (t_to - default_span)
+    if t_from.tzinfo is None:
+        t_from = t_from.replace(tzinfo=timezone.utc)
+    if t_to.tzinfo is None:
+        t_to = t_to.replace(tzinfo=timezone.utc)
+    if t_from > t_to:
+        raise HTTPException(status_code=400, detail="'from' must be before 'to'")
+    return int(t_from.timestamp() * 1000), int(t_to.timestamp() * 1000)
+
+
+def _pick_resolution(span_ms: int):
+    if span_ms <= 2 * 3_600_000:
+        return "raw"
+    if span_ms <= 7 * 86_400_000:
+        return "1m"
+    return "1h"
+
+
+def _decimate(ts: np.ndarray, values: np.ndarray, max_points: int):
+    if ts.size <= max_points:
+        return ts, values
+    step = int(np.ceil(ts.size / max_points))
+    return ts[::step], values[::step]
+
+
+@router.get("/hr", status_code=status.HTTP_200_OK)
+async def heart_rate_history(
+    t_from: datetime | None = Query(None, alias="from"),
+    t_to: datetime | None = Query(None, alias="to"),
+    resolution: str = Query("auto", pattern="^(auto|raw|1m|1h)$"),
+    current_user: dict = Depends(get_current_user)
+):
+    start, end = _time_range(t_from, t_to, timedelta(hours=24))
+    if resolution == "auto":
+        resolution = _pick_resolution(end - start)
+
+    series = timeseries_store.series(current_user["_id"], "hr", create=False)
+    if series is None:
+        return {"status": "success", "user_id": current_user["_id"], "resolution": resolution, "t": [], "values": []}
+
+    # numpy columns go straight to the response class; jsonable_encoder does not take them
+    if resolution == "raw":
+        ts, values = _decimate(*series.range(start, end), MAX_RAW_POINTS)
+        return ORJSONResponse({
+            "status": "success",
+            "user_id": current_user["_id"],
+            "resolution": "raw",
+            "t": ts,
+            "values": np.round(values.astype(np.float64), 1)
+        })
+
+    rollup = series.rollup(resolution, start, end)
+    return ORJSONResponse({
+        "status": "success",
+        "user_id": current_user["_id"],
+        "resolution": resolution,
+        "bucket_ms": ROLLUP_RESOLUTIONS[resolution],
+        "t": rollup["t"],
+        "mean": np.round(rollup["mean"], 1),
+        "min": np.round(rollup["min"].astype(np.float64), 1),
+        "max": np.round(rollup["max"].astype(np.float64), 1),
+        "count": rollup["count"]
+    })
+
+
+@router.get("/ecg", status_code=status.HTTP_200_OK)
+async def ecg_history(
+    t_from: datetime | None = Query(None, alias="from"),
+    t_to: datetime | None = Query(None, alias="to"),
+    max_points: int = Query(5000, ge=10, le=MAX_RAW_POINTS),
+    current_user: dict = Depends(get_current_user)
+):
+    start, end = _time_range(t_from, t_to, timedelta(minutes=10))
+
+    series = timeseries_store.series(current_user["_id"], "ecg", create=False)
+    if series is None:
+        return {"status": "success", "user_id": current_user["_id"], "t": [], "values": []}
+
+    ts, values = series.range(start, end)
+    total = int(ts.size)
+    ts, values = _decimate(ts, values, max_points)
+    return ORJSONResponse({
+        "status": "success",
+        "user_id": current_user["_id"],
+        "total_samples": total,
+        "t": ts,
+        "values": values
+    })
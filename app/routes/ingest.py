@@ -0,0 +1,66 @@
+from fastapi import APIRouter, HTTPException, Request, Header, status
+from datetime import datetime, timezone
+from app.core.frames import group_frames, FrameError
+from app.core.timeseries import timeseries_store
+from app.core.realtime import realtime_store
+import hmac
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+router = APIRouter()
+
+# shared device key; the endpoint is disabled while it is unset
+INGEST_API_KEY = os.getenv("INGEST_API_KEY")
+INGEST_MAX_BYTES = int(os.getenv("INGEST_MAX_BYTES", 8 * 1024 * 1024))
+
+
+@router.post("/ingest", status_code=status.HTTP_200_OK)
+async def ingest_frames(request: Request, x_ingest_key: str | None = Header(None)):
+    if not INGEST_API_KEY:
+        raise HTTPException(status_code=503, detail="Ingest is not configured")
+    if not x_ingest_key or not hmac.compare_digest(x_ingest_key, INGEST_API_KEY):
+        raise HTTPException(status_code=401, detail="Invalid ingest key")
+
+    content_length = int(request.headers.get("content-length") or 0)
+    if content_length > INGEST_MAX_BYTES:
+        raise HTTPException(status_code=413, detail="Payload too large")
+    body = await request.body()
+    if len(body) > INGEST_MAX_BYTES:
+        raise HTTPException(status_code=413, detail="Payload too large")
+
+    try:
+        grouped = group_frames(body)
+    except FrameError as e:
+        raise HTTPException(status_code=400, detail=f"Malformed frame: {str(e)}")
+
+    frames = 0
+    samples = 0
+    for user_id, g in grouped.items():
+        # one batched append per user and metric
+        if g["hr"].size:
+            timeseries_store.append_hr(user_id, g["hr_ts"], g["hr"])
+        if g["ecg"].size:
+            timeseries_store.series(user_id, "ecg").append(g["ecg_ts"], g["ecg"])
+        frames += g["frames"]
+        samples += int(g["ecg"].size)
+
+        ts, hz, hr, ecg = g["latest"]
+        snapshot = {
+            "ecg_data": ecg.tolist(),
+            # /ecg analyses the window at the rate the device sampled it
+            "sample_hz": hz,
+            "timestamp": datetime.fromtimestamp(ts / 1000, tz=timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+        }
+        # a frame without detected beats carries no heart rate; leave the field out rather than null
+        if hr is not None:
+            snapshot["heart_rate"] = hr
+        realtime_store.update_local(user_id, snapshot)
+
+    return {
+        "status": "success",
+        "frames": frames,
+        "users": len(grouped),
+        "samples": samples
+    }
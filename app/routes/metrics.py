@@ -0,0 +1,65 @@
+from fastapi import APIRouter, HTTPException, Header
+from fastapi.responses import PlainTextResponse
+from app.core.metrics import render_metrics, METRICS_ENABLED
+from app.core.securitycore import hash_pool_stats
+from app.core.mlllm import risk_batcher, llm_queue_stats
+from app.core.admission import admission_stats
+from app.core.modelstore import model_store
+from app.core.reportcache import report_cache
+from app.core.realtime import realtime_store
+import hmac
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+router = APIRouter()
+
+# bearer token for scrapers; /metrics is closed while it is unset
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+
+def _sample_lines(name: str, help: str, value, kind: str = "gauge"):
+    return [f"# HELP {name} {help}", f"# TYPE {name} {kind}", f"{name} {value}"]
+
+
+def _runtime_gauges():
+    # point-in-time values read from the components that already keep them
+    scheduler = risk_batcher.metrics()
+    pool = hash_pool_stats()
+    cache = report_cache.stats()
+    realtime = realtime_store.stats()
+    lines = []
+    lines += _sample_lines("model_ready", "1 once the risk model is loaded.", int(model_store.ready))
+    lines += _sample_lines("predict_batch_queue_depth", "Predictions waiting for the next batch.", scheduler["queue_depth"])
+    lines += _sample_lines("predict_batch_mean_size", "Mean micro-batch size.", scheduler["mean_batch_size"])
+    lines += _sample_lines("hash_pool_in_flight", "Password hashes queued or running.", pool.get("in_flight", 0))
+    lines += _sample_lines("report_cache_size", "Entries in the in-memory report cache.", cache.get("size", 0))
+    lines += _sample_lines("realtime_users", "Users with a cached realtime snapshot.", realtime["users"])
+    lines += _sample_lines("realtime_fallback_reads_total", "Per-request Firebase reads (cache misses).",
+                           realtime["fallback_reads"], kind="counter")
+    lines += _limiter_lines({**admission_stats(), "llm": llm_queue_stats()})
+    return "\n".join(lines) + "\n"
+
+
+def _limiter_lines(limiters):
+    lines = []
+    for field, name, help in (("active", "admission_active", "Requests (or LLM calls) holding a slot."),
+                              ("queued", "admission_queued", "Requests (or LLM calls) waiting for a slot."),
+                              ("queued_clients", "admission_queued_clients", "Distinct clients waiting.")):
+        lines += [f"# HELP {name} {help}", f"# TYPE {name} gauge"]
+        for limiter, stats in limiters.items():
+            if stats is not None:
+                lines.append(f'{name}{{limiter="{limiter}"}} {stats[field]}')
+    return lines
+
+
+@router.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def metrics(authorization: str | None = Header(None)):
+    if not METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    if not METRICS_TOKEN:
+        raise HTTPException(status_code=503, detail="Metrics are not configured")
+    if not hmac.compare_digest(authorization or "", f"Bearer {METRICS_TOKEN}"):
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+    return PlainTextResponse(render_metrics() + _runtime_gauges(), media_type="text/plain; version=0.0.4")
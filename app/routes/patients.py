@@ -0,0 +1,64 @@
+from fastapi import APIRouter, HTTPException, Depends, status
+from bson import ObjectId
+from app.core.securitycore import require_clinician
+from app.core.database import find_users_by_ids, USER_FEATURE_PROJECTION
+from app.core.realtime import realtime_store, heart_rate_of
+from app.core.mlllm import score_risk_probabilities
+from app.core.modelstore import ModelNotReady
+from app.core.scorer import PROFILE_FEATURES
+from app.basemodels.usermodel import PatientSnapshotRequest
+from app.core.metrics import span
+from app.core.jsonresponse import ORJSONResponse
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+router = APIRouter(prefix="/patients")
+
+
+@router.post("/snapshot", status_code=status.HTTP_200_OK)
+async def patients_snapshot(request: PatientSnapshotRequest, clinician: dict = Depends(require_clinician)):
+    """Latest heart rate and risk for many patients at once, one column per field.
+
+    Row i of every column belongs to user_id[i]; ids that are malformed or
+    unknown are listed in not_found instead.
+    """
+    requested = list(dict.fromkeys(request.user_ids))
+    ids = [ObjectId(uid) for uid in requested if ObjectId.is_valid(uid)]
+
+    try:
+        with span("mongo_users"):
+            docs = await find_users_by_ids(ids, USER_FEATURE_PROJECTION)
+        by_id = {str(doc["_id"]): doc for doc in docs}
+        user_ids = [uid for uid in requested if uid in by_id]
+        profiles = [by_id[uid] for uid in user_ids]
+
+        with span("realtime"):
+            realtime = await realtime_store.get_many(user_ids)
+        # None (no usable heart rate) becomes NaN, which scores as NaN and is written as null
+        heart_rates = np.array([heart_rate_of(realtime[uid][0]) for uid in user_ids], dtype=np.float64)
+
+        with span("scoring"):
+            probs = score_risk_probabilities(profiles, heart_rates)
+    except ModelNotReady:
+        raise HTTPException(status_code=503, detail="Model is not loaded yet", headers={"Retry-After": "5"})
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+    metas = [realtime[uid][1] for uid in user_ids]
+    response = {
+        "status": "success",
+        "count": len(user_ids),
+        "user_id": user_ids,
+        # numpy columns, handed to the response class directly; NaN (no heart rate) is written as null
+        "heart_rate": np.round(heart_rates, 1),
+        "risk_probability": np.round(probs, 3),
+        "risk_percentage": np.round(probs * 100, 2),
+        "realtime_age_s": [meta["age_s"] for meta in metas],
+        "stale": [meta["stale"] for meta in metas],
+        "not_found": [uid for uid in requested if uid not in by_id],
+    }
+    if request.include_features:
+        response["features"] = {f: [doc.get(f) for doc in profiles] for f in PROFILE_FEATURES}
+    return ORJSONResponse(response)
@@ -1,118 +1,349 @@
-from fastapi import APIRouter, HTTPException, Depends, status
-from app.core.securitycore import get_current_user
-from app.core.mlllm import predict_cardiovascular_risk, generate_medical_report, analyze_ecg_with_llm
-from pymongo import MongoClient
-from firebase_admin import credentials, db
-import firebase_admin
-import os
+from fastapi import APIRouter, HTTPException, Depends, status, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from app.core.securitycore import get_current_user, require_clinician
+from app.core.modelstore import ModelNotReady, model_store
+from app.core.mlllm import risk_batcher, predict_cardiovascular_risk_batch, cached_medical_report, cached_ecg_analysis, stream_medical_report, stream_ecg_analysis, llm_queue_stats, REPORT_PARSE_FAILED, ECG_PARSE_FAILED
+from app.core.reportcache import report_cache, report_key, ecg_key
+from app.core.resultcache import result_cache, result_etag, profile_version, realtime_version, last_modified, not_modified, version_headers, conditional_requests_total
+from app.core.singleflight import SingleFlight
+from app.core.ecg import analyze_ecg, ECG_SAMPLE_RATE
+from app.core.scorer import PROFILE_FEATURES
+from app.basemodels.usermodel import BatchPredictRequest
+from app.core.realtime import realtime_store, heart_rate_of
+from app.core.metrics import span
+from app.core.admission import Overloaded, admission_stats
+from app.core.jsonresponse import dumps
 from dotenv import load_dotenv
 
 load_dotenv()
 
 router = APIRouter()
 
-client = MongoClient(os.getenv("MONGO_URL"))
-db_mongo = client[os.getenv("DB_NAME")]
-users_collection = db_mongo["users"]
+# concurrent identical requests (same user, endpoint and input) share one
+# Firebase read and one LLM completion
+inflight = SingleFlight()
 
-FIREBASE_CRED_PATH = os.getenv("FIREBASE_CRED_PATH")
-FIREBASE_DB_URL = os.getenv("FIREBASE_DB_URL")
 
-if not firebase_admin._apps:
-    cred = credentials.Certificate(FIREBASE_CRED_PATH)
-    firebase_admin.initialize_app(cred, {'databaseURL': FIREBASE_DB_URL})
+def model_not_ready():
+    # the model is still loading (or retrying its download); clients should come back shortly
+    return HTTPException(status_code=503, detail="Model is not loaded yet", headers={"Retry-After": "5"})
+
+
+async def fetch_realtime(user_id: str):
+    # served from the in-memory snapshot cache; only cold misses reach Firebase,
+    # and concurrent misses for the same user share one read
+    with span("realtime"):
+        cached = realtime_store.cached(user_id)
+        if cached is not None:
+            return cached
+        return await inflight.do((user_id, "realtime", None), realtime_store.read_remote, user_id)
+
+
+DEFAULT_AI_REPORT = {
+    "diagnosis_summary": "Awaiting live heart rate data to generate prediction.",
+    "lifestyle_suggestions": {
+        "diet": "Maintain a balanced diet rich in vegetables, fruits, and lean proteins.",
+        "exercise": "Engage in regular moderate exercise (e.g., brisk walking, cycling).",
+        "habits": "Avoid smoking and reduce alcohol intake.",
+        "medical_followup": "Regularly monitor blood pressure and glucose levels."
+    }
+}
+
+# served instead of the LLM report when the LLM queue is full; the prediction itself is current
+DEFERRED_AI_REPORT = {
+    **DEFAULT_AI_REPORT,
+    "diagnosis_summary": "Your risk prediction is up to date. The detailed AI report is temporarily unavailable due to high demand; please refresh shortly."
+}
+
+
+def ecg_patient_info(user_doc: dict):
+    return {
+        "age": user_doc.get("age", 0),
+        "sex": "Male" if user_doc.get("male", 0) == 1 else "Female",
+        "has_hypertension": user_doc.get("prevalentHyp", 0),
+        "has_diabetes": user_doc.get("diabetes", 0)
+    }
+
+
+def sse_event(event: str, data) -> str:
+    return f"event: {event}\ndata: {dumps(data).decode()}\n\n"
+
+
+def sse_response(events):
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+async def stream_report_events(first_event: str, first_payload: dict, deltas, result_key: str = "ai_report",
+                               deferred=None):
+    # numeric result first, then the LLM text as it arrives
+    yield sse_event(first_event, first_payload)
+    parts = []
+    try:
+        async for delta in deltas:
+            parts.append(delta)
+            yield sse_event("report_delta", {"delta": delta})
+    except Overloaded:
+        # the LLM queue is full: finish with what we have instead of an error
+        yield sse_event("done", {result_key: deferred})
+        return
+    except Exception as e:
+        yield sse_event("error", {"detail": f"LLM streaming failed: {str(e)}"})
+        return
+    yield sse_event("done", {result_key: "".join(parts)})
 
 
 @router.get("/predict", status_code=status.HTTP_200_OK)
-async def predict_cardio_risk(current_user: dict = Depends(get_current_user)):
+async def predict_cardio_risk(request: Request, response: Response, current_user: dict = Depends(get_current_user)):
     try:
-        user_email = current_user["email"]
-        user_doc = users_collection.find_one({"email": user_email})
-        if not user_doc:
-            raise HTTPException(status_code=404, detail="User not found")
-
-        user_data = {k: user_doc.get(k, 0) for k in [
-            "male","age","currentSmoker","cigsPerDay","BPMeds",
-            "prevalentStroke","prevalentHyp","diabetes","totChol",
-            "sysBP","diaBP","BMI","glucose"
-        ]}
-
-        user_id = str(user_doc["_id"])
-        ref = db.reference(f"/users/{user_id}/realtime")
-        realtime_data = ref.get()
-
-        # Default safe values
-        heart_rate = None
-        prediction = None
-        llm_report = {
-            "diagnosis_summary": "Awaiting live heart rate data to generate prediction.",
-            "lifestyle_suggestions": {
-                "diet": "Maintain a balanced diet rich in vegetables, fruits, and lean proteins.",
-                "exercise": "Engage in regular moderate exercise (e.g., brisk walking, cycling).",
-                "habits": "Avoid smoking and reduce alcohol intake.",
-                "medical_followup": "Regularly monitor blood pressure and glucose levels."
+        # current_user is the profile already loaded (or cached) by get_current_user
+        user_doc = current_user
+
+        user_data = {k: user_doc.get(k, 0) for k in PROFILE_FEATURES}
+
+        user_id = user_doc["_id"]
+        realtime_data, realtime_meta = await fetch_realtime(user_id)
+
+        # the result only changes with the profile, the device upload and the model
+        etag = result_etag("predict", user_id, profile_version(user_data),
+                           realtime_version(realtime_data, realtime_meta), realtime_meta["stale"], model_store.sha256)
+        modified = last_modified(user_doc, realtime_meta)
+        if not_modified(request.headers, etag, modified):
+            conditional_requests_total.inc(route="predict", outcome="not_modified")
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=version_headers(etag, modified))
+
+        result = result_cache.get(etag)
+        cacheable = True
+        if result is not None:
+            conditional_requests_total.inc(route="predict", outcome="cached")
+        else:
+            conditional_requests_total.inc(route="predict", outcome="computed")
+
+            # Default safe values
+            prediction = None
+            llm_report = DEFAULT_AI_REPORT
+
+            # Only generate prediction if a usable HR is available
+            heart_rate = heart_rate_of(realtime_data)
+            if heart_rate is not None:
+                with span("scoring"):
+                    prediction = await risk_batcher.submit(user_data, heart_rate)
+                try:
+                    with span("ai_report"):
+                        llm_report = await inflight.do(
+                            (user_id, "predict", report_key(user_data, prediction)),
+                            cached_medical_report, user_data, prediction
+                        )
+                except Overloaded:
+                    # shed the LLM call, not the request
+                    llm_report = DEFERRED_AI_REPORT
+
+            result = {
+                "status": "success",
+                "user_id": user_id,
+                "heart_rate": heart_rate,
+                "prediction": prediction,
+                "ai_report": llm_report
             }
-        }
+            cacheable = llm_report is not DEFERRED_AI_REPORT and llm_report != REPORT_PARSE_FAILED
+            if cacheable:
+                result_cache.set(etag, result)
+
+        if cacheable:
+            response.headers.update(version_headers(etag, modified))
+        return {**result, "realtime": realtime_meta}
+
+    except ModelNotReady:
+        raise model_not_ready()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
 
-        # Only generate prediction if HR is available
-        if realtime_data and "heart_rate" in realtime_data:
-            heart_rate = realtime_data["heart_rate"]
-            prediction = predict_cardiovascular_risk(user_data, heart_rate)
-            llm_report = generate_medical_report(user_data, prediction)
+@router.get("/predict/stream", status_code=status.HTTP_200_OK)
+async def predict_cardio_risk_stream(current_user: dict = Depends(get_current_user)):
+    try:
+        user_data = {k: current_user.get(k, 0) for k in PROFILE_FEATURES}
+        user_id = current_user["_id"]
+        realtime_data, realtime_meta = await fetch_realtime(user_id)
+
+        prediction = None
+        heart_rate = heart_rate_of(realtime_data)
+        if heart_rate is not None:
+            with span("scoring"):
+                prediction = await risk_batcher.submit(user_data, heart_rate)
+
+    except ModelNotReady:
+        raise model_not_ready()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+    first = {
+        "status": "success",
+        "user_id": user_id,
+        "heart_rate": heart_rate,
+        "prediction": prediction,
+        "realtime": realtime_meta
+    }
+
+    if prediction is None:
+        async def pending():
+            yield sse_event("prediction", first)
+            yield sse_event("done", {"ai_report": DEFAULT_AI_REPORT})
+        return sse_response(pending())
+
+    return sse_response(stream_report_events("prediction", first, stream_medical_report(user_data, prediction),
+                                             deferred=DEFERRED_AI_REPORT))
+
+
+@router.post("/predict/batch", status_code=status.HTTP_200_OK)
+async def predict_cardio_risk_batch(request: BatchPredictRequest, current_user: dict = Depends(get_current_user)):
+    try:
+        patients = [p.dict() for p in request.patients]
+        heart_rates = [p.pop("heart_rate") for p in patients]
+        with span("scoring"):
+            predictions = predict_cardiovascular_risk_batch(patients, heart_rates)
 
         return {
             "status": "success",
-            "user_id": user_id,
-            "heart_rate": heart_rate,
-            "prediction": prediction,
-            "ai_report": llm_report
+            "count": len(predictions),
+            "predictions": predictions
         }
 
+    except ModelNotReady:
+        raise model_not_ready()
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
+
+@router.get("/predict/stats", status_code=status.HTTP_200_OK)
+async def predict_scheduler_stats(current_user: dict = Depends(require_clinician)):
+    # server internals; operators (clinician/admin roles) only, everyone else gets 403
+    return {
+        "status": "success",
+        "scheduler": risk_batcher.metrics(),
+        "report_cache": report_cache.stats(),
+        "inflight": inflight.stats(),
+        "result_cache": result_cache.stats(),
+        "admission": admission_stats(),
+        "llm_queue": llm_queue_stats(),
+        "realtime": realtime_store.stats()
+    }
+
     
 @router.get("/ecg", status_code=status.HTTP_200_OK)
-async def analyze_ecg_data(current_user: dict = Depends(get_current_user)):
+async def analyze_ecg_data(
+    request: Request,
+    response: Response,
+    narrative: bool = Query(False, description="Also generate an LLM narrative of the ECG features"),
+    current_user: dict = Depends(get_current_user)
+):
     try:
-        user_email = current_user["email"]
-        user_doc = users_collection.find_one({"email": user_email})
-        if not user_doc:
-            raise HTTPException(status_code=404, detail="User not found")
+        # current_user is the profile already loaded (or cached) by get_current_user
+        user_doc = current_user
 
-        user_id = str(user_doc["_id"])
-        ref = db.reference(f"/users/{user_id}/realtime")
-        realtime_data = ref.get()
+        user_id = user_doc["_id"]
+        realtime_data, realtime_meta = await fetch_realtime(user_id)
+
+        # the narrative also depends on the patient info it is written for
+        user_data = ecg_patient_info(user_doc)
+        etag = result_etag("ecg", user_id, narrative, profile_version(user_data) if narrative else None,
+                           realtime_version(realtime_data, realtime_meta), realtime_meta["stale"])
+        modified = last_modified(user_doc if narrative else {}, realtime_meta)
+        if not_modified(request.headers, etag, modified):
+            conditional_requests_total.inc(route="ecg", outcome="not_modified")
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=version_headers(etag, modified))
 
         if not realtime_data or "ecg_data" not in realtime_data:
+            response.headers.update(version_headers(etag, modified))
             return {
                 "status": "pending",
                 "user_id": user_id,
                 "message": "Awaiting ECG data from device.",
                 "ecg_data": [],
+                "ecg_analysis": None,
                 "ai_ecg_insight": None
             }
 
-        ecg_data = realtime_data["ecg_data"]
-        heart_rate = realtime_data.get("heart_rate", None)
+        result = result_cache.get(etag)
+        cacheable = True
+        if result is not None:
+            conditional_requests_total.inc(route="ecg", outcome="cached")
+        else:
+            conditional_requests_total.inc(route="ecg", outcome="computed")
+            ecg_data = realtime_data["ecg_data"]
+            heart_rate = heart_rate_of(realtime_data)
 
-        user_data = {
-            "age": user_doc.get("age", 0),
-            "sex": "Male" if user_doc.get("male", 0) == 1 else "Female",
-            "has_hypertension": user_doc.get("prevalentHyp", 0),
-            "has_diabetes": user_doc.get("diabetes", 0)
-        }
+            # deterministic on-box analysis over the whole window
+            with span("ecg_analysis"):
+                ecg_analysis = analyze_ecg(ecg_data, fs=realtime_data.get("sample_hz", ECG_SAMPLE_RATE))
 
-        ai_ecg_insight = analyze_ecg_with_llm(user_data, heart_rate, ecg_data)
+            ai_ecg_insight = None
+            message = "ECG data analyzed successfully."
+            if narrative:
+                try:
+                    with span("ai_ecg"):
+                        ai_ecg_insight = await inflight.do(
+                            (user_id, "ecg", ecg_key(user_data, heart_rate, ecg_analysis)),
+                            cached_ecg_analysis, user_data, heart_rate, ecg_analysis
+                        )
+                except Overloaded:
+                    cacheable = False
+                    message = "ECG data analyzed successfully. The AI narrative is temporarily unavailable due to high demand."
 
-        return {
-            "status": "success",
-            "user_id": user_id,
-            "message": "ECG data analyzed successfully.",
-            "heart_rate": heart_rate,
-            "ecg_data_length": len(ecg_data),
-            "ai_ecg_insight": ai_ecg_insight
-        }
+            result = {
+                "status": "success",
+                "user_id": user_id,
+                "message": message,
+                "heart_rate": heart_rate,
+                "ecg_data_length": len(ecg_data),
+                "ecg_analysis": ecg_analysis,
+                "ai_ecg_insight": ai_ecg_insight
+            }
+            cacheable = cacheable and ai_ecg_insight != ECG_PARSE_FAILED
+            if cacheable:
+                result_cache.set(etag, result)
+
+        if cacheable:
+            response.headers.update(version_headers(etag, modified))
+        return {**result, "realtime": realtime_meta}
 
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+
+@router.get("/ecg/stream", status_code=status.HTTP_200_OK)
+async def analyze_ecg_data_stream(current_user: dict = Depends(get_current_user)):
+    try:
+        user_id = current_user["_id"]
+        realtime_data, realtime_meta = await fetch_realtime(user_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+    if not realtime_data or "ecg_data" not in realtime_data:
+        async def pending():
+            yield sse_event("ecg", {
+                "status": "pending",
+                "user_id": user_id,
+                "message": "Awaiting ECG data from device.",
+                "ecg_data": []
+            })
+            yield sse_event("done", {"ai_ecg_insight": None})
+        return sse_response(pending())
+
+    ecg_data = realtime_data["ecg_data"]
+    heart_rate = heart_rate_of(realtime_data)
+    with span("ecg_analysis"):
+        ecg_analysis = analyze_ecg(ecg_data, fs=realtime_data.get("sample_hz", ECG_SAMPLE_RATE))
+    first = {
+        "status": "success",
+        "user_id": user_id,
+        "heart_rate": heart_rate,
+        "ecg_data_length": len(ecg_data),
+        "ecg_analysis": ecg_analysis,
+        "realtime": realtime_meta
+    }
+    deltas = stream_ecg_analysis(ecg_patient_info(current_user), heart_rate, ecg_analysis)
+    return sse_response(stream_report_events("ecg", first, deltas, result_key="ai_ecg_insight"))
@@ -1,29 +1,26 @@
-from fastapi import APIRouter, HTTPException, status, Depends
+from fastapi import APIRouter, HTTPException, status, Depends, Request, Response
 from datetime import datetime, timedelta
-from app.core.securitycore import get_password_hash, create_access_token, verify_password, get_current_user
+from app.core.securitycore import hash_password_async, create_access_token, verify_password_async, get_current_user, invalidate_user_cache, load_user_profile, public_profile
 from app.basemodels.usermodel import UserRegister, UserLogin, ForgotPasswordRequest, ResetPasswordRequest, UserUpdate
 from app.core.smtp_otp import send_otp, verify_otp
-from pymongo import MongoClient
-import os
+from app.core.otpstore import OTPRateLimited
+from app.core.resultcache import result_etag, profile_version, last_modified, not_modified, version_headers, conditional_requests_total
+from app.core.database import email_index_ready, find_user_by_email, insert_user, update_user_by_email, update_profile_by_email, delete_user_by_email, USER_HASH_PROJECTION, USER_EXISTS_PROJECTION
+from pymongo.errors import DuplicateKeyError
 from dotenv import load_dotenv
 
 load_dotenv()
 router = APIRouter()
 
 
-# MongoDB connection
-client = MongoClient(os.getenv("MONGO_URL"))
-db = client[os.getenv("DB_NAME")]
-users_collection = db["users"]
-
-
 @router.post("/registration", status_code=status.HTTP_201_CREATED)
 async def register_user(user: UserRegister):
-    existing_user = users_collection.find_one({"email": user.email})
-    if existing_user:
-        raise HTTPException(status_code=400, detail="Email already registered")
+    if not email_index_ready():
+        # the unique index was not confirmed at startup, so it cannot be relied on to reject duplicates
+        if await find_user_by_email(user.email, USER_EXISTS_PROJECTION):
+            raise HTTPException(status_code=400, detail="Email already registered")
 
-    hashed_password = get_password_hash(user.password)
+    hashed_password = await hash_password_async(user.password)
 
     user_doc = {
         "email": user.email,
@@ -44,7 +41,11 @@ async def register_user(user: UserRegister):
         "created_at": datetime.utcnow(),
     }
 
-    users_collection.insert_one(user_doc)
+    # the unique index on email decides; no racy find-then-insert once it is in place
+    try:
+        await insert_user(user_doc)
+    except DuplicateKeyError:
+        raise HTTPException(status_code=400, detail="Email already registered")
 
     access_token_expires = timedelta(minutes=60 * 24)
     access_token = create_access_token(
@@ -61,58 +62,63 @@ async def register_user(user: UserRegister):
 # login route
 @router.post("/login", status_code=status.HTTP_200_OK)
 async def login_user(user: UserLogin):
-    existing_user = users_collection.find_one({"email": user.email})
-    if not existing_user:
+    # only the hash is read until the password checks out
+    credentials = await find_user_by_email(user.email, USER_HASH_PROJECTION)
+    if not credentials:
         raise HTTPException(status_code=404, detail="User not found")
 
-    if not verify_password(user.password, existing_user["password"]):
+    if not await verify_password_async(user.password, credentials["password"]):
         raise HTTPException(status_code=401, detail="Invalid password")
     access_token_expires = timedelta(minutes=60 * 24) 
     access_token = create_access_token(
         data={"sub": user.email}, expires_delta=access_token_expires
     )
 
-    user_info = {k: v for k, v in existing_user.items() if k != "password"}
-    user_info["_id"] = str(user_info["_id"]) 
+    # also warms the profile cache for the /me and /predict calls that follow a login
+    user_info = await load_user_profile(user.email)
 
     return {
         "status": "success",
         "message": "Login successful",
         "access_token": access_token,
         "token_type": "bearer",
-        "user": user_info
+        "user": public_profile(user_info) if user_info else None
     }
 
 
 # forgot password routes
 @router.post("/forgot-password/send", status_code=status.HTTP_200_OK)
 async def send_forgot_password_otp(request: ForgotPasswordRequest):
-    user = users_collection.find_one({"email": request.email})
+    user = await find_user_by_email(request.email, USER_EXISTS_PROJECTION)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
     try:
-        send_otp(request.email)
+        queued = await send_otp(request.email)
+    except OTPRateLimited as e:
+        raise HTTPException(status_code=429, detail="Too many OTP requests, please try again later",
+                            headers={"Retry-After": str(int(e.retry_after) + 1)})
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to send OTP: {str(e)}")
+    if not queued:
+        raise HTTPException(status_code=503, detail="Email service is busy, please try again shortly",
+                            headers={"Retry-After": "5"})
 
     return {"status": "success", "message": f"OTP sent to {request.email}"}
 
 @router.post("/forgot-password/verify", status_code=status.HTTP_200_OK)
 async def verify_and_reset_password(request: ResetPasswordRequest):
-    user = users_collection.find_one({"email": request.email})
+    user = await find_user_by_email(request.email, USER_EXISTS_PROJECTION)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
-    otp_verified = verify_otp(request.email, request.otp)
+    otp_verified = await verify_otp(request.email, request.otp)
     if not otp_verified:
         raise HTTPException(status_code=400, detail="Invalid or expired OTP")
 
-    hashed_password = get_password_hash(request.new_password)
-    users_collection.update_one(
-        {"email": request.email},
-        {"$set": {"password": hashed_password}}
-    )
+    hashed_password = await hash_password_async(request.new_password)
+    await update_user_by_email(request.email, {"password": hashed_password})
+    invalidate_user_cache(request.email)
 
     return {
         "status": "success",
@@ -130,36 +136,40 @@ async def update_user(data: UserUpdate, current_user: dict = Depends(get_current
         raise HTTPException(status_code=400, detail="No fields provided for update")
 
     if "password" in update_fields:
-        update_fields["password"] = get_password_hash(update_fields["password"])
+        update_fields["password"] = await hash_password_async(update_fields["password"])
 
-    result = users_collection.update_one(
-        {"email": user_email},
-        {"$set": update_fields}
-    )
+    result = await update_profile_by_email(user_email, update_fields)
+    invalidate_user_cache(user_email)
 
     if result.modified_count == 0:
         raise HTTPException(status_code=400, detail="No changes made")
 
-    updated_user = users_collection.find_one({"email": user_email})
-    updated_user["_id"] = str(updated_user["_id"])
-    updated_user.pop("password", None)  
+    updated_user = await load_user_profile(user_email)
 
     return {
         "status": "success",
         "message": "User profile updated successfully",
-        "updated_user": updated_user
+        "updated_user": public_profile(updated_user) if updated_user else None
     }
 
 # get current user function
 @router.get("/me", status_code=status.HTTP_200_OK)
-async def get_me(current_user: dict = Depends(get_current_user)):
+async def get_me(request: Request, response: Response, current_user: dict = Depends(get_current_user)):
     """
     Returns the authenticated user's profile information.
-    Requires a valid JWT Bearer token.
+    Requires a valid JWT Bearer token. Answers 304 when If-None-Match still matches the profile.
     """
+    # derived from the profile itself, so /update-user changes it; a deleted user no longer authenticates
+    etag = result_etag("me", current_user["_id"], profile_version(current_user))
+    modified = last_modified(current_user, {})
+    if not_modified(request.headers, etag, modified):
+        conditional_requests_total.inc(route="me", outcome="not_modified")
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=version_headers(etag, modified))
+    conditional_requests_total.inc(route="me", outcome="served")
+    response.headers.update(version_headers(etag, modified))
     return {
         "status": "success",
-        "user": current_user
+        "user": public_profile(current_user)
     }
 
 # delete user route
@@ -167,7 +177,8 @@ async def get_me(current_user: dict = Depends(get_current_user)):
 async def delete_user(current_user: dict = Depends(get_current_user)):
     user_email = current_user["email"]
 
-    result = users_collection.delete_one({"email": user_email})
+    result = await delete_user_by_email(user_email)
+    invalidate_user_cache(user_email)
 
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="User not found or already deleted")
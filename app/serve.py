@@ -0,0 +1,44 @@
+"""
+Production entry point: load once in the gunicorn master, then fork.
+
+    gunicorn -c gunicorn.conf.py app.serve:app
+
+With preload_app (see gunicorn.conf.py) this module is imported by the master
+before it forks the uvicorn workers. The risk model and every imported module
+are then in memory pages the workers share copy-on-write instead of each
+worker building its own copy. Everything that holds sockets, threads or a
+running loop (Mongo pool, Firebase app and listener, OpenAI client, hashing
+pool, email workers) is still created per worker, in the app lifespan.
+
+This only saves memory with WEB_CONCURRENCY>1 (the default is 1); see
+gunicorn.conf.py for what has to change before running several workers.
+"""
+import gc
+from app.core.modelstore import model_store
+
+try:
+    model_store.load()
+except Exception as e:
+    # the workers retry in their lifespan, exactly as without preloading
+    print(f"[WARN] Model not preloaded ({type(e).__name__}: {e}); workers will load it themselves")
+
+from app.main import app
+
+# objects allocated so far live for the whole process; keeping the collector
+# off them stops it from writing to (and so un-sharing) their pages in workers
+gc.freeze()
+
+
+def reset_after_fork():
+    """Drops per-process handles that must never be inherited from the master.
+
+    None of them are created during preload today; this keeps it that way if
+    an import ever starts opening one early.
+    """
+    from app.core import database, mlllm, securitycore
+
+    database._client = None
+    mlllm._client = None
+    mlllm._llm_slots = None
+    securitycore._hash_executor = None
+    securitycore._hash_slots = None
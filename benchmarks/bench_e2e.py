@@ -0,0 +1,325 @@
+"""
+End-to-end load and latency benchmark.
+
+Boots the real FastAPI app under uvicorn against local stand-ins:
+
+  MongoDB   mongomock-motor in process (or a real mongod via --mongo-uri)
+  Firebase  benchmarks/fakes/firebase_server.py, seeded with a realtime node per user
+  OpenAI    benchmarks/fakes/openai_server.py with --openai-latency per call
+  SMTP      benchmarks/fakes/smtp_sink.py (exercised by the optional "otp" route)
+
+The optional "predict-poll" / "ecg-poll" routes replay the mobile app's polling:
+each client sends back the ETag it last saw for that user in If-None-Match.
+"history-ecg" (5000 decimated samples) and "history-hr" (a day of per-minute
+points) return the large numeric arrays; --accept-encoding sets the header
+every client sends (e.g. "gzip, br" against RESPONSE_COMPRESSION).
+
+Closed-loop clients then drive each route at increasing concurrency. For every
+(route, concurrency) pair the run reports throughput and p50/p95/p99 latency.
+The JSON output (--out) can be passed back as --baseline on a later commit to
+print the change per route.
+
+    python -m benchmarks.bench_e2e --levels 1,8,32 --duration 10 --out e2e.json
+    python -m benchmarks.bench_e2e --routes predict,ecg --openai-latency 1.5 --baseline e2e.json
+
+The clients share the server's event loop and CPU, so absolute numbers are
+pessimistic; compare runs made on the same machine. The mongomock backend
+needs `pip install mongomock-motor`.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fakes import firebase_server, openai_server, smtp_sink
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ROUTES = ("login", "me", "predict", "ecg", "update-user", "otp", "predict-poll", "ecg-poll", "history-ecg", "history-hr")
+DEFAULT_ROUTES = "login,me,predict,ecg,update-user"
+PASSWORD = "benchmark-password"
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def summarize(latencies, statuses, elapsed):
+    ok = sum(n for code, n in statuses.items() if code.isdigit() and (200 <= int(code) < 300 or code == "304"))
+    result = {
+        "requests": len(latencies),
+        "ok": ok,
+        "errors": len(latencies) - ok,
+        "statuses": statuses,
+        "rps": round(ok / elapsed, 1) if elapsed else 0.0,
+    }
+    if latencies:
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+        result.update({
+            "mean_ms": round(float(np.mean(latencies)) * 1000, 2),
+            "p50_ms": round(p50 * 1000, 2),
+            "p95_ms": round(p95 * 1000, 2),
+            "p99_ms": round(p99 * 1000, 2),
+            "max_ms": round(max(latencies) * 1000, 2),
+        })
+    return result
+
+
+class Workload:
+    def __init__(self, users, args):
+        self.users = users
+        self.args = args
+        self.etags = {}
+
+    def request(self, route, rng):
+        user = rng.choice(self.users)
+        auth = {"Authorization": f"Bearer {user['token']}"}
+        if route == "login":
+            return "POST", "/login", {"json": {"email": user["email"], "password": PASSWORD}}
+        if route == "me":
+            return "GET", "/me", {"headers": auth}
+        if route == "predict":
+            return "GET", "/predict", {"headers": auth}
+        if route == "ecg":
+            return "GET", "/ecg", {"headers": auth, "params": {"narrative": str(self.args.narrative).lower()}}
+        if route == "update-user":
+            return "PUT", "/update-user", {"headers": auth, "json": {"glucose": rng.randint(70, 140),
+                                                                     "totChol": rng.randint(150, 280)}}
+        if route == "otp":
+            return "POST", "/forgot-password/send", {"json": {"email": user["email"]}}
+        if route == "history-ecg":
+            return "GET", "/history/ecg", {"headers": auth, "params": {"max_points": 5000}}
+        if route == "history-hr":
+            return "GET", "/history/hr", {"headers": auth, "params": {"resolution": "raw"}}
+        if route in ("predict-poll", "ecg-poll"):
+            etag = self.etags.get((route, user["email"]))
+            headers = {**auth, "If-None-Match": etag} if etag else auth
+            return "GET", "/" + route.split("-")[0], {"headers": headers, "user": user["email"]}
+        raise ValueError(route)
+
+    def observe(self, route, kwargs, response):
+        etag = response.headers.get("etag")
+        if etag and route.endswith("-poll"):
+            self.etags[(route, kwargs["user"])] = etag
+
+
+async def run_level(client, workload, route, concurrency, duration, warmup):
+    latencies, statuses, sizes = [], {}, []
+    deadline = time.perf_counter() + warmup + duration
+    measure_from = time.perf_counter() + warmup
+
+    async def worker(seed):
+        rng = random.Random(seed)
+        while True:
+            method, path, kwargs = workload.request(route, rng)
+            start = time.perf_counter()
+            if start >= deadline:
+                return
+            try:
+                response = await client.request(method, path, **{k: v for k, v in kwargs.items() if k != "user"})
+                code = str(response.status_code)
+                workload.observe(route, kwargs, response)
+            except Exception as e:
+                code = type(e).__name__
+                response = None
+            if start >= measure_from:
+                latencies.append(time.perf_counter() - start)
+                statuses[code] = statuses.get(code, 0) + 1
+                if response is not None:
+                    # bytes on the wire, i.e. after any Content-Encoding
+                    sizes.append(response.num_bytes_downloaded)
+
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    result = summarize(latencies, statuses, duration)
+    if sizes:
+        result["mean_bytes"] = int(np.mean(sizes))
+    return result
+
+
+async def seed_users(n, fstore):
+    from bson import ObjectId
+    from app.core.database import users_collection
+    from app.core.ecg import synthesize_ecg
+    from app.core.securitycore import get_password_hash, create_access_token
+    from app.core.timeseries import timeseries_store
+
+    hashed = get_password_hash(PASSWORD)
+    rng = random.Random(0)
+    docs = []
+    for i in range(n):
+        docs.append({
+            "_id": ObjectId(),
+            "email": f"bench{i}@example.com",
+            "password": hashed,
+            "male": rng.randint(0, 1), "age": rng.randint(30, 75), "currentSmoker": rng.randint(0, 1),
+            "cigsPerDay": rng.choice([0, 0, 5, 20]), "BPMeds": 0, "prevalentStroke": 0,
+            "prevalentHyp": rng.randint(0, 1), "diabetes": rng.randint(0, 1), "totChol": rng.randint(150, 280),
+            "sysBP": rng.randint(100, 170), "diaBP": rng.randint(60, 100), "BMI": round(rng.uniform(19, 35), 1),
+            "glucose": rng.randint(70, 140),
+        })
+    await users_collection().delete_many({"email": {"$regex": r"^bench\d+@example\.com$"}})
+    await users_collection().insert_many(docs)
+
+    windows = [np.round(synthesize_ecg(500, 50, 60 + 5 * k, seed=k), 3).tolist() for k in range(8)]
+    now_ms = int(time.time() * 1000)
+    history_ecg = synthesize_ecg(25000, 250, 72, seed=0)
+    history_hr_ts = now_ms - 60_000 * np.arange(1440, 0, -1, dtype=np.int64)
+    users = []
+    for i, doc in enumerate(docs):
+        uid = str(doc["_id"])
+        # 100 s of ECG and a day of per-minute heart rates for the history routes
+        timeseries_store.append_ecg(uid, now_ms - 60_000, history_ecg)
+        timeseries_store.append_hr(uid, history_hr_ts, 60 + 20 * np.sin(np.arange(1440) / 60 + i))
+        fstore.write(["users", uid, "realtime"], {
+            "heart_rate": 60 + i % 40,
+            "ecg_data": windows[i % len(windows)],
+            "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+        })
+        users.append({"email": doc["email"], "uid": uid,
+                      "token": create_access_token({"sub": doc["email"]})})
+    return users
+
+
+async def main(args):
+    import httpx
+    import uvicorn
+
+    fsrv, fstore = firebase_server.start(latency=args.firebase_latency)
+    osrv, ostate = openai_server.start(latency=args.openai_latency, chunks=4)
+    _, smtp = smtp_sink.start(latency=args.smtp_latency)
+    fport = fsrv.server_address[1]
+    os.environ.update({
+        "FIREBASE_DATABASE_EMULATOR_HOST": f"127.0.0.1:{fport}",
+        "FIREBASE_DB_URL": f"http://127.0.0.1:{fport}?ns=bench",
+        "OPENAI_BASE_URL": f"http://127.0.0.1:{osrv.server_address[1]}/v1",
+        "OPENAI_API_KEY": "fake",
+        "SMTP_SERVER": "127.0.0.1",
+        "SMTP_PORT": str(smtp.port),
+        "SMTP_USER": "bench@example.com",
+        "SMTP_PASSWORD": "fake",
+        "DB_NAME": args.db_name,
+        "MODEL_PATH": os.environ.get("MODEL_PATH") or os.path.join(ROOT, "model.pkl"),
+        "REPORT_CACHE_BACKEND": os.environ.get("REPORT_CACHE_BACKEND", "memory"),
+        # the "otp" route measures the send path, not the per-email limiter
+        "OTP_SEND_LIMIT": os.environ.get("OTP_SEND_LIMIT", "1000000"),
+    })
+    if args.mongo_uri:
+        os.environ["MONGO_URL"] = args.mongo_uri
+
+    from app.core import database
+    if not args.mongo_uri:
+        from mongomock_motor import AsyncMongoMockClient
+        database._client = AsyncMongoMockClient()
+    from app.main import app
+
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning",
+                                           access_log=False, lifespan="on"))
+    serve_task = asyncio.create_task(server.serve())
+    while not server.started:
+        if serve_task.done():
+            serve_task.result()
+        await asyncio.sleep(0.05)
+
+    users = await seed_users(args.users, fstore)
+    # let the realtime listener pick up the seeded nodes
+    await asyncio.sleep(1.0)
+
+    workload = Workload(users, args)
+    levels = [int(x) for x in args.levels.split(",")]
+    routes = [r.strip() for r in args.routes.split(",") if r.strip()]
+    results = {}
+    limits = httpx.Limits(max_connections=max(levels), max_keepalive_connections=max(levels))
+    headers = {"Accept-Encoding": args.accept_encoding} if args.accept_encoding is not None else None
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=args.timeout,
+                                 headers=headers) as client:
+        for route in routes:
+            results[route] = {}
+            for concurrency in levels:
+                result = await run_level(client, workload, route, concurrency, args.duration, args.warmup)
+                results[route][str(concurrency)] = result
+                print(f"[INFO] {route:<12} c={concurrency:<4} {result['rps']:>8.1f} req/s  "
+                      f"p50={result.get('p50_ms')} p95={result.get('p95_ms')} p99={result.get('p99_ms')} ms  "
+                      f"errors={result['errors']}  bytes={result.get('mean_bytes')}")
+
+    server.should_exit = True
+    await serve_task
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "python": platform.python_version(),
+            "cpus": os.cpu_count(),
+            "mongo": args.mongo_uri or "mongomock",
+            "users": args.users,
+            "duration_s": args.duration,
+            "openai_latency_s": args.openai_latency,
+            "firebase_latency_s": args.firebase_latency,
+            "smtp_latency_s": args.smtp_latency,
+            "llm_calls": ostate.requests,
+            "emails": smtp.received,
+        },
+        "results": results,
+    }
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"[INFO] Wrote {args.out}")
+    else:
+        print(json.dumps(report, indent=2))
+    if args.baseline:
+        compare(args.baseline, report)
+
+
+def compare(path, report):
+    with open(path) as f:
+        baseline = json.load(f)
+    print(f"\nchange vs {path} (commit {baseline['meta'].get('commit')}):")
+    for route, levels in report["results"].items():
+        for concurrency, result in levels.items():
+            old = baseline["results"].get(route, {}).get(concurrency)
+            if not old or not old.get("p95_ms") or not result.get("p95_ms"):
+                continue
+            rps = (result["rps"] / old["rps"] - 1) * 100 if old["rps"] else float("nan")
+            p95 = (result["p95_ms"] / old["p95_ms"] - 1) * 100
+            print(f"  {route:<12} c={concurrency:<4} rps {rps:+6.1f}%   p95 {p95:+6.1f}%")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--routes", default=DEFAULT_ROUTES, help=f"comma separated, from {','.join(ROUTES)}")
+    parser.add_argument("--levels", default="1,8,32", help="comma separated concurrency levels")
+    parser.add_argument("--duration", type=float, default=10.0, help="measured seconds per route and level")
+    parser.add_argument("--warmup", type=float, default=1.0)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--openai-latency", type=float, default=0.5)
+    parser.add_argument("--firebase-latency", type=float, default=0.0)
+    parser.add_argument("--smtp-latency", type=float, default=0.0)
+    parser.add_argument("--narrative", action="store_true", help="request the LLM narrative on /ecg")
+    parser.add_argument("--accept-encoding", help="Accept-Encoding sent by the clients (httpx default: gzip, deflate)")
+    parser.add_argument("--mongo-uri", help="use a real mongod instead of mongomock")
+    parser.add_argument("--db-name", default="cardio_bench")
+    parser.add_argument("--out", help="write the JSON report here")
+    parser.add_argument("--baseline", help="earlier JSON report to compare against")
+    asyncio.run(main(parser.parse_args()))
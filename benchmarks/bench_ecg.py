@@ -0,0 +1,36 @@
+"""
+ECG analysis benchmark.
+
+Times analyze_ecg (band-pass, R-peak detection, RR/HRV, rhythm flags) on
+synthetic P-QRS-T windows of increasing length and checks the detected heart
+rate against the rate the window was generated with.
+
+    python -m benchmarks.bench_ecg --fs 250 --sizes 1000 10000 100000
+"""
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.ecg import analyze_ecg, synthesize_ecg
+
+
+def main(args):
+    print(f"{'samples':>9} {'rhythm':<40} {'true_hr':>7} {'hr':>7} {'peaks':>6} {'ms/call':>9}")
+    for n in args.sizes:
+        for hr, jitter in ((72, 0.0), (110, 0.0), (85, 0.25)):
+            x = synthesize_ecg(n, args.fs, heart_rate=hr, rr_jitter=jitter, seed=n)
+            result = analyze_ecg(x, args.fs)
+            number = max(1, 200000 // n)
+            seconds = min(timeit.repeat(lambda: analyze_ecg(x, args.fs), number=number, repeat=3)) / number
+            print(f"{n:>9} {result['rhythm']:<40} {hr:>7} {result['heart_rate_bpm'] or '-':>7} "
+                  f"{result['r_peak_count']:>6} {seconds * 1000:>9.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fs", type=float, default=250.0)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    main(parser.parse_args())
@@ -0,0 +1,117 @@
+"""
+Email delivery benchmark.
+
+Sends N OTP-style emails two ways and reports caller-side latency and
+delivery throughput:
+
+  inline   a new SMTP connection + STARTTLS + login per message, on the
+           caller (what /forgot-password/send used to do)
+  queued   EmailDispatcher.enqueue() from the caller, delivered by background
+           workers over persistent sessions
+
+By default the target is benchmarks/fakes/smtp_sink.py (STARTTLS + AUTH).
+--aiosmtpd runs a plain aiosmtpd sink instead (`pip install aiosmtpd`; no
+STARTTLS/AUTH). --fail-rate makes that sink answer 451 to a share of messages
+so the retry path shows up in the numbers.
+
+    python -m benchmarks.bench_email --emails 200 --workers 4
+    python -m benchmarks.bench_email --aiosmtpd --fail-rate 0.1
+"""
+import argparse
+import asyncio
+import os
+import random
+import socket
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fakes import smtp_sink
+
+
+def start_aiosmtpd(fail_rate):
+    from aiosmtpd.controller import Controller
+
+    class Handler:
+        def __init__(self):
+            self.received = 0
+
+        async def handle_DATA(self, server, session, envelope):
+            if random.random() < fail_rate:
+                return "451 try again later"
+            self.received += 1
+            return "250 OK"
+
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    handler = Handler()
+    controller = Controller(handler, hostname="127.0.0.1", port=port)
+    controller.start()
+    return port, handler
+
+
+def ms(values):
+    p50, p99 = np.percentile(values, [50, 99]) * 1000
+    return f"p50 {p50:7.2f} ms  p99 {p99:7.2f} ms"
+
+
+async def main(args):
+    if args.aiosmtpd:
+        port, sink = start_aiosmtpd(args.fail_rate)
+        os.environ["SMTP_STARTTLS"] = "false"
+        os.environ["SMTP_USER"] = ""  # empty, so .env credentials are not picked up
+    else:
+        _, sink = smtp_sink.start(latency=args.latency)
+        port = sink.port
+        os.environ["SMTP_USER"] = "bench@example.com"
+        os.environ["SMTP_PASSWORD"] = "fake"
+    os.environ.update(SMTP_SERVER="127.0.0.1", SMTP_PORT=str(port), EMAIL_RETRY_BASE_DELAY="0.05")
+
+    from app.core import mailer
+
+    subject, body = "Your Verification Code", "Your OTP for verification is: 1234"
+
+    # inline: blocking send per message on the caller
+    inline = mailer.EmailDispatcher()
+    caller = []
+    start = time.perf_counter()
+    for i in range(args.inline_emails):
+        t = time.perf_counter()
+        inline.enqueue(f"user{i}@example.com", subject, body)
+        caller.append(time.perf_counter() - t)
+    elapsed = time.perf_counter() - start
+    print(f"inline  {args.inline_emails:>5} emails  {inline.sent / elapsed:8.1f} sent/s  caller {ms(caller)}")
+
+    # queued: enqueue returns at once, workers deliver over kept-alive sessions
+    queued = mailer.EmailDispatcher(workers=args.workers)
+    await queued.start()
+    connects_before = mailer.email_smtp_connects_total._values.get((), 0)
+    caller = []
+    start = time.perf_counter()
+    for i in range(args.emails):
+        t = time.perf_counter()
+        queued.enqueue(f"user{i}@example.com", subject, body)
+        caller.append(time.perf_counter() - t)
+    while queued.sent + queued.failed < args.emails:
+        await asyncio.sleep(0.01)
+    elapsed = time.perf_counter() - start
+    await queued.stop()
+    connects = mailer.email_smtp_connects_total._values.get((), 0) - connects_before
+    print(f"queued  {args.emails:>5} emails  {queued.sent / elapsed:8.1f} sent/s  caller {ms(caller)}  "
+          f"({args.workers} workers, {connects} SMTP sessions, {queued.retried} retries, "
+          f"{queued.failed} dead letters)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--emails", type=int, default=200)
+    parser.add_argument("--inline-emails", type=int, default=50)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.0, help="smtp_sink delay per accepted message")
+    parser.add_argument("--aiosmtpd", action="store_true")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="share of 451 replies (--aiosmtpd only)")
+    asyncio.run(main(parser.parse_args()))
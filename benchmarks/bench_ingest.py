@@ -0,0 +1,94 @@
+"""
+Device upload decoding benchmark.
+
+Builds one upload body holding N frames (60 s ECG windows at ECG_SAMPLE_RATE
+plus a heart rate) in both the binary frame format accepted by POST /ingest
+and the JSON shape devices write to Firebase today, then compares body size,
+decode time, and the end-to-end decode + store time into a TimeSeriesStore.
+
+    python -m benchmarks.bench_ingest --frames 5000 --users 100
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.ecg import synthesize_ecg
+from app.core.frames import encode_frame, group_frames
+from app.core.realtime import parse_device_timestamp
+from app.core.timeseries import TimeSeriesStore, to_ecg_int16
+
+
+def timed(fn, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def build(args):
+    users = [f"{i:024x}" for i in range(args.users)]
+    window = np.rint(synthesize_ecg(int(args.fs * 60), args.fs, 72, seed=1) * 1000).astype(np.int16)
+    t0 = 1_700_000_000_000
+    binary, docs = [], []
+    for i in range(args.frames):
+        uid = users[i % args.users]
+        ts = t0 + (i // args.users + 1) * 60_000
+        hr = 60 + i % 40
+        binary.append(encode_frame(uid, ts, window, hr, int(args.fs)))
+        docs.append({
+            "user_id": uid,
+            "heart_rate": hr,
+            "timestamp": time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(ts / 1000)),
+            "ecg_data": window.tolist(),
+        })
+    return b"".join(binary), json.dumps(docs).encode()
+
+
+def store_json(body, fs):
+    store = TimeSeriesStore()
+    for doc in json.loads(body):
+        ts = parse_device_timestamp(doc["timestamp"], 0)
+        store.append_hr(doc["user_id"], [ts], [doc["heart_rate"]])
+        store.append_ecg(doc["user_id"], ts, to_ecg_int16(doc["ecg_data"]), fs=fs)
+    return store
+
+
+def store_binary(body):
+    store = TimeSeriesStore()
+    for uid, g in group_frames(body).items():
+        store.append_hr(uid, g["hr_ts"], g["hr"])
+        store.series(uid, "ecg").append(g["ecg_ts"], g["ecg"])
+    return store
+
+
+def main(args):
+    binary, js = build(args)
+    samples = args.frames * int(args.fs * 60)
+    print(f"{args.frames} frames, {args.users} users, {samples:,} ECG samples")
+    print(f"body size:      json {len(js) / 1e6:8.2f} MB   binary {len(binary) / 1e6:8.2f} MB")
+
+    json_decode, _ = timed(lambda: json.loads(js))
+    bin_decode, _ = timed(lambda: group_frames(binary))
+    print(f"decode:         json {json_decode * 1000:8.1f} ms   binary {bin_decode * 1000:8.1f} ms   "
+          f"({json_decode / bin_decode:.1f}x)")
+
+    json_total, _ = timed(lambda: store_json(js, args.fs), repeat=3)
+    bin_total, _ = timed(lambda: store_binary(binary), repeat=3)
+    print(f"decode + store: json {json_total * 1000:8.1f} ms   binary {bin_total * 1000:8.1f} ms   "
+          f"({json_total / bin_total:.1f}x, {samples / bin_total:,.0f} samples/s binary)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--frames", type=int, default=5000)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--fs", type=float, default=50.0)
+    main(parser.parse_args())
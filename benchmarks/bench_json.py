@@ -0,0 +1,128 @@
+"""
+Response serialization benchmark: stdlib JSONResponse vs ORJSONResponse.
+
+Runs FastAPI's own serialization step on payloads shaped like the real
+routes: jsonable_encoder then the response class's render for plain return
+values, render alone for the routes that return the response themselves:
+
+  login        token + public profile (with a datetime)
+  me           public profile
+  history-ecg  /history/ecg, 5000 samples (int64 timestamps, int16 values)
+  history-hr   /history/hr raw, a day of per-minute heart rates
+  snapshot     /patients/snapshot with 500 patients
+
+"before" is what the routes returned until now (numpy arrays converted with
+.tolist(), stdlib json); "after" is what they return now: the history and
+snapshot routes hand the arrays to ORJSONResponse directly. Also reports gzip / brotli size and time per payload.
+
+    python -m benchmarks.bench_json
+    python -m benchmarks.bench_json --number 2000
+
+For request-level numbers run bench_e2e with
+--routes login,me,history-ecg,history-hr (and RESPONSE_COMPRESSION=gzip with
+--accept-encoding gzip for compression on the wire).
+"""
+import argparse
+import gzip
+import os
+import sys
+import timeit
+from datetime import datetime, timezone
+
+import numpy as np
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.ecg import synthesize_ecg
+from app.core.jsonresponse import ORJSONResponse
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def payloads():
+    profile = {
+        "_id": "6ad4c0207fb20d23077df9a7", "email": "patient@example.com", "male": 1, "age": 54,
+        "currentSmoker": 0, "cigsPerDay": 0, "BPMeds": 0, "prevalentStroke": 0, "prevalentHyp": 1,
+        "diabetes": 0, "totChol": 231, "sysBP": 138, "diaBP": 86, "BMI": 27.4, "glucose": 92,
+        "profile_updated_at": datetime(2026, 10, 1, 8, 30, tzinfo=timezone.utc),
+    }
+    login = {"status": "success", "message": "Login successful", "access_token": "x" * 180,
+             "token_type": "bearer", "user": profile}
+    me = {"status": "success", "user": profile}
+
+    now = 1_792_000_000_000
+    ecg_ts = now - np.round(np.arange(4999, -1, -1) * 4.0).astype(np.int64)
+    ecg = np.round(synthesize_ecg(5000, 250, 72, seed=0) * 1000).astype(np.int16)
+    hr_ts = now - 60_000 * np.arange(1440, 0, -1, dtype=np.int64)
+    hr = np.round((70 + 10 * np.sin(np.arange(1440) / 60)).astype(np.float32).astype(np.float64), 1)
+
+    def history_ecg(arrays):
+        t, v = (ecg_ts, ecg) if arrays else (ecg_ts.tolist(), ecg.tolist())
+        return {"status": "success", "user_id": profile["_id"], "total_samples": 5000, "t": t, "values": v}
+
+    def history_hr(arrays):
+        t, v = (hr_ts, hr) if arrays else (hr_ts.tolist(), hr.tolist())
+        return {"status": "success", "user_id": profile["_id"], "resolution": "raw", "t": t, "values": v}
+
+    rng = np.random.default_rng(0)
+    ids = [f"{i:024x}" for i in range(500)]
+    rates = rng.integers(55, 110, 500).astype(np.float64)
+    rates[rng.random(500) < 0.05] = np.nan
+    probs = np.where(np.isnan(rates), np.nan, rng.random(500))
+
+    def snapshot(arrays):
+        def column(values, decimals):
+            rounded = np.round(values, decimals)
+            return rounded if arrays else [None if np.isnan(v) else float(v) for v in rounded]
+        return {"status": "success", "count": 500, "user_id": ids, "heart_rate": column(rates, 1),
+                "risk_probability": column(probs, 3), "risk_percentage": column(probs * 100, 2),
+                "realtime_age_s": [12.5] * 500, "stale": [False] * 500, "not_found": []}
+
+    # (before, after, whether the route returns ORJSONResponse itself)
+    return {
+        "login": (lambda: login, lambda: login, False),
+        "me": (lambda: me, lambda: me, False),
+        "history-ecg": (lambda: history_ecg(False), lambda: history_ecg(True), True),
+        "history-hr": (lambda: history_hr(False), lambda: history_hr(True), True),
+        "snapshot": (lambda: snapshot(False), lambda: snapshot(True), True),
+    }
+
+
+def serialize(response_class, build, direct=False):
+    if direct:
+        # a returned Response is sent as is
+        return response_class(build()).body
+    # what FastAPI does for a route without a response_model
+    return response_class(jsonable_encoder(build())).body
+
+
+def timed(fn, number):
+    return min(timeit.repeat(fn, number=number, repeat=5)) / number
+
+
+def main(args):
+    print(f"{'payload':<12} {'bytes':>8} {'before µs':>10} {'after µs':>9} {'speedup':>8}   "
+          f"{'gzip bytes':>10} {'gzip µs':>8} {'br bytes':>9} {'br µs':>7}")
+    for name, (before, after, direct) in payloads().items():
+        body = serialize(ORJSONResponse, after, direct)
+        number = max(10, args.number // max(1, len(body) // 1000))
+        t_before = timed(lambda: serialize(JSONResponse, before), number)
+        t_after = timed(lambda: serialize(ORJSONResponse, after, direct), number)
+        gz = gzip.compress(body, compresslevel=6)
+        t_gz = timed(lambda: gzip.compress(body, compresslevel=6), number)
+        br = brotli.compress(body, quality=4) if brotli else None
+        t_br = timed(lambda: brotli.compress(body, quality=4), number) if brotli else None
+        print(f"{name:<12} {len(body):>8} {t_before * 1e6:>10.1f} {t_after * 1e6:>9.1f} {t_before / t_after:>7.1f}x   "
+              f"{len(gz):>10} {t_gz * 1e6:>8.1f} {len(br) if br else '-':>9} "
+              f"{f'{t_br * 1e6:.1f}' if br else '-':>7}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--number", type=int, default=500, help="calls per timing for a ~1 KB payload")
+    main(parser.parse_args())
@@ -0,0 +1,100 @@
+"""
+Login storm benchmark.
+
+Fires N concurrent password verifications (what /login does) and, at the same
+time, a probe coroutine that stands in for a cheap endpoint such as /me: it
+wakes every 5 ms and records how late the event loop let it run.
+
+Runs the storm twice, once with bcrypt inline on the event loop (the old
+behaviour) and once through the bounded hashing pool, and prints login
+throughput plus probe latency percentiles for each.
+
+    python -m benchmarks.bench_login_storm --logins 200 --workers 4
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    k = min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))
+    return values[k]
+
+
+async def probe(stop: asyncio.Event, samples: list, interval=0.005):
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+        samples.append(max(0.0, loop.time() - expected) * 1000)
+
+
+async def run_storm(label, verify, hashed, logins, concurrency):
+    stop = asyncio.Event()
+    samples = []
+    probe_task = asyncio.create_task(probe(stop, samples))
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one_login():
+        async with sem:
+            return await verify("benchmark-password", hashed)
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(one_login() for _ in range(logins)), return_exceptions=True)
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await probe_task
+
+    ok = sum(1 for r in results if r is True)
+    return {
+        "mode": label,
+        "logins": logins,
+        "succeeded": ok,
+        "rejected": logins - ok,
+        "seconds": round(elapsed, 3),
+        "logins_per_sec": round(ok / elapsed, 1),
+        "probe_p50_ms": round(percentile(samples, 50), 2),
+        "probe_p99_ms": round(percentile(samples, 99), 2),
+        "probe_max_ms": round(max(samples or [0]), 2),
+        "probe_mean_ms": round(statistics.fmean(samples) if samples else 0.0, 2),
+    }
+
+
+async def main(args):
+    os.environ["HASH_WORKERS"] = str(args.workers)
+    os.environ["HASH_POOL"] = args.pool
+    from app.core import securitycore
+
+    hashed = securitycore.get_password_hash("benchmark-password")
+
+    async def inline_verify(plain, hashed_pw):
+        return securitycore.verify_password(plain, hashed_pw)
+
+    rows = [
+        await run_storm("inline", inline_verify, hashed, args.logins, args.concurrency),
+        await run_storm(f"pool[{args.pool} x{args.workers}]", securitycore.verify_password_async,
+                        hashed, args.logins, args.concurrency),
+    ]
+    securitycore.shutdown_hash_pool()
+
+    header = list(rows[0].keys())
+    print(" | ".join(header))
+    for row in rows:
+        print(" | ".join(str(row[h]) for h in header))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 4)
+    parser.add_argument("--pool", choices=["thread", "process"], default="thread")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,161 @@
+"""
+Overload benchmark: a /predict spike with and without admission control.
+
+Boots the app as bench_e2e does (mongomock, fake Firebase and OpenAI servers)
+and, for --duration seconds, runs
+
+  spike   --spike closed-loop clients on GET /predict, each picking a random
+          patient, so most calls need a fresh LLM report (--openai-latency each)
+  probe   one client polling GET /me, the cheap route that should not suffer
+
+Every mode runs in its own process (the limits are read at import time):
+
+    python -m benchmarks.bench_overload                        # off, then on
+    python -m benchmarks.bench_overload --modes on --spike 128 --openai-latency 5
+
+For /predict it reports full answers, answers with the deferred AI report,
+503s and client timeouts (--timeout), with latency percentiles; for /me the
+latency percentiles.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.bench_e2e import ROOT, free_port, seed_users
+from benchmarks.fakes import firebase_server, openai_server
+
+
+def percentiles(latencies):
+    if not latencies:
+        return {}
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    return {"p50_ms": round(p50 * 1000, 1), "p95_ms": round(p95 * 1000, 1), "p99_ms": round(p99 * 1000, 1)}
+
+
+async def run(args):
+    import httpx
+    import uvicorn
+
+    fsrv, fstore = firebase_server.start()
+    osrv, ostate = openai_server.start(latency=args.openai_latency, chunks=4)
+    fport = fsrv.server_address[1]
+    os.environ.update({
+        "FIREBASE_DATABASE_EMULATOR_HOST": f"127.0.0.1:{fport}",
+        "FIREBASE_DB_URL": f"http://127.0.0.1:{fport}?ns=bench",
+        "OPENAI_BASE_URL": f"http://127.0.0.1:{osrv.server_address[1]}/v1",
+        "OPENAI_API_KEY": "fake",
+        "DB_NAME": "cardio_overload_bench",
+        "MODEL_PATH": os.environ.get("MODEL_PATH") or os.path.join(ROOT, "model.pkl"),
+        "REPORT_CACHE_BACKEND": "memory",
+        "ADMISSION_ENABLED": "true" if args.mode == "on" else "false",
+    })
+    if args.mode == "off":
+        # the LLM queue can only be unbounded when admission control is off
+        os.environ.update({"LLM_QUEUE_SIZE": "1000000", "LLM_QUEUE_TIMEOUT": "3600", "LLM_QUEUE_PER_CLIENT": "1000000"})
+
+    from app.core import database
+    from mongomock_motor import AsyncMongoMockClient
+    database._client = AsyncMongoMockClient()
+    from app.main import app
+    from app.routes.predict import DEFERRED_AI_REPORT
+
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning",
+                                           access_log=False, lifespan="on"))
+    serve_task = asyncio.create_task(server.serve())
+    while not server.started:
+        if serve_task.done():
+            serve_task.result()
+        await asyncio.sleep(0.05)
+    users = await seed_users(args.users, fstore)
+    await asyncio.sleep(1.0)
+
+    predict = {"full": 0, "deferred": 0, "503": 0, "timeout": 0, "other": 0, "latencies": []}
+    probe = []
+    deadline = time.perf_counter() + args.duration
+    limits = httpx.Limits(max_connections=args.spike + 8, max_keepalive_connections=args.spike + 8)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=args.timeout) as client:
+
+        async def spike_client(seed):
+            rng = random.Random(seed)
+            while time.perf_counter() < deadline:
+                user = rng.choice(users)
+                start = time.perf_counter()
+                try:
+                    response = await asyncio.wait_for(
+                        client.get("/predict", headers={"Authorization": f"Bearer {user['token']}"}), args.timeout)
+                except asyncio.TimeoutError:
+                    # the client gives up; the server may well still be working on it
+                    predict["timeout"] += 1
+                    continue
+                except httpx.HTTPError:
+                    predict["other"] += 1
+                    continue
+                predict["latencies"].append(time.perf_counter() - start)
+                if response.status_code == 200:
+                    deferred = response.json()["ai_report"] == DEFERRED_AI_REPORT
+                    predict["deferred" if deferred else "full"] += 1
+                elif response.status_code == 503:
+                    predict["503"] += 1
+                    await asyncio.sleep(float(response.headers.get("retry-after", 1)))
+                else:
+                    predict["other"] += 1
+
+        async def probe_client():
+            auth = {"Authorization": f"Bearer {users[0]['token']}"}
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                try:
+                    await asyncio.wait_for(client.get("/me", headers=auth), args.timeout)
+                    probe.append(time.perf_counter() - start)
+                except (asyncio.TimeoutError, httpx.HTTPError):
+                    probe.append(args.timeout)
+                await asyncio.sleep(0.05)
+
+        await asyncio.gather(probe_client(), *(spike_client(i) for i in range(args.spike)))
+
+    server.should_exit = True
+    await serve_task
+    latencies = predict.pop("latencies")
+    return {"mode": args.mode, "predict": {**predict, **percentiles(latencies)}, "me": percentiles(probe),
+            "llm_calls": ostate.requests}
+
+
+def main(args):
+    if args.mode:
+        print(json.dumps(asyncio.run(run(args))))
+        return
+    for mode in args.modes.split(","):
+        argv = [sys.executable, "-m", "benchmarks.bench_overload", "--mode", mode] + [
+            f"--{k.replace('_', '-')}={v}" for k, v in vars(args).items() if k not in ("mode", "modes")]
+        proc = subprocess.run(argv, cwd=ROOT, capture_output=True, text=True)
+        out = proc.stdout.strip().splitlines()
+        if proc.returncode or not out:
+            print(proc.stderr[-2000:])
+            continue
+        result = json.loads(out[-1])
+        p, me = result["predict"], result["me"]
+        print(f"admission {mode:<3}  /predict full={p['full']} deferred={p['deferred']} 503={p['503']} "
+              f"timeout={p['timeout']} p50={p.get('p50_ms')} p99={p.get('p99_ms')} ms   "
+              f"/me p50={me.get('p50_ms')} p99={me.get('p99_ms')} ms   llm calls={result['llm_calls']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modes", default="off,on")
+    parser.add_argument("--mode", choices=("off", "on"), help=argparse.SUPPRESS)
+    parser.add_argument("--spike", type=int, default=48, help="concurrent /predict clients")
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--openai-latency", type=float, default=3.0)
+    parser.add_argument("--timeout", type=float, default=15.0, help="client gives up on a request after this")
+    main(parser.parse_args())
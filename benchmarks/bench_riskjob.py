@@ -0,0 +1,105 @@
+"""
+Population risk job benchmark.
+
+Seeds N synthetic users (default 1,000,000) plus a realtime heart rate for a
+share of them, then runs the risk job three times:
+
+  full          every user read, scored in chunks and written
+  incremental   after --changed-profiles / --changed-hr of the users changed
+  no-op         nothing changed since the previous run
+
+and reports users/s, writes and wall time for each. For reference it also
+times the per-request path (one predict_cardiovascular_risk call per user).
+
+    python -m benchmarks.bench_riskjob
+    python -m benchmarks.bench_riskjob --mongo-uri mongodb://db:27017 --users 200000
+
+Needs a real mongod (the job's bulk writes are not supported by mongomock).
+The benchmark drops its database at the end unless --keep is given.
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+from bson import ObjectId
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.bench_users_index import make_users
+
+
+def line(label, summary):
+    print(f"{label:<12} {summary['visited']:>9} visited  {summary['written']:>9} written  "
+          f"{summary['seconds']:>8.2f} s  {summary['users_per_s']:>10.1f} users/s")
+
+
+async def main(args):
+    os.environ["DB_NAME"] = args.db_name
+    from app.core import database
+    from motor.motor_asyncio import AsyncIOMotorClient
+    database._client = AsyncIOMotorClient(args.mongo_uri)
+    database.DB_NAME = args.db_name
+
+    from app.core.modelstore import model_store
+    from app.core.realtime import realtime_store
+    from app.core.riskjob import RiskJob
+    from app.core.mlllm import predict_cardiovascular_risk
+
+    model_store.load()
+    users = database.users_collection()
+    await database.get_db().drop_collection("users")
+    await database.get_db().drop_collection("jobs")
+
+    rng = random.Random(0)
+    start = time.perf_counter()
+    ids = []
+    for offset in range(0, args.users, args.batch):
+        docs = make_users(offset, min(args.batch, args.users - offset), rng)
+        await users.insert_many(docs, ordered=False)
+        ids += [str(d["_id"]) for d in docs]
+    with_hr = rng.sample(ids, int(len(ids) * args.hr_share))
+    for uid in with_hr:
+        realtime_store.update_local(uid, {"heart_rate": rng.randint(55, 110)})
+    realtime_store.ready = True
+    print(f"[INFO] Seeded {args.users} users ({len(with_hr)} with a heart rate) in {time.perf_counter() - start:.1f}s")
+
+    sample = await users.find({}, {"_id": 0, "password": 0}).limit(args.per_request).to_list(None)
+    t = time.perf_counter()
+    for doc in sample:
+        predict_cardiovascular_risk(doc, 72)
+    per_request = len(sample) / (time.perf_counter() - t)
+    print(f"per-request  {len(sample):>9} scored              one call per user {per_request:>10.1f} users/s "
+          f"(~{args.users / per_request:.0f} s for all users, before any I/O)")
+
+    job = RiskJob(chunk_size=args.chunk_size, interval=0)
+    line("full", await job.run(full=True))
+
+    changed = rng.sample(ids, int(len(ids) * args.changed_profiles))
+    for uid in changed:
+        await users.update_one({"_id": ObjectId(uid)},
+                               {"$inc": {"totChol": 5}, "$currentDate": {"profile_updated_at": True}})
+    for uid in rng.sample(with_hr, int(len(with_hr) * args.changed_hr)):
+        realtime_store.update_local(uid, {"heart_rate": rng.randint(55, 110)})
+    line("incremental", await job.run())
+    line("no-op", await job.run())
+
+    if not args.keep:
+        await database._client.drop_database(args.db_name)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mongo-uri", default="mongodb://localhost:27017")
+    parser.add_argument("--db-name", default="cardio_riskjob_bench")
+    parser.add_argument("--users", type=int, default=1_000_000)
+    parser.add_argument("--batch", type=int, default=10_000)
+    parser.add_argument("--chunk-size", type=int, default=5000)
+    parser.add_argument("--hr-share", type=float, default=0.8, help="share of users with a realtime heart rate")
+    parser.add_argument("--changed-profiles", type=float, default=0.01)
+    parser.add_argument("--changed-hr", type=float, default=0.05)
+    parser.add_argument("--per-request", type=int, default=5000, help="users timed through the per-request path")
+    parser.add_argument("--keep", action="store_true")
+    asyncio.run(main(parser.parse_args()))
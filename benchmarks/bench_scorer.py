@@ -0,0 +1,100 @@
+"""
+Risk scorer microbenchmark and parity check.
+
+Loads model.pkl (and logistic_scaler.pkl when --scaler is given), checks that
+RiskScorer agrees with sklearn's predict_proba on random inputs, then times:
+
+  - the old per-request path (one-row pandas DataFrame + predict_proba)
+  - RiskScorer on a single row
+  - RiskScorer on batches of N rows
+
+    python -m benchmarks.bench_scorer --model model.pkl --scaler logistic_scaler.pkl
+"""
+import argparse
+import os
+import sys
+import timeit
+import warnings
+
+import joblib
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.scorer import FEATURES, PROFILE_FEATURES, RiskScorer, build_feature_matrix
+
+warnings.filterwarnings("ignore", message="Trying to unpickle estimator")
+
+# plausible ranges per feature, used to draw random patients
+RANGES = {
+    "male": (0, 1), "age": (30, 80), "currentSmoker": (0, 1), "cigsPerDay": (0, 40), "BPMeds": (0, 1),
+    "prevalentStroke": (0, 1), "prevalentHyp": (0, 1), "diabetes": (0, 1), "totChol": (120, 400),
+    "sysBP": (90, 200), "diaBP": (60, 120), "BMI": (16, 45), "glucose": (60, 300), "heart_rate": (45, 130),
+}
+
+
+def random_matrix(n, rng):
+    lo = np.array([RANGES[f][0] for f in FEATURES], dtype=np.float64)
+    hi = np.array([RANGES[f][1] for f in FEATURES], dtype=np.float64)
+    return lo + rng.random((n, len(FEATURES))) * (hi - lo)
+
+
+def sklearn_proba(model, scaler, X):
+    if scaler is not None:
+        X = scaler.transform(X)
+    return model.predict_proba(X)[:, 1]
+
+
+def check_parity(model, scaler, scorer, rng, n=10000):
+    X = random_matrix(n, rng)
+    expected = sklearn_proba(model, scaler, X)
+    got = scorer.score(X)
+    max_err = float(np.max(np.abs(expected - got)))
+    assert max_err < 1e-9, f"scorer disagrees with sklearn (max abs error {max_err:.3e})"
+
+    # the dict -> matrix path used by the routes
+    users = [dict(zip(PROFILE_FEATURES, row[:-1])) for row in X[:100]]
+    got_dicts = scorer.score(build_feature_matrix(users, X[:100, -1]))
+    assert np.allclose(got_dicts, expected[:100], rtol=0, atol=1e-9)
+    return max_err
+
+
+def bench(label, fn, number):
+    seconds = min(timeit.repeat(fn, number=number, repeat=5)) / number
+    print(f"{label:<40} {seconds * 1e6:>10.2f} us/call")
+    return seconds
+
+
+def main(args):
+    model = joblib.load(args.model)
+    scaler = joblib.load(args.scaler) if args.scaler else None
+    scorer = RiskScorer.from_estimator(model, scaler)
+    rng = np.random.default_rng(0)
+
+    max_err = check_parity(model, scaler, scorer, rng)
+    print(f"parity with sklearn: max abs error {max_err:.2e}")
+
+    user = dict(zip(PROFILE_FEATURES, random_matrix(1, rng)[0, :-1]))
+    heart_rate = 72.0
+
+    def legacy_single():
+        import pandas as pd
+        input_data = {**user, "heart_rate": heart_rate}
+        df = pd.DataFrame([input_data], columns=FEATURES)
+        X = df.values if scaler is None else scaler.transform(df.values)
+        return model.predict_proba(X)[0][1]
+
+    bench("legacy pandas + predict_proba (1 row)", legacy_single, 200)
+    bench("RiskScorer dict -> score (1 row)", lambda: scorer.score(build_feature_matrix([user], [heart_rate]))[0], 2000)
+    for n in args.batch_sizes:
+        X = random_matrix(n, rng)
+        per_call = bench(f"RiskScorer matrix (batch {n})", lambda: scorer.score(X), max(1, 20000 // n))
+        print(f"{'':<40} {per_call / n * 1e9:>10.1f} ns/row")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default="model.pkl")
+    parser.add_argument("--scaler", default=None)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 16, 256, 4096, 65536])
+    main(parser.parse_args())
@@ -0,0 +1,133 @@
+"""
+Clinician dashboard benchmark: per-patient /predict calls vs one /patients/snapshot.
+
+Boots the app under uvicorn the same way as bench_e2e (mongomock, fake Firebase
+and OpenAI servers), seeds --users patients and one clinician, then times a
+dashboard refresh of all patients three ways:
+
+  sequential   GET /predict once per patient, one after another (today's dashboard)
+  concurrent   the same calls, --concurrency in flight
+  snapshot     a single POST /patients/snapshot with every id
+
+The per-patient calls are warmed once first so their AI reports come from the
+report cache; the comparison is then about round trips, auth and per-request
+scoring, not LLM latency.
+
+    python -m benchmarks.bench_snapshot --users 200
+    python -m benchmarks.bench_snapshot --realtime-mode off --firebase-latency 0.02
+
+With --realtime-mode off there is no snapshot cache and the snapshot endpoint
+reads each patient's node from Firebase (REALTIME_BULK_CONCURRENCY at a time).
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.bench_e2e import ROOT, free_port, seed_users
+from benchmarks.fakes import firebase_server, openai_server
+
+
+def line(label, seconds, requests, patients):
+    p50, p95 = np.percentile(seconds, [50, 95])
+    print(f"{label:<11} {requests:>5} requests/refresh  p50 {p50 * 1000:>9.1f} ms  p95 {p95 * 1000:>9.1f} ms  "
+          f"{patients / p50:>9.0f} patients/s")
+
+
+async def refresh_per_patient(client, users, concurrency):
+    limit = asyncio.Semaphore(concurrency)
+
+    async def one(user):
+        async with limit:
+            response = await client.get("/predict", headers={"Authorization": f"Bearer {user['token']}"})
+            response.raise_for_status()
+
+    await asyncio.gather(*(one(user) for user in users))
+
+
+async def main(args):
+    import httpx
+    import uvicorn
+
+    fsrv, fstore = firebase_server.start(latency=args.firebase_latency)
+    osrv, _ = openai_server.start(latency=args.openai_latency, chunks=4)
+    fport = fsrv.server_address[1]
+    os.environ.update({
+        "FIREBASE_DATABASE_EMULATOR_HOST": f"127.0.0.1:{fport}",
+        "FIREBASE_DB_URL": f"http://127.0.0.1:{fport}?ns=bench",
+        "OPENAI_BASE_URL": f"http://127.0.0.1:{osrv.server_address[1]}/v1",
+        "OPENAI_API_KEY": "fake",
+        "DB_NAME": "cardio_snapshot_bench",
+        "MODEL_PATH": os.environ.get("MODEL_PATH") or os.path.join(ROOT, "model.pkl"),
+        "REPORT_CACHE_BACKEND": "memory",
+        "REALTIME_MODE": args.realtime_mode,
+    })
+
+    from app.core import database
+    from mongomock_motor import AsyncMongoMockClient
+    database._client = AsyncMongoMockClient()
+    from app.main import app
+
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning",
+                                           access_log=False, lifespan="on"))
+    serve_task = asyncio.create_task(server.serve())
+    while not server.started:
+        if serve_task.done():
+            serve_task.result()
+        await asyncio.sleep(0.05)
+
+    users = await seed_users(args.users + 1, fstore)
+    clinician, patients = users[0], users[1:]
+    # roles are assigned by an operator directly in the database
+    await database.users_collection().update_one({"email": clinician["email"]}, {"$set": {"role": "clinician"}})
+    await asyncio.sleep(1.0)
+
+    ids = [user["uid"] for user in patients]
+    auth = {"Authorization": f"Bearer {clinician['token']}"}
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=args.timeout) as client:
+        await refresh_per_patient(client, patients, args.concurrency)
+
+        timings = {"sequential": [], "concurrent": [], "snapshot": []}
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            await refresh_per_patient(client, patients, 1)
+            timings["sequential"].append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            await refresh_per_patient(client, patients, args.concurrency)
+            timings["concurrent"].append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            response = await client.post("/patients/snapshot", json={"user_ids": ids}, headers=auth)
+            response.raise_for_status()
+            timings["snapshot"].append(time.perf_counter() - start)
+        body = response.json()
+
+    server.should_exit = True
+    await serve_task
+
+    print(f"[INFO] {len(ids)} patients, realtime mode {args.realtime_mode}, "
+          f"firebase latency {args.firebase_latency * 1000:.0f} ms, {args.repeat} refreshes each")
+    line("sequential", timings["sequential"], len(ids), len(ids))
+    line("concurrent", timings["concurrent"], len(ids), len(ids))
+    line("snapshot", timings["snapshot"], 1, len(ids))
+    print(f"[INFO] snapshot returned {body['count']} rows, {len(body['not_found'])} not found, "
+          f"{len(response.content)} bytes")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=200, help="patients on the dashboard (max 500 per snapshot)")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--realtime-mode", default="listen", choices=("listen", "poll", "off"))
+    parser.add_argument("--firebase-latency", type=float, default=0.0)
+    parser.add_argument("--openai-latency", type=float, default=0.2)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,220 @@
+"""
+Cold start benchmark: import time and boot-to-ready time.
+
+  import   `import app.main` in a fresh interpreter, repeated --runs times;
+           --top lists the slowest modules from `python -X importtime`
+  boot     a fresh uvicorn worker per run, timing from spawn until /health
+           answers (the process serves) and until /ready answers 200 (the
+           model is warm). Each scenario is run against:
+             file        MODEL_PATH is a local file
+             url         MODEL_PATH is served over HTTP by this script
+             url-down    the URL is unreachable after a successful first fetch
+           once with an empty MODEL_CACHE_DIR (cold) and once reusing it (warm).
+
+Workers get a fake Firebase (benchmarks/fakes/firebase_server.py) and, unless
+--mongo-uri is given, mongomock-motor (`pip install mongomock-motor`).
+
+    python -m benchmarks.bench_startup --runs 5
+    python -m benchmarks.bench_startup --runs 3 --top 15 --scenarios file,url
+
+Run the same command on an older commit for the before/after comparison.
+"""
+import argparse
+import functools
+import os
+import re
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fakes import firebase_server
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCENARIOS = ("file", "url", "url-down")
+
+# the worker: mongomock has to be installed before app.main creates its lifespan
+MOCK_LAUNCHER = """
+import sys, uvicorn
+sys.path.insert(0, {root!r})
+from mongomock_motor import AsyncMongoMockClient
+from app.core import database
+database._client = AsyncMongoMockClient()
+from app.main import app
+uvicorn.run(app, host="127.0.0.1", port={port}, log_level="warning")
+"""
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+def serve_directory(path):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), functools.partial(QuietHandler, directory=path))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def status_of(url):
+    try:
+        with urllib.request.urlopen(url, timeout=1) as r:
+            return r.status
+    except urllib.error.HTTPError as e:
+        return e.code
+    except OSError:
+        return None
+
+
+def median_ms(values):
+    return f"{statistics.median(values) * 1000:8.1f} ms" if values else "       - ms"
+
+
+def import_times(env, runs):
+    code = "import time; t = time.perf_counter(); import app.main; print(time.perf_counter() - t)"
+    times = []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env, capture_output=True, text=True)
+        if out.returncode != 0:
+            raise RuntimeError(out.stderr[-2000:])
+        times.append(float(out.stdout.strip().splitlines()[-1]))
+    return times
+
+
+def slowest_imports(env, top):
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c", "import app.main"], cwd=ROOT, env=env,
+                         capture_output=True, text=True)
+    rows = []
+    for line in out.stderr.splitlines():
+        m = re.match(r"import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)", line)
+        # top-level packages only (one level of indent under the importer)
+        if m and len(m.group(3)) <= 3:
+            rows.append((int(m.group(2)), m.group(4)))
+    return sorted(rows, reverse=True)[:top]
+
+
+def deferred_imports(env):
+    # what app.main no longer pays for at import time
+    code = ("import time; t = time.perf_counter(); import openai, firebase_admin, joblib, sklearn.linear_model; "
+            "print(time.perf_counter() - t)")
+    out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env, capture_output=True, text=True)
+    return float(out.stdout.strip()) if out.returncode == 0 else None
+
+
+def boot_once(env, mongo_uri, timeout):
+    port = free_port()
+    if mongo_uri:
+        cmd = [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port),
+               "--log-level", "warning"]
+    else:
+        cmd = [sys.executable, "-c", MOCK_LAUNCHER.format(root=ROOT, port=port)]
+    start = time.perf_counter()
+    proc = subprocess.Popen(cmd, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    live = ready = None
+    try:
+        while time.perf_counter() - start < timeout:
+            if proc.poll() is not None:
+                raise RuntimeError(f"worker exited with {proc.returncode}: {proc.stderr.read()[-2000:]}")
+            if live is None and status_of(f"http://127.0.0.1:{port}/health") == 200:
+                live = time.perf_counter() - start
+            if live is not None and status_of(f"http://127.0.0.1:{port}/ready") == 200:
+                ready = time.perf_counter() - start
+                break
+            time.sleep(0.01)
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+    return live, ready
+
+
+def main(args):
+    fsrv, _ = firebase_server.start()
+    fport = fsrv.server_address[1]
+    model_path = os.path.abspath(args.model)
+    model_dir = tempfile.mkdtemp(prefix="model-src-")
+    shutil.copy(model_path, os.path.join(model_dir, "model.pkl"))
+    msrv = serve_directory(model_dir)
+    url = f"http://127.0.0.1:{msrv.server_address[1]}/model.pkl"
+
+    base_env = dict(os.environ)
+    base_env.update({
+        "FIREBASE_DATABASE_EMULATOR_HOST": f"127.0.0.1:{fport}",
+        "FIREBASE_DB_URL": f"http://127.0.0.1:{fport}?ns=bench",
+        "OPENAI_API_KEY": "fake",
+        "DB_NAME": "cardio_bench",
+        "MODEL_PATH": model_path,
+        "MODEL_LOAD_RETRY_BASE_DELAY": "0.2",
+        "PYTHONDONTWRITEBYTECODE": "1",
+    })
+    if args.mongo_uri:
+        base_env["MONGO_URL"] = args.mongo_uri
+
+    times = import_times(base_env, args.runs)
+    print(f"import app.main            {median_ms(times)}  (median of {len(times)})")
+    deferred = deferred_imports(base_env)
+    if deferred is not None:
+        print(f"deferred heavy imports     {median_ms([deferred])}  (openai, firebase_admin, joblib, sklearn)")
+    if args.top:
+        for cumulative_us, module in slowest_imports(base_env, args.top):
+            print(f"    {cumulative_us / 1000:8.1f} ms  {module}")
+
+    scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    for scenario in scenarios:
+        # url-down: the cache was filled by an earlier boot, then the model host went away
+        caches = ("warm",) if scenario == "url-down" else ("cold", "warm")
+        for cache in caches:
+            cache_dir = tempfile.mkdtemp(prefix="model-cache-")
+            env = dict(base_env, MODEL_CACHE_DIR=cache_dir)
+            source = None
+            if scenario == "url":
+                env["MODEL_PATH"] = url
+            elif scenario == "url-down":
+                source = serve_directory(model_dir)
+                env["MODEL_PATH"] = f"http://127.0.0.1:{source.server_address[1]}/model.pkl"
+            if cache == "warm":
+                boot_once(env, args.mongo_uri, args.timeout)
+            if source is not None:
+                source.shutdown()
+                source.server_close()
+            lives, readies = [], []
+            for _ in range(args.runs):
+                if cache == "cold":
+                    shutil.rmtree(cache_dir, ignore_errors=True)
+                live, ready = boot_once(env, args.mongo_uri, args.timeout)
+                if live is not None:
+                    lives.append(live)
+                if ready is not None:
+                    readies.append(ready)
+            print(f"boot {scenario:<9} {cache:<5}  serving {median_ms(lives)}  ready {median_ms(readies)}  "
+                  f"({len(readies)}/{args.runs} ready)")
+            shutil.rmtree(cache_dir, ignore_errors=True)
+
+    shutil.rmtree(model_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=0, help="list the N slowest top-level imports")
+    parser.add_argument("--model", default=os.path.join(ROOT, "model.pkl"))
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help=f"comma separated, from {','.join(SCENARIOS)}")
+    parser.add_argument("--timeout", type=float, default=60.0, help="seconds to wait for a worker to become ready")
+    parser.add_argument("--mongo-uri", help="boot plain `uvicorn app.main:app` against a real mongod")
+    main(parser.parse_args())
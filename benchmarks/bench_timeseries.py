@@ -0,0 +1,75 @@
+"""
+Time-series store benchmark.
+
+Appends a long synthetic history for one user (1 Hz heart rate and ECG
+windows at ECG_SAMPLE_RATE), then reports append throughput, resident bytes
+per sample and latency of raw range queries and 1m/1h rollup queries.
+
+    python -m benchmarks.bench_timeseries --hours 24
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.ecg import synthesize_ecg
+from app.core.timeseries import TimeSeriesStore
+
+
+def timed(fn, repeat=20):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000, result
+
+
+def main(args):
+    store = TimeSeriesStore()
+    user = "bench-user"
+    t0 = 1_700_000_000_000
+    seconds = int(args.hours * 3600)
+    rng = np.random.default_rng(0)
+
+    hr_ts = t0 + np.arange(seconds, dtype=np.int64) * 1000
+    hr = (72 + 8 * np.sin(np.arange(seconds) / 900) + rng.standard_normal(seconds)).astype(np.float32)
+    start = time.perf_counter()
+    for i in range(0, seconds, 60):
+        store.append_hr(user, hr_ts[i:i + 60], hr[i:i + 60])
+    hr_secs = time.perf_counter() - start
+
+    window = np.rint(synthesize_ecg(int(args.fs * 60), args.fs, 72, seed=1) * 1000 + 2048).astype(np.int16)
+    minutes = seconds // 60
+    start = time.perf_counter()
+    for m in range(minutes):
+        store.append_ecg(user, t0 + (m + 1) * 60_000, window, fs=args.fs)
+    ecg_secs = time.perf_counter() - start
+
+    hr_series = store.series(user, "hr")
+    ecg_series = store.series(user, "ecg")
+    print(f"heart rate: {hr_series.total:>10} samples  {hr_series.total / hr_secs:>12,.0f} samples/s  "
+          f"{hr_series.nbytes() / hr_series.total:.2f} B/sample")
+    print(f"ecg:        {ecg_series.total:>10} samples  {ecg_series.total / ecg_secs:>12,.0f} samples/s  "
+          f"{ecg_series.nbytes() / ecg_series.total:.2f} B/sample  (raw chunks dropped: {ecg_series.dropped_chunks})")
+
+    end = t0 + seconds * 1000
+    for label, span_ms in (("last 10 min", 600_000), ("last 1 h", 3_600_000)):
+        ms, (ts, _) = timed(lambda: hr_series.range(end - span_ms, end))
+        print(f"hr raw range {label:<12} {ms:8.3f} ms  ({ts.size} points)")
+        ms, (ts, _) = timed(lambda: ecg_series.range(end - span_ms, end))
+        print(f"ecg raw range {label:<11} {ms:8.3f} ms  ({ts.size} points)")
+    for resolution in ("1m", "1h"):
+        ms, rollup = timed(lambda: hr_series.rollup(resolution, t0, end))
+        print(f"hr rollup {resolution} full range    {ms:8.3f} ms  ({rollup['t'].size} buckets)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--hours", type=float, default=24)
+    parser.add_argument("--fs", type=float, default=50.0)
+    main(parser.parse_args())
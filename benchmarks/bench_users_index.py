@@ -0,0 +1,154 @@
+"""
+Users collection benchmark: email index and projections.
+
+Loads N synthetic users (default 1,000,000) into a scratch collection and
+measures, with a synchronous pymongo client so the numbers are the database's:
+
+  lookup    find_one({"email": ...}) as a collection scan, then again after
+            ensure_indexes() has built the unique email index; explain() shows
+            the plan and documents examined
+  project   the same indexed lookup returning the full document vs the
+            public, hash-only and feature-only projections (bytes on the wire)
+  register  find-then-insert (the old registration) vs insert relying on the
+            unique index, for new and for already-registered emails
+
+    python -m benchmarks.bench_users_index --mongo-uri mongodb://localhost:27017
+    python -m benchmarks.bench_users_index --mongomock --users 20000
+
+The collection is dropped at the end unless --keep is given. --mongomock
+(`pip install mongomock`) only checks the script end to end: it has no
+indexes worth timing.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+import numpy as np
+from bson import BSON, ObjectId
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.database import (USER_PUBLIC_PROJECTION, USER_HASH_PROJECTION,
+                               USER_FEATURE_PROJECTION, USER_EXISTS_PROJECTION)
+
+# a real bcrypt hash has this shape and length; hashing 1M of them is not the point here
+FAKE_HASH = "$2b$12$" + "x" * 53
+
+
+def make_users(start, count, rng):
+    docs = []
+    for i in range(start, start + count):
+        docs.append({
+            "_id": ObjectId(),
+            "email": f"user{i}@example.com",
+            "password": FAKE_HASH,
+            "name": f"User {i}",
+            "male": rng.randint(0, 1), "age": rng.randint(30, 75), "currentSmoker": rng.randint(0, 1),
+            "cigsPerDay": rng.choice([0, 0, 5, 20]), "BPMeds": 0, "prevalentStroke": 0,
+            "prevalentHyp": rng.randint(0, 1), "diabetes": rng.randint(0, 1), "totChol": rng.randint(150, 280),
+            "sysBP": rng.randint(100, 170), "diaBP": rng.randint(60, 100), "BMI": round(rng.uniform(19, 35), 1),
+            "glucose": rng.randint(70, 140), "heartRate": rng.randint(55, 100),
+            "created_at": time.time(),
+        })
+    return docs
+
+
+def ms(values):
+    p50, p95, p99 = np.percentile(values, [50, 95, 99]) * 1000
+    return f"p50 {p50:8.3f} ms  p95 {p95:8.3f} ms  p99 {p99:8.3f} ms"
+
+
+def timed(fn, emails):
+    samples = []
+    for email in emails:
+        t = time.perf_counter()
+        fn(email)
+        samples.append(time.perf_counter() - t)
+    return samples
+
+
+def plan(collection, email):
+    try:
+        stats = collection.find({"email": email}).limit(1).explain().get("executionStats", {})
+    except Exception:
+        return "explain not supported"
+    stage = stats.get("executionStages", {})
+    while stage.get("inputStage"):
+        stage = stage["inputStage"]
+    return f"{stage.get('stage', '?')}, {stats.get('totalDocsExamined', '?')} docs examined"
+
+
+def main(args):
+    if args.mongomock:
+        import mongomock
+        client = mongomock.MongoClient()
+    else:
+        from pymongo import MongoClient
+        client = MongoClient(args.mongo_uri)
+    from pymongo.errors import DuplicateKeyError
+
+    collection = client[args.db_name]["users_bench"]
+    collection.drop()
+
+    rng = random.Random(0)
+    start = time.perf_counter()
+    for offset in range(0, args.users, args.batch):
+        collection.insert_many(make_users(offset, min(args.batch, args.users - offset), rng), ordered=False)
+    print(f"[INFO] Loaded {args.users} users in {time.perf_counter() - start:.1f}s")
+
+    emails = [f"user{rng.randrange(args.users)}@example.com" for _ in range(args.lookups)]
+
+    # lookup: scan vs unique index
+    scan = timed(lambda e: collection.find_one({"email": e}), emails[:args.scan_lookups])
+    print(f"lookup  collscan  {ms(scan)}  ({plan(collection, emails[0])})")
+
+    start = time.perf_counter()
+    collection.create_index("email", unique=True, name="email_unique")
+    print(f"[INFO] Built unique email index in {time.perf_counter() - start:.1f}s")
+    indexed = timed(lambda e: collection.find_one({"email": e}), emails)
+    print(f"lookup  indexed   {ms(indexed)}  ({plan(collection, emails[0])})")
+
+    # project: what each route actually pulls back
+    for label, projection in (("full", None), ("public", USER_PUBLIC_PROJECTION),
+                              ("hash", USER_HASH_PROJECTION), ("features", USER_FEATURE_PROJECTION),
+                              ("exists", USER_EXISTS_PROJECTION)):
+        size = len(BSON.encode(collection.find_one({"email": emails[0]}, projection)))
+        samples = timed(lambda e: collection.find_one({"email": e}, projection), emails)
+        print(f"project {label:<9} {ms(samples)}  {size:>4} bytes/doc")
+
+    # register: pre-check + insert vs insert + DuplicateKeyError
+    def precheck(email):
+        if collection.find_one({"email": email}) is None:
+            collection.insert_one(make_users(0, 1, rng)[0] | {"email": email})
+
+    def rely_on_index(email):
+        try:
+            collection.insert_one(make_users(0, 1, rng)[0] | {"email": email})
+        except DuplicateKeyError:
+            pass
+
+    n = args.registrations
+    for label, fn, base in (("precheck", precheck, args.users), ("index", rely_on_index, args.users + n)):
+        new = timed(fn, [f"user{base + i}@example.com" for i in range(n)])
+        dup = timed(fn, emails[:n])
+        print(f"register {label:<8} new {ms(new)}")
+        print(f"register {label:<8} dup {ms(dup)}")
+
+    if not args.keep:
+        collection.drop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mongo-uri", default="mongodb://localhost:27017")
+    parser.add_argument("--mongomock", action="store_true", help="in-process mongomock instead of a mongod")
+    parser.add_argument("--db-name", default="cardio_bench")
+    parser.add_argument("--users", type=int, default=1_000_000)
+    parser.add_argument("--batch", type=int, default=10_000)
+    parser.add_argument("--lookups", type=int, default=2000)
+    parser.add_argument("--scan-lookups", type=int, default=20, help="collection scans are slow; fewer of them")
+    parser.add_argument("--registrations", type=int, default=500)
+    parser.add_argument("--keep", action="store_true", help="leave the collection in place")
+    main(parser.parse_args())
@@ -0,0 +1,156 @@
+"""
+Memory per worker under gunicorn, with and without preloading.
+
+Starts `gunicorn -c gunicorn.conf.py app.serve:app` with --workers uvicorn
+workers, waits until the app answers /ready, sends some warm-up traffic, then
+reads /proc/<pid>/smaps_rollup for the master and every worker:
+
+  RSS      resident pages, shared ones counted in full by every process
+  PSS      shared pages split between the processes mapping them
+  private  pages only this process maps; what one more worker costs
+
+    python -m benchmarks.bench_workers --workers 4
+    python -m benchmarks.bench_workers --workers 4 --cold-cache   # unpickle model.pkl (sklearn) every boot
+
+Linux only (smaps_rollup). Workers get a fake Firebase and, unless
+--mongo-uri is given, an unreachable Mongo (ensure_indexes logs and moves on),
+which is enough for memory numbers.
+"""
+import argparse
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fakes import firebase_server
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def get(url, headers=None):
+    try:
+        with urllib.request.urlopen(urllib.request.Request(url, headers=headers or {}), timeout=2) as r:
+            return r.status
+    except urllib.error.HTTPError as e:
+        return e.code
+    except OSError:
+        return None
+
+
+def children(pid):
+    kids = []
+    for tid in os.listdir(f"/proc/{pid}/task"):
+        try:
+            with open(f"/proc/{pid}/task/{tid}/children") as f:
+                kids += [int(x) for x in f.read().split()]
+        except OSError:
+            pass
+    return kids
+
+
+def memory(pid):
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and parts[0].endswith(":") and parts[1].isdigit():
+                fields[parts[0][:-1]] = int(parts[1]) / 1024
+    return {
+        "rss": fields.get("Rss", 0.0),
+        "pss": fields.get("Pss", 0.0),
+        "private": fields.get("Private_Clean", 0.0) + fields.get("Private_Dirty", 0.0),
+        "shared": fields.get("Shared_Clean", 0.0) + fields.get("Shared_Dirty", 0.0),
+    }
+
+
+def run(mode, args, env):
+    port = free_port()
+    # OTPs in Mongo: the master refuses to fork several workers with the per-process OTP store
+    env = dict(env, GUNICORN_BIND=f"127.0.0.1:{port}", WEB_CONCURRENCY=str(args.workers), OTP_STORE_BACKEND="mongo",
+               GUNICORN_PRELOAD="true" if mode == "preload" else "false")
+    cmd = [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "app.serve:app"]
+    proc = subprocess.Popen(cmd, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        deadline = time.time() + args.timeout
+        # every worker has to be up, and /ready has to hold across enough requests to hit all of them
+        while time.time() < deadline:
+            if proc.poll() is not None:
+                raise RuntimeError(f"gunicorn exited with {proc.returncode}")
+            if len(children(proc.pid)) >= args.workers and \
+                    all(get(f"http://127.0.0.1:{port}/ready") == 200 for _ in range(4 * args.workers)):
+                break
+            time.sleep(0.2)
+        else:
+            raise RuntimeError("workers did not become ready")
+        for _ in range(args.requests):
+            get(f"http://127.0.0.1:{port}/metrics", {"Authorization": "Bearer bench"})
+        time.sleep(1.0)
+        master = memory(proc.pid)
+        workers = [memory(pid) for pid in children(proc.pid)]
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(30)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+    return master, workers
+
+
+def main(args):
+    fsrv, _ = firebase_server.start()
+    fport = fsrv.server_address[1]
+    cache_dir = tempfile.mkdtemp(prefix="model-cache-")
+    env = dict(os.environ)
+    env.update({
+        "FIREBASE_DATABASE_EMULATOR_HOST": f"127.0.0.1:{fport}",
+        "FIREBASE_DB_URL": f"http://127.0.0.1:{fport}?ns=bench",
+        "OPENAI_API_KEY": "fake",
+        "DB_NAME": "cardio_bench",
+        "MONGO_URL": args.mongo_uri or f"mongodb://127.0.0.1:{free_port()}",
+        "MONGO_TIMEOUT_MS": os.environ.get("MONGO_TIMEOUT_MS", "300"),
+        "MODEL_PATH": os.path.abspath(args.model),
+        "MODEL_CACHE_DIR": cache_dir,
+        "METRICS_TOKEN": "bench",
+    })
+    if args.cold_cache:
+        # an unwritable cache dir: every process unpickles the model (and imports sklearn)
+        env["MODEL_CACHE_DIR"] = "/proc/model-cache"
+    else:
+        subprocess.run([sys.executable, "-c", "from app.core.modelstore import model_store; model_store.load()"],
+                       cwd=ROOT, env=env, check=True, stdout=subprocess.DEVNULL)
+
+    print(f"{'mode':<11} {'':<8} {'RSS':>9} {'PSS':>9} {'private':>9} {'shared':>9}   ({args.workers} workers, MB)")
+    for mode in [m.strip() for m in args.modes.split(",") if m.strip()]:
+        master, workers = run(mode, args, env)
+        n = len(workers)
+        mean = {k: sum(w[k] for w in workers) / n for k in master}
+        total_pss = master["pss"] + sum(w["pss"] for w in workers)
+        print(f"{mode:<11} {'master':<8} {master['rss']:9.1f} {master['pss']:9.1f} {master['private']:9.1f} {master['shared']:9.1f}")
+        print(f"{mode:<11} {'worker':<8} {mean['rss']:9.1f} {mean['pss']:9.1f} {mean['private']:9.1f} {mean['shared']:9.1f}"
+              f"   total PSS {total_pss:.1f}")
+
+    shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--modes", default="no-preload,preload")
+    parser.add_argument("--requests", type=int, default=200, help="warm-up requests before measuring")
+    parser.add_argument("--cold-cache", action="store_true", help="no scorer cache, so every load unpickles")
+    parser.add_argument("--model", default=os.path.join(ROOT, "model.pkl"))
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--mongo-uri")
+    main(parser.parse_args())
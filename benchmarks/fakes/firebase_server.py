@@ -0,0 +1,190 @@
+"""
+Local stand-in for the Firebase Realtime Database REST API.
+
+Supports GET / PUT / PATCH / POST / DELETE on `<path>.json` and streaming
+(`Accept: text/event-stream`) with the same put/patch events Firebase sends,
+which is what firebase_admin's `Reference.listen()` consumes. Point the app
+(and dummyfire.py) at it with
+
+    FIREBASE_DATABASE_EMULATOR_HOST=127.0.0.1:8902
+    FIREBASE_DB_URL=http://127.0.0.1:8902?ns=fake
+
+    python -m benchmarks.fakes.firebase_server --port 8902 --latency 0.05
+"""
+import argparse
+import json
+import queue
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+
+def _segments(path):
+    path = urlparse(path).path
+    if path.endswith(".json"):
+        path = path[:-5]
+    return [s for s in path.split("/") if s]
+
+
+class FakeRTDB:
+    def __init__(self, latency=0.0, keepalive=15.0):
+        self.latency = latency
+        # a listener only notices it was closed when the next event arrives
+        self.keepalive = keepalive
+        self.root = {}
+        self.lock = threading.Lock()
+        self.subscribers = []  # (segments, queue)
+        self.reads = 0
+        self.writes = 0
+
+    def get(self, segs):
+        with self.lock:
+            self.reads += 1
+            node = self.root
+            for s in segs:
+                if not isinstance(node, dict) or s not in node:
+                    return None
+                node = node[s]
+            return json.loads(json.dumps(node))
+
+    def _set_locked(self, segs, value):
+        if not segs:
+            self.root = value if isinstance(value, dict) else {}
+            return
+        node = self.root
+        for s in segs[:-1]:
+            child = node.get(s)
+            if not isinstance(child, dict):
+                child = node[s] = {}
+            node = child
+        if value is None:
+            node.pop(segs[-1], None)
+        else:
+            node[segs[-1]] = value
+
+    def write(self, segs, value, patch=False):
+        with self.lock:
+            self.writes += 1
+            if patch and isinstance(value, dict):
+                for key, child in value.items():
+                    self._set_locked(segs + [s for s in key.split("/") if s], child)
+            else:
+                self._set_locked(segs, value)
+            subscribers = list(self.subscribers)
+        for sub_segs, q in subscribers:
+            if segs[:len(sub_segs)] == sub_segs:
+                rel = "/" + "/".join(segs[len(sub_segs):])
+                q.put(("patch" if patch else "put", rel, value))
+            elif sub_segs[:len(segs)] == segs:
+                q.put(("put", "/", self.get(sub_segs)))
+
+    def subscribe(self, segs):
+        q = queue.Queue()
+        with self.lock:
+            self.subscribers.append((segs, q))
+        return q
+
+    def unsubscribe(self, q):
+        with self.lock:
+            self.subscribers = [(s, sq) for s, sq in self.subscribers if sq is not q]
+
+
+def make_handler(store: FakeRTDB):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _json(self, code, payload):
+            raw = json.dumps(payload).encode()
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(raw)))
+            self.end_headers()
+            self.wfile.write(raw)
+
+        def _body(self):
+            length = int(self.headers.get("Content-Length", 0))
+            return json.loads(self.rfile.read(length) or b"null")
+
+        def do_GET(self):
+            segs = _segments(self.path)
+            if "text/event-stream" in self.headers.get("Accept", ""):
+                return self._stream(segs)
+            if store.latency:
+                time.sleep(store.latency)
+            self._json(200, store.get(segs))
+
+        def do_PUT(self):
+            value = self._body()
+            store.write(_segments(self.path), value)
+            self._json(200, value)
+
+        def do_PATCH(self):
+            value = self._body()
+            store.write(_segments(self.path), value, patch=True)
+            self._json(200, value)
+
+        def do_POST(self):
+            value = self._body()
+            key = "-" + uuid.uuid4().hex[:19]
+            store.write(_segments(self.path) + [key], value)
+            self._json(200, {"name": key})
+
+        def do_DELETE(self):
+            store.write(_segments(self.path), None)
+            self._json(200, None)
+
+        def _stream(self, segs):
+            q = store.subscribe(segs)
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Cache-Control", "no-cache")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            try:
+                self._send("put", "/", store.get(segs))
+                while True:
+                    try:
+                        event, path, data = q.get(timeout=store.keepalive)
+                        self._send(event, path, data)
+                    except queue.Empty:
+                        self.wfile.write(b"event: keep-alive\ndata: null\n\n")
+                        self.wfile.flush()
+            except (BrokenPipeError, ConnectionResetError, OSError):
+                pass
+            finally:
+                store.unsubscribe(q)
+                self.close_connection = True
+
+        def _send(self, event, path, data):
+            payload = json.dumps({"path": path, "data": data})
+            self.wfile.write(f"event: {event}\ndata: {payload}\n\n".encode())
+            self.wfile.flush()
+
+    return Handler
+
+
+def start(port=0, latency=0.0, keepalive=15.0):
+    """Starts the server on a daemon thread; returns (server, store)."""
+    store = FakeRTDB(latency, keepalive)
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(store))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, store
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8902)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every plain GET")
+    args = parser.parse_args()
+    server, _ = start(args.port, args.latency)
+    print(f"[INFO] Fake Firebase RTDB listening on http://127.0.0.1:{server.server_address[1]}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,156 @@
+"""
+Local stand-in for the OpenAI Responses API.
+
+Serves POST /v1/responses, both plain and with "stream": true (SSE). Replies
+are a canned JSON report after a configurable delay. Point the app at it with
+
+    OPENAI_BASE_URL=http://127.0.0.1:8901/v1 OPENAI_API_KEY=fake
+
+    python -m benchmarks.fakes.openai_server --port 8901 --latency 1.5 --chunks 20
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CANNED_REPORT = json.dumps({
+    "diagnosis_summary": "Synthetic report from the local fake OpenAI server.",
+    "lifestyle_suggestions": {
+        "diet": "Balanced diet.",
+        "exercise": "30 minutes of walking a day.",
+        "habits": "No smoking.",
+        "medical_followup": "Routine check-up."
+    }
+})
+
+
+class FakeOpenAIState:
+    def __init__(self, latency=0.5, chunks=10, fail_first=0):
+        self.latency = latency
+        self.chunks = chunks
+        self.fail_first = fail_first
+        self.requests = 0
+        self.active = 0
+        self.peak_active = 0   # most completions in progress at once
+        self.lock = threading.Lock()
+
+
+def _response_body(text, model):
+    return {
+        "id": "resp_fake",
+        "object": "response",
+        "created_at": int(time.time()),
+        "status": "completed",
+        "model": model,
+        "output": [{
+            "type": "message",
+            "id": "msg_fake",
+            "status": "completed",
+            "role": "assistant",
+            "content": [{"type": "output_text", "text": text, "annotations": []}],
+        }],
+        "parallel_tool_calls": False,
+        "tool_choice": "auto",
+        "tools": [],
+        "usage": {
+            "input_tokens": 200,
+            "output_tokens": len(text) // 4,
+            "total_tokens": 200 + len(text) // 4,
+            "input_tokens_details": {"cached_tokens": 0},
+            "output_tokens_details": {"reasoning_tokens": 0},
+        },
+    }
+
+
+def make_handler(state: FakeOpenAIState):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _json(self, code, payload):
+            raw = json.dumps(payload).encode()
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(raw)))
+            self.end_headers()
+            self.wfile.write(raw)
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            body = json.loads(self.rfile.read(length) or b"{}")
+            if not self.path.rstrip("/").endswith("/responses"):
+                return self._json(404, {"error": {"message": "not found"}})
+
+            with state.lock:
+                state.requests += 1
+                failing = state.requests <= state.fail_first
+            if failing:
+                return self._json(500, {"error": {"message": "injected failure", "type": "server_error"}})
+
+            with state.lock:
+                state.active += 1
+                state.peak_active = max(state.peak_active, state.active)
+            try:
+                self._complete(body)
+            finally:
+                with state.lock:
+                    state.active -= 1
+
+        def _complete(self, body):
+            model = body.get("model", "fake-model")
+            if not body.get("stream"):
+                time.sleep(state.latency)
+                return self._json(200, _response_body(CANNED_REPORT, model))
+
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Cache-Control", "no-cache")
+            self.send_header("Connection", "close")
+            self.end_headers()
+
+            def send(event):
+                self.wfile.write(f"event: {event['type']}\ndata: {json.dumps(event)}\n\n".encode())
+                self.wfile.flush()
+
+            seq = 0
+            send({"type": "response.created", "sequence_number": seq,
+                  "response": {**_response_body("", model), "status": "in_progress", "output": []}})
+            step = max(1, len(CANNED_REPORT) // max(1, state.chunks))
+            pieces = [CANNED_REPORT[i:i + step] for i in range(0, len(CANNED_REPORT), step)]
+            for piece in pieces:
+                time.sleep(state.latency / len(pieces))
+                seq += 1
+                send({"type": "response.output_text.delta", "sequence_number": seq, "item_id": "msg_fake",
+                      "output_index": 0, "content_index": 0, "delta": piece, "logprobs": []})
+            seq += 1
+            send({"type": "response.completed", "sequence_number": seq, "response": _response_body(CANNED_REPORT, model)})
+            self.close_connection = True
+
+    return Handler
+
+
+def start(port=0, latency=0.5, chunks=10, fail_first=0):
+    """Starts the server on a daemon thread; returns (server, state)."""
+    state = FakeOpenAIState(latency, chunks, fail_first)
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(state))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, state
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8901)
+    parser.add_argument("--latency", type=float, default=0.5, help="seconds per completion")
+    parser.add_argument("--chunks", type=int, default=10, help="stream deltas per completion")
+    parser.add_argument("--fail-first", type=int, default=0, help="answer the first N requests with HTTP 500")
+    args = parser.parse_args()
+    server, _ = start(args.port, args.latency, args.chunks, args.fail_first)
+    print(f"[INFO] Fake OpenAI listening on http://127.0.0.1:{server.server_address[1]}/v1")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,167 @@
+"""
+Local SMTP sink.
+
+Accepts everything smtplib sends during app.core.smtp_otp.send_email
+(EHLO, STARTTLS with a throwaway self-signed certificate, AUTH PLAIN/LOGIN
+with any credentials, MAIL/RCPT/DATA) and keeps the messages in memory.
+Point the app at it with
+
+    SMTP_SERVER=127.0.0.1 SMTP_PORT=8925 SMTP_USER=bench@example.com SMTP_PASSWORD=x
+
+    python -m benchmarks.fakes.smtp_sink --port 8925 --latency 0.2
+"""
+import argparse
+import asyncio
+import datetime
+import os
+import ssl
+import tempfile
+import threading
+
+
+class SinkState:
+    def __init__(self, latency=0.0, keep=1000):
+        self.latency = latency
+        self.keep = keep
+        self.messages = []
+        self.received = 0
+        self.connections = 0
+        self.port = None
+        self.lock = threading.Lock()
+
+    def add(self, sender, recipients, data):
+        with self.lock:
+            self.received += 1
+            self.messages.append({"from": sender, "to": recipients, "data": data})
+            del self.messages[:-self.keep]
+
+
+def _tls_context():
+    from cryptography import x509
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import ec
+    from cryptography.x509.oid import NameOID
+
+    key = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "localhost")])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    cert = (x509.CertificateBuilder().subject_name(name).issuer_name(name).public_key(key.public_key())
+            .serial_number(x509.random_serial_number()).not_valid_before(now)
+            .not_valid_after(now + datetime.timedelta(days=1)).sign(key, hashes.SHA256()))
+    directory = tempfile.mkdtemp(prefix="smtp-sink-")
+    cert_path, key_path = os.path.join(directory, "cert.pem"), os.path.join(directory, "key.pem")
+    with open(cert_path, "wb") as f:
+        f.write(cert.public_bytes(serialization.Encoding.PEM))
+    with open(key_path, "wb") as f:
+        f.write(key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                                  serialization.NoEncryption()))
+    context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+    context.load_cert_chain(cert_path, key_path)
+    return context
+
+
+def make_handler(state: SinkState, tls: ssl.SSLContext):
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        state.connections += 1
+
+        async def reply(*lines):
+            for i, line in enumerate(lines):
+                sep = " " if i == len(lines) - 1 else "-"
+                writer.write(f"{line[:3]}{sep}{line[4:]}\r\n".encode())
+            await writer.drain()
+
+        secure = False
+        sender, recipients = None, []
+        try:
+            await reply("220 fake-smtp ESMTP sink")
+            while True:
+                raw = await reader.readline()
+                if not raw:
+                    return
+                line = raw.decode(errors="replace").rstrip("\r\n")
+                verb = line.split(" ", 1)[0].upper()
+                if verb == "EHLO":
+                    caps = ["250 fake-smtp"] + ([] if secure else ["250 STARTTLS"]) + ["250 AUTH PLAIN LOGIN", "250 8BITMIME"]
+                    await reply(*caps)
+                elif verb == "HELO":
+                    await reply("250 fake-smtp")
+                elif verb == "STARTTLS":
+                    await reply("220 ready to start TLS")
+                    await writer.start_tls(tls)
+                    secure = True
+                elif verb == "AUTH":
+                    parts = line.split()
+                    mechanism = parts[1].upper() if len(parts) > 1 else ""
+                    if mechanism == "LOGIN":
+                        for prompt in ("334 VXNlcm5hbWU6", "334 UGFzc3dvcmQ6"):
+                            await reply(prompt)
+                            await reader.readline()
+                    elif mechanism == "PLAIN" and len(parts) == 2:
+                        await reply("334 ")
+                        await reader.readline()
+                    await reply("235 authentication succeeded")
+                elif verb == "MAIL":
+                    sender, recipients = line[10:].strip(), []
+                    await reply("250 ok")
+                elif verb == "RCPT":
+                    recipients.append(line[8:].strip())
+                    await reply("250 ok")
+                elif verb == "DATA":
+                    await reply("354 end data with <CR><LF>.<CR><LF>")
+                    chunks = []
+                    while True:
+                        chunk = await reader.readline()
+                        if not chunk or chunk in (b".\r\n", b".\n"):
+                            break
+                        chunks.append(chunk)
+                    if state.latency:
+                        await asyncio.sleep(state.latency)
+                    state.add(sender, recipients, b"".join(chunks).decode(errors="replace"))
+                    await reply("250 queued")
+                elif verb in ("RSET", "NOOP"):
+                    sender, recipients = (None, []) if verb == "RSET" else (sender, recipients)
+                    await reply("250 ok")
+                elif verb == "QUIT":
+                    await reply("221 bye")
+                    return
+                else:
+                    await reply("502 command not implemented")
+        except (ConnectionError, ssl.SSLError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    return handle
+
+
+def start(port=0, latency=0.0):
+    """Starts the sink on a daemon thread with its own event loop; returns (server, state)."""
+    state = SinkState(latency)
+    started = threading.Event()
+    holder = {}
+
+    def run():
+        loop = asyncio.new_event_loop()
+        server = loop.run_until_complete(
+            asyncio.start_server(make_handler(state, _tls_context()), "127.0.0.1", port))
+        holder["server"] = server
+        state.port = server.sockets[0].getsockname()[1]
+        started.set()
+        loop.run_forever()
+
+    threading.Thread(target=run, daemon=True).start()
+    started.wait()
+    return holder["server"], state
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8925)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added before accepting each message")
+    args = parser.parse_args()
+    _, state = start(args.port, args.latency)
+    print(f"[INFO] SMTP sink listening on 127.0.0.1:{state.port}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
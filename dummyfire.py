@@ -1,45 +1,336 @@
+"""
+Device fleet simulator.
+
+Runs N simulated ECG devices concurrently on one asyncio loop. Every device
+uploads a heart rate and an ECG window once per --interval seconds, the way
+de.cpp does, to one of two targets:
+
+  firebase  PUT /users/{id}/realtime.json on the RTDB REST API (real Firebase,
+            the Firebase emulator, or benchmarks/fakes/firebase_server.py when
+            FIREBASE_DATABASE_EMULATOR_HOST is set)
+  ingest    binary frames to the backend's POST /ingest (needs INGEST_API_KEY)
+
+Waveforms are synthetic P-QRS-T beats with noise. A share of devices
+(--arrhythmia-rate) get an abnormal profile: AFib, PVCs, bradycardia or
+tachycardia.
+
+It reports write throughput, write latency and freshness latency. For the
+firebase target, freshness is the time from the start of a write until a
+/users stream listener (what the backend's realtime cache runs) sees it. For
+ingest, the data is live once the POST returns, so freshness equals write
+latency.
+
+    python dummyfire.py                                  # one device, FIREBASE_USER_ID, like before
+    python dummyfire.py --devices 5000 --interval 60 --duration 600
+    python dummyfire.py --target ingest --backend http://127.0.0.1:8000 --devices 2000 --json fleet.json
+"""
+import argparse
+import asyncio
+import json
 import os
-import time
 import random
+import time
 from datetime import datetime
+from urllib.parse import urlparse, parse_qs
+
+import httpx
+import numpy as np
 from dotenv import load_dotenv
-import firebase_admin
-from firebase_admin import credentials, db
+
+from app.core.ecg import synthesize_ecg
+from app.core.frames import encode_frame
 
 load_dotenv()
 
 FIREBASE_CRED_PATH = os.getenv("FIREBASE_CRED_PATH")
-FIREBASE_DB_URL = os.getenv("FIREBASE_DB_URL")       
+FIREBASE_DB_URL = os.getenv("FIREBASE_DB_URL")
 USER_ID = os.getenv("FIREBASE_USER_ID", "user123")
+INGEST_API_KEY = os.getenv("INGEST_API_KEY")
+
+# profile: (heart rate range, synthesize_ecg kwargs)
+PROFILES = {
+    "normal": ((60, 95), {}),
+    "afib": ((80, 130), {"rr_jitter": 0.25}),
+    "pvc": ((65, 90), {"pvc_rate": 0.15}),
+    "brady": ((38, 50), {}),
+    "tachy": ((110, 150), {}),
+}
+WAVEFORM_BANK_SIZE = 8
+
+
+def percentiles(values):
+    if not values:
+        return {"p50": None, "p95": None, "p99": None, "max": None}
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {"p50": round(p50 * 1000, 1), "p95": round(p95 * 1000, 1), "p99": round(p99 * 1000, 1),
+            "max": round(max(values) * 1000, 1)}
+
+
+class FleetStats:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.writes = 0
+        self.errors = 0
+        self.samples = 0
+        self.write_latency = []
+        self.freshness = []
+        self.error_kinds = {}
+        self._window_writes = 0
+
+    def error(self, kind):
+        self.errors += 1
+        self.error_kinds[kind] = self.error_kinds.get(kind, 0) + 1
+
+    def report(self, elapsed_window):
+        rate = self._window_writes / elapsed_window if elapsed_window else 0.0
+        self._window_writes = 0
+        w, f = percentiles(self.write_latency[-5000:]), percentiles(self.freshness[-5000:])
+        print(f"[INFO] t={time.perf_counter() - self.started:6.0f}s writes={self.writes} ({rate:.1f}/s) "
+              f"errors={self.errors} write p50/p95/p99={w['p50']}/{w['p95']}/{w['p99']} ms "
+              f"fresh p50/p95/p99={f['p50']}/{f['p95']}/{f['p99']} ms")
+
+    def summary(self, args):
+        elapsed = time.perf_counter() - self.started
+        return {
+            "target": args.target,
+            "devices": args.devices,
+            "interval_s": args.interval,
+            "elapsed_s": round(elapsed, 1),
+            "writes": self.writes,
+            "errors": self.errors,
+            "error_kinds": self.error_kinds,
+            "ecg_samples": self.samples,
+            "writes_per_s": round(self.writes / elapsed, 2),
+            "offered_writes_per_s": round(args.devices / args.interval, 2),
+            "write_latency_ms": percentiles(self.write_latency),
+            "freshness_ms": percentiles(self.freshness),
+        }
+
+
+class Device:
+    def __init__(self, user_id, profile, rng):
+        self.user_id = user_id
+        self.profile = profile
+        (lo, hi), _ = PROFILES[profile]
+        self.base_hr = rng.uniform(lo, hi)
+        self.rng = rng
+
+    def reading(self, bank):
+        hr = round(max(30.0, self.base_hr + self.rng.gauss(0, 3)))
+        window = bank[self.profile][self.rng.randrange(len(bank[self.profile]))]
+        return hr, np.roll(window, self.rng.randrange(window.size))
+
+
+def build_waveform_bank(n_samples, fs):
+    # synthesizing a fresh window per upload costs more than the upload itself at
+    # fleet scale; a small bank per profile rotated per upload is enough variety
+    bank = {}
+    for name, ((lo, hi), kwargs) in PROFILES.items():
+        bank[name] = [
+            synthesize_ecg(n_samples, fs, heart_rate=(lo + hi) / 2, seed=i, **kwargs)
+            for i in range(WAVEFORM_BANK_SIZE)
+        ]
+    return bank
+
+
+def rtdb_base():
+    """Returns (base url, query params) for RTDB REST calls."""
+    parsed = urlparse(FIREBASE_DB_URL)
+    params = {k: v[0] for k, v in parse_qs(parsed.query).items()}
+    emulator = os.getenv("FIREBASE_DATABASE_EMULATOR_HOST")
+    if emulator:
+        params.setdefault("ns", parsed.hostname.split(".")[0] if parsed.hostname else "default")
+        return f"http://{emulator}", params
+    return f"{parsed.scheme}://{parsed.netloc}", params
+
+
+def firebase_token():
+    if os.getenv("FIREBASE_DATABASE_EMULATOR_HOST"):
+        return "owner"
+    from firebase_admin import credentials
+    cred = credentials.Certificate(FIREBASE_CRED_PATH)
+    return cred.get_access_token().access_token
+
+
+class FirebaseTarget:
+    def __init__(self, client, stats):
+        self.client = client
+        self.stats = stats
+        self.base, self.params = rtdb_base()
+        self.headers = {"Authorization": f"Bearer {firebase_token()}"}
+        self.sent_at = {}
+
+    async def send(self, device, hr, ecg_mv):
+        payload = {
+            "heart_rate": hr,
+            "ecg_data": np.round(ecg_mv, 3).tolist(),
+            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        }
+        self.sent_at[device.user_id] = time.perf_counter()
+        return await self.client.put(f"{self.base}/users/{device.user_id}/realtime.json",
+                                     params={**self.params, "print": "silent"},
+                                     headers=self.headers, json=payload)
+
+    async def listen(self, ready: asyncio.Event):
+        headers = {**self.headers, "Accept": "text/event-stream"}
+        async with self.client.stream("GET", f"{self.base}/users.json", params=self.params,
+                                      headers=headers, timeout=None) as response:
+            event = None
+            async for line in response.aiter_lines():
+                if line.startswith("event:"):
+                    event = line[6:].strip()
+                elif line.startswith("data:") and event in ("put", "patch"):
+                    self._observe(json.loads(line[5:]), ready)
+
+    def _observe(self, message, ready):
+        now = time.perf_counter()
+        path = [s for s in (message or {}).get("path", "/").split("/") if s]
+        if not path:
+            ready.set()
+            return
+        sent = self.sent_at.pop(path[0], None)
+        if sent is not None:
+            self.stats.freshness.append(now - sent)
+
+
+class IngestTarget:
+    def __init__(self, client, stats, backend, fs):
+        self.client = client
+        self.stats = stats
+        self.url = backend.rstrip("/") + "/ingest"
+        self.headers = {"X-Ingest-Key": INGEST_API_KEY or "", "Content-Type": "application/octet-stream"}
+        self.fs = fs
+
+    async def send(self, device, hr, ecg_mv):
+        body = encode_frame(device.user_id, int(time.time() * 1000), np.rint(ecg_mv * 1000), hr, int(self.fs))
+        return await self.client.post(self.url, content=body, headers=self.headers)
+
+
+async def run_device(device, target, bank, args, stats, stop):
+    # spread first uploads over one interval so the fleet ramps instead of stampeding
+    next_at = time.perf_counter() + device.rng.uniform(0, args.interval)
+    while not stop.is_set():
+        delay = next_at - time.perf_counter()
+        if delay > 0:
+            try:
+                await asyncio.wait_for(stop.wait(), delay)
+                return
+            except asyncio.TimeoutError:
+                pass
+        hr, ecg = device.reading(bank)
+        start = time.perf_counter()
+        try:
+            response = await target.send(device, hr, ecg)
+            if response.status_code >= 300:
+                stats.error(f"http_{response.status_code}")
+            else:
+                latency = time.perf_counter() - start
+                stats.writes += 1
+                stats._window_writes += 1
+                stats.samples += ecg.size
+                stats.write_latency.append(latency)
+                if args.target == "ingest":
+                    stats.freshness.append(latency)
+        except httpx.HTTPError as e:
+            stats.error(type(e).__name__)
+        next_at += args.interval * (1 + device.rng.uniform(-args.jitter, args.jitter))
+        if args.verbose:
+            print(f" [{datetime.now().strftime('%H:%M:%S')}] {device.user_id} ({device.profile}) HR={hr}")
+
+
+def make_devices(args):
+    rng = random.Random(args.seed)
+    if args.devices == 1 and args.target == "firebase" and not args.id_offset:
+        ids = [USER_ID]
+    else:
+        ids = [f"{args.id_offset + i + 1:024x}" for i in range(args.devices)]
+    abnormal = [p for p in PROFILES if p != "normal"]
+    devices = []
+    for user_id in ids:
+        profile = rng.choice(abnormal) if rng.random() < args.arrhythmia_rate else "normal"
+        devices.append(Device(user_id, profile, random.Random(rng.random())))
+    return devices
+
+
+async def main(args):
+    stats = FleetStats()
+    limits = httpx.Limits(max_connections=args.connections, max_keepalive_connections=args.connections)
+    async with httpx.AsyncClient(limits=limits, timeout=args.timeout) as client:
+        if args.target == "firebase":
+            if not FIREBASE_DB_URL:
+                raise EnvironmentError("Missing FIREBASE_DB_URL in .env")
+            target = FirebaseTarget(client, stats)
+        else:
+            if not INGEST_API_KEY:
+                raise EnvironmentError("Missing INGEST_API_KEY in .env")
+            target = IngestTarget(client, stats, args.backend, args.fs)
 
-if not FIREBASE_CRED_PATH or not FIREBASE_DB_URL:
-    raise EnvironmentError("Missing Firebase config in .env (FIREBASE_CRED_PATH or FIREBASE_DB_URL)")
+        args.verbose = args.verbose or args.devices == 1
+        bank = build_waveform_bank(args.ecg_samples, args.fs)
+        devices = make_devices(args)
+        profiles = {p: sum(d.profile == p for d in devices) for p in PROFILES}
+        print(f"[INFO] Simulating {len(devices)} devices -> {args.target}, one upload every {args.interval}s "
+              f"({len(devices) / args.interval:.1f} writes/s offered), profiles {profiles}")
 
-cred = credentials.Certificate(FIREBASE_CRED_PATH)
-firebase_admin.initialize_app(cred, {'databaseURL': FIREBASE_DB_URL})
+        listener = None
+        if args.target == "firebase" and not args.no_listen:
+            ready = asyncio.Event()
+            listener = asyncio.create_task(target.listen(ready))
+            try:
+                await asyncio.wait_for(ready.wait(), 30)
+            except asyncio.TimeoutError:
+                print("[WARN] /users listener did not become ready; freshness will be empty")
 
-user_path = f"/users/{USER_ID}/realtime"
+        stop = asyncio.Event()
+        tasks = [asyncio.create_task(run_device(d, target, bank, args, stats, stop)) for d in devices]
+        last = time.perf_counter()
+        deadline = last + args.duration if args.duration else None
+        try:
+            while deadline is None or time.perf_counter() < deadline:
+                wait = args.report_every if deadline is None else min(args.report_every, deadline - time.perf_counter())
+                await asyncio.sleep(max(wait, 0))
+                now = time.perf_counter()
+                stats.report(now - last)
+                last = now
+        finally:
+            stop.set()
+            # uploads still queued on the connection pool would skew the summary; drop them
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            if listener is not None:
+                # let in-flight stream events for the last writes arrive
+                await asyncio.sleep(1.0)
+                listener.cancel()
+                await asyncio.gather(listener, return_exceptions=True)
 
-def generate_dummy_data():
-    heart_rate = random.randint(60, 100)
-    ecg_signal = [round(random.uniform(-0.5, 0.5), 3) for _ in range(50)] 
-    return {
-        "heart_rate": heart_rate,
-        "ecg_data": ecg_signal,
-        "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    }
+    summary = stats.summary(args)
+    print(json.dumps(summary, indent=2))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(summary, f, indent=2)
 
-def update_firebase():
-    ref = db.reference(user_path)
-    print(f" Sending dummy HR + ECG data to {user_path} every 60 seconds...\n")
-    while True:
-        data = generate_dummy_data()
-        ref.set(data)
-        print(f" [{datetime.now().strftime('%H:%M:%S')}] Updated Firebase with: HR={data['heart_rate']}")
-        time.sleep(60)
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--devices", type=int, default=1)
+    parser.add_argument("--target", choices=("firebase", "ingest"), default="firebase")
+    parser.add_argument("--backend", default="http://127.0.0.1:8000", help="backend base url for --target ingest")
+    parser.add_argument("--interval", type=float, default=60.0, help="seconds between uploads per device")
+    parser.add_argument("--jitter", type=float, default=0.05, help="relative jitter on the upload interval")
+    parser.add_argument("--duration", type=float, default=0, help="seconds to run, 0 = until interrupted")
+    parser.add_argument("--fs", type=float, default=float(os.getenv("ECG_SAMPLE_RATE", 50)))
+    parser.add_argument("--ecg-samples", type=int, default=50, help="ECG samples per upload")
+    parser.add_argument("--arrhythmia-rate", type=float, default=0.1, help="share of devices with an abnormal rhythm")
+    parser.add_argument("--connections", type=int, default=100)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--report-every", type=float, default=10.0)
+    parser.add_argument("--id-offset", type=int, default=0, help="first simulated device id (24-hex ObjectId)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-listen", action="store_true", help="skip the freshness listener (firebase)")
+    parser.add_argument("--json", help="write the summary to this file")
+    parser.add_argument("--verbose", action="store_true")
     try:
-        update_firebase()
+        asyncio.run(main(parser.parse_args()))
     except KeyboardInterrupt:
         print("\n Simulation stopped manually.")
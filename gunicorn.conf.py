@@ -0,0 +1,73 @@
+# Multi-worker serving mode:
+#
+#     gunicorn -c gunicorn.conf.py app.serve:app
+#
+# The master imports app.serve (model loaded, modules imported, gc frozen) and
+# then forks WEB_CONCURRENCY uvicorn workers that share those pages
+# copy-on-write. Measure with `python -m benchmarks.bench_workers`.
+#
+# Measured with that benchmark (1 CPU, Python 3.11, 4 workers, after /ready and
+# warm-up traffic; MB per worker; PSS splits shared pages between processes):
+#
+#                                    RSS     PSS   private   total PSS (incl. master)
+#   scorer cached, no preload         90      65      58        278
+#   scorer cached, preload            75      38      29        196
+#   unpickling model.pkl, no preload 200     149     133        614
+#   unpickling model.pkl, preload    150      55      32        318
+#
+# "private" is what each additional worker costs. Unpickling imports sklearn/scipy,
+# which is where preloading (and the scorer cache in MODEL_CACHE_DIR) saves most.
+#
+# Every worker has its own memory, so WEB_CONCURRENCY defaults to 1. With a single
+# worker there is nothing to share: preload and gc.freeze still run but save no
+# memory, and the numbers above only apply once WEB_CONCURRENCY>1.
+#
+# The default configuration cannot be scaled as shipped. With more workers:
+#   - OTPs must live in Mongo (OTP_STORE_BACKEND=mongo): a code sent by one worker
+#     is otherwise unknown to the one that verifies it.
+#   - /ingest must stay off (no INGEST_API_KEY): ingested frames only update the
+#     realtime snapshot and history of the worker that received them. Run device
+#     ingest on a single-worker instance instead.
+# on_starting below refuses a multi-worker start while OTP_STORE_BACKEND is memory
+# (the default) or INGEST_API_KEY is set, so both have to change before raising
+# WEB_CONCURRENCY.
+#
+# Firebase data is fine: every worker keeps its own listener and history. The
+# in-memory caches (users, reports, results) and the admission and LLM limits are
+# per worker: hit rates drop, limits multiply by the worker count, and a profile
+# edit can take up to USER_CACHE_TTL to reach the other workers.
+
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+bind = os.getenv("GUNICORN_BIND", f"0.0.0.0:{os.getenv('PORT', '8000')}")
+workers = int(os.getenv("WEB_CONCURRENCY", 1))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = os.getenv("GUNICORN_PRELOAD", "true").lower() == "true"
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 60))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", 30))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", 5))
+# recycle workers now and then so slow leaks (or un-shared pages) do not accumulate
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", 0))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", 0))
+accesslog = os.getenv("GUNICORN_ACCESS_LOG") or None
+
+
+def post_fork(server, worker):
+    if preload_app:
+        from app.serve import reset_after_fork
+        reset_after_fork()
+
+
+def on_starting(server):
+    if server.cfg.workers <= 1:
+        return
+    problems = []
+    if os.getenv("OTP_STORE_BACKEND", "memory") == "memory":
+        problems.append("OTP_STORE_BACKEND=memory keeps OTPs per worker; set OTP_STORE_BACKEND=mongo")
+    if os.getenv("INGEST_API_KEY"):
+        problems.append("/ingest updates only the receiving worker; unset INGEST_API_KEY or run 1 worker")
+    if problems:
+        raise RuntimeError(f"Refusing to start {server.cfg.workers} workers: " + "; ".join(problems))
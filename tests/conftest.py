@@ -0,0 +1,86 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# settings are read at import time, so they are pinned before any app module is imported;
+# none of the tests talk to the services configured in .env
+os.environ.update({
+    "OPENAI_API_KEY": "fake",
+    "MODEL_PATH": os.path.join(ROOT, "model.pkl"),
+    "DB_NAME": "cardio_tests",
+    "REPORT_CACHE_BACKEND": "memory",
+    "OTP_STORE_BACKEND": "memory",
+    "LLM_RETRY_BASE_DELAY": "0.01",
+})
+
+from benchmarks.fakes import openai_server
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+async def fake_openai(monkeypatch):
+    """Starts the fake OpenAI server and points the app's AsyncOpenAI client at it.
+
+    Returns the server state; tests adjust latency / fail_first on it before calling.
+    """
+    from openai import AsyncOpenAI
+    from app.core import mlllm
+
+    server, state = openai_server.start(latency=0.05, chunks=4)
+    client = AsyncOpenAI(api_key="fake", base_url=f"http://127.0.0.1:{server.server_address[1]}/v1",
+                         timeout=mlllm.LLM_TIMEOUT, max_retries=0)
+    monkeypatch.setattr(mlllm, "_client", client)
+    # a fresh limiter per test, built from whatever limits the test patched in
+    monkeypatch.setattr(mlllm, "_llm_slots", None)
+    yield state
+    await client.close()
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+async def api(monkeypatch, fake_openai):
+    """httpx client on the ASGI app, without the lifespan: an in-memory Mongo, the model loaded
+    in process, a warm (empty) realtime cache and the fake OpenAI server."""
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    import httpx
+    from app.core import database
+    from app.core.modelstore import model_store
+    from app.core.realtime import realtime_store
+    from app.main import app
+
+    monkeypatch.setattr(database, "_client", mongomock_motor.AsyncMongoMockClient())
+    await database.ensure_indexes()
+    if model_store.scorer is None:
+        model_store.load()
+    # every snapshot a test needs is written with update_local; misses never reach Firebase
+    monkeypatch.setattr(realtime_store, "_snapshots", {})
+    monkeypatch.setattr(realtime_store, "ready", True)
+    monkeypatch.setattr(realtime_store, "mode", "listen")
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        yield client
+
+
+PROFILE = dict(male=1, age=58, currentSmoker=0, cigsPerDay=0, BPMeds=0, prevalentStroke=0, prevalentHyp=1,
+               diabetes=0, totChol=230, sysBP=140, diaBP=88, BMI=27.5, glucose=90)
+
+
+@pytest.fixture
+def register(api):
+    """async register(email, **profile) -> (auth headers, user_id)"""
+    async def register(email, **profile):
+        response = await api.post("/registration", json={"email": email, "password": "secret-pw",
+                                                         **PROFILE, **profile})
+        assert response.status_code == 201, response.text
+        headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        me = await api.get("/me", headers=headers)
+        return headers, me.json()["user"]["_id"]
+    return register
@@ -0,0 +1,62 @@
+import asyncio
+from datetime import timedelta
+
+import pytest
+
+from app.core.admission import FairLimiter, Overloaded, _client_of
+from app.core.securitycore import create_access_token
+
+pytestmark = pytest.mark.anyio
+
+
+def scope_with(authorization=None, client=("10.0.0.7", 5000)):
+    headers = [(b"host", b"api")]
+    if authorization is not None:
+        headers.append((b"authorization", authorization.encode("latin-1")))
+    return {"type": "http", "headers": headers, "client": client}
+
+
+def test_client_key_is_the_verified_subject():
+    first = create_access_token({"sub": "a@example.com"})
+    second = create_access_token({"sub": "a@example.com"}, expires_delta=timedelta(minutes=5))
+
+    assert _client_of(scope_with(f"Bearer {first}")) == "user:a@example.com"
+    assert _client_of(scope_with(f"Bearer {second}", client=("10.0.0.8", 1))) == "user:a@example.com"
+
+
+@pytest.mark.parametrize("authorization", [
+    None,
+    "Bearer made-up-1",
+    "Bearer made-up-2",
+    "Basic dXNlcjpwYXNz",
+    "Bearer ",
+])
+def test_requests_without_a_valid_token_share_one_bucket(authorization):
+    assert _client_of(scope_with(authorization)) == "anonymous"
+
+
+def test_expired_token_is_anonymous():
+    token = create_access_token({"sub": "a@example.com"}, expires_delta=timedelta(minutes=-1))
+    assert _client_of(scope_with(f"Bearer {token}")) == "anonymous"
+
+
+async def test_rotating_bogus_tokens_gets_no_extra_queue_slots():
+    limiter = FairLimiter("test", limit=1, queue_size=10, timeout=1.0, per_client=2)
+    await limiter.acquire(_client_of(scope_with()))
+
+    waiters = [asyncio.create_task(limiter.acquire(_client_of(scope_with(f"Bearer bogus-{i}"))))
+               for i in range(2)]
+    await asyncio.sleep(0)
+    with pytest.raises(Overloaded) as e:
+        await limiter.acquire(_client_of(scope_with("Bearer bogus-3")))
+    assert e.value.reason == "client_queue_full"
+
+    # a real user still gets their own share of the queue
+    token = create_access_token({"sub": "b@example.com"})
+    user = asyncio.create_task(limiter.acquire(_client_of(scope_with(f"Bearer {token}"))))
+    await asyncio.sleep(0)
+    assert limiter.queued == 3
+
+    for _ in range(3):
+        limiter.release(0.01)
+    await asyncio.gather(*waiters, user)
@@ -0,0 +1,47 @@
+import time
+
+import numpy as np
+import pytest
+from bson import ObjectId
+from fastapi import encoders
+
+from app.core.timeseries import timeseries_store
+
+pytestmark = pytest.mark.anyio
+
+
+def test_framework_encoders_are_left_alone():
+    assert ObjectId not in encoders.ENCODERS_BY_TYPE
+    assert not any(issubclass(t, (np.ndarray, np.generic)) for t in encoders.ENCODERS_BY_TYPE)
+
+
+async def test_hr_history_serializes_numpy_columns(api, register):
+    headers, user_id = await register("history-hr@example.com")
+    now = int(time.time() * 1000)
+    ts = now - 60_000 * np.arange(5, 0, -1, dtype=np.int64)
+    timeseries_store.append_hr(user_id, ts, [70.0, 71.25, np.nan, 73.0, 74.5])
+
+    raw = await api.get("/history/hr", params={"resolution": "raw"}, headers=headers)
+    rollup = await api.get("/history/hr", params={"resolution": "1h"}, headers=headers)
+
+    assert raw.status_code == 200 and rollup.status_code == 200
+    body = raw.json()
+    assert body["t"] == ts.tolist()
+    assert body["values"] == [70.0, 71.2, None, 73.0, 74.5]
+    buckets = rollup.json()
+    assert buckets["resolution"] == "1h" and sum(buckets["count"]) == 5
+    assert len(buckets["max"]) == len(buckets["t"])
+
+
+async def test_ecg_history_serializes_numpy_columns(api, register):
+    headers, user_id = await register("history-ecg@example.com")
+    now = int(time.time() * 1000)
+    ts = now - 4 * np.arange(100, 0, -1, dtype=np.int64)
+    timeseries_store.series(user_id, "ecg").append(ts, np.arange(100))
+
+    response = await api.get("/history/ecg", params={"max_points": 50}, headers=headers)
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["total_samples"] == 100
+    assert body["t"] == ts[::2].tolist() and body["values"] == list(range(0, 100, 2))
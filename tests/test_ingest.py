@@ -0,0 +1,74 @@
+import pytest
+
+from app.core.ecg import synthesize_ecg
+from app.core.frames import encode_frame
+from app.core.realtime import realtime_store
+from app.routes import ingest
+
+pytestmark = pytest.mark.anyio
+
+INGEST_KEY = "test-ingest-key"
+
+
+@pytest.fixture(autouse=True)
+def ingest_key(monkeypatch):
+    monkeypatch.setattr(ingest, "INGEST_API_KEY", INGEST_KEY)
+
+
+def ecg_window():
+    return [round(float(v) * 1000) for v in synthesize_ecg(250, 50, 72, seed=3)]
+
+
+async def post_frames(api, *frames):
+    response = await api.post("/ingest", content=b"".join(frames), headers={"X-Ingest-Key": INGEST_KEY})
+    assert response.status_code == 200, response.text
+
+
+async def test_frame_without_heart_rate_leaves_it_out_of_the_snapshot(api, register, fake_openai):
+    headers, user_id = await register("no-beats@example.com")
+
+    await post_frames(api, encode_frame(user_id, 1_792_000_000_000, ecg_window(), heart_rate=None))
+
+    assert "heart_rate" not in realtime_store.snapshot(user_id)["data"]
+    body = (await api.get("/predict", headers=headers)).json()
+    assert body["heart_rate"] is None and body["prediction"] is None
+    assert fake_openai.requests == 0
+
+
+async def test_frame_with_heart_rate_is_scored(api, register, fake_openai):
+    headers, user_id = await register("beats@example.com")
+
+    await post_frames(api, encode_frame(user_id, 1_792_000_000_000, ecg_window(), heart_rate=76.5))
+
+    body = (await api.get("/predict", headers=headers)).json()
+    assert body["heart_rate"] == 76.5
+    assert 0 <= body["prediction"]["risk_probability"] <= 1
+    assert fake_openai.requests == 1
+
+
+@pytest.mark.parametrize("value", [None, float("nan"), float("inf"), "n/a"])
+async def test_predict_treats_unusable_heart_rates_as_missing(api, register, fake_openai, value):
+    headers, user_id = await register(f"bad-hr-{value}@example.com")
+    realtime_store.update_local(user_id, {"heart_rate": value, "timestamp": "2026-10-18 12:00:00"})
+
+    body = (await api.get("/predict", headers=headers)).json()
+
+    assert body["status"] == "success"
+    assert body["heart_rate"] is None and body["prediction"] is None
+    assert body["ai_report"]["diagnosis_summary"].startswith("Awaiting live heart rate")
+    assert fake_openai.requests == 0
+
+
+async def test_ecg_is_analysed_at_the_ingested_sample_rate(api, register):
+    headers, user_id = await register("fast-ecg@example.com")
+    samples = [round(float(v) * 1000) for v in synthesize_ecg(2500, 250, 72, seed=5)]
+
+    await post_frames(api, encode_frame(user_id, 1_792_000_000_000, samples, heart_rate=72, sample_hz=250))
+
+    analysis = (await api.get("/ecg", headers=headers)).json()["ecg_analysis"]
+    assert analysis["sample_rate_hz"] == 250 and analysis["duration_s"] == 10.0
+    assert abs(analysis["heart_rate_bpm"] - 72) < 3
+
+    stream = await api.get("/ecg/stream", headers=headers)
+    first = next(line for line in stream.text.splitlines() if line.startswith("data: "))
+    assert '"sample_rate_hz":250' in first
@@ -0,0 +1,95 @@
+import asyncio
+import json
+
+import openai
+import pytest
+
+from app.core import mlllm
+from app.core.admission import Overloaded
+from benchmarks.fakes.openai_server import CANNED_REPORT
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_complete_retries_server_errors(fake_openai):
+    fake_openai.fail_first = 2
+
+    response = await mlllm._complete("prompt")
+
+    assert response.output[0].content[0].text == CANNED_REPORT
+    assert fake_openai.requests == 3
+
+
+async def test_complete_gives_up_after_max_retries(fake_openai):
+    fake_openai.fail_first = mlllm.LLM_MAX_RETRIES + 1
+
+    with pytest.raises(openai.InternalServerError):
+        await mlllm._complete("prompt")
+    assert fake_openai.requests == mlllm.LLM_MAX_RETRIES + 1
+    assert mlllm.llm_queue_stats()["active"] == 0
+
+
+async def test_limiter_bounds_concurrent_calls(fake_openai, monkeypatch):
+    monkeypatch.setattr(mlllm, "LLM_MAX_CONCURRENCY", 2)
+    monkeypatch.setattr(mlllm, "LLM_QUEUE_SIZE", 16)
+    monkeypatch.setattr(mlllm, "LLM_QUEUE_PER_CLIENT", None)
+    fake_openai.latency = 0.2
+
+    await asyncio.gather(*(mlllm._complete(f"prompt {i}") for i in range(8)))
+
+    assert fake_openai.requests == 8
+    assert fake_openai.peak_active == 2
+    stats = mlllm.llm_queue_stats()
+    assert stats["admitted"] == 8 and stats["active"] == 0 and stats["queued"] == 0
+
+
+async def test_limiter_sheds_calls_beyond_the_queue(fake_openai, monkeypatch):
+    monkeypatch.setattr(mlllm, "LLM_MAX_CONCURRENCY", 1)
+    monkeypatch.setattr(mlllm, "LLM_QUEUE_SIZE", 1)
+    monkeypatch.setattr(mlllm, "LLM_QUEUE_PER_CLIENT", None)
+    fake_openai.latency = 0.2
+
+    results = await asyncio.gather(*(mlllm._complete(f"prompt {i}") for i in range(3)), return_exceptions=True)
+
+    assert sum(isinstance(r, Overloaded) for r in results) == 1
+    assert fake_openai.requests == 2
+
+
+async def test_stream_completion_yields_deltas(fake_openai):
+    deltas = [delta async for delta in mlllm.stream_completion("prompt")]
+
+    assert len(deltas) > 1
+    assert "".join(deltas) == CANNED_REPORT
+
+
+async def test_stream_completion_retries_before_first_delta(fake_openai):
+    fake_openai.fail_first = 1
+
+    deltas = [delta async for delta in mlllm.stream_completion("prompt")]
+
+    assert "".join(deltas) == CANNED_REPORT
+    assert fake_openai.requests == 2
+
+
+def parse_sse(chunks):
+    events = []
+    for block in "".join(chunks).split("\n\n"):
+        if block:
+            event, data = block.split("\n")
+            events.append((event.removeprefix("event: "), json.loads(data.removeprefix("data: "))))
+    return events
+
+
+async def test_report_stream_sends_prediction_deltas_and_done(fake_openai):
+    from app.routes.predict import stream_report_events
+
+    user_data = {"age": 61, "sysBP": 151, "test": "sse"}
+    prediction = {"risk_probability": 0.42}
+    events = parse_sse([chunk async for chunk in stream_report_events(
+        "prediction", {"prediction": prediction}, mlllm.stream_medical_report(user_data, prediction))])
+
+    names = [name for name, _ in events]
+    assert names[0] == "prediction" and names[-1] == "done"
+    assert set(names[1:-1]) == {"report_delta"}
+    assert "".join(data["delta"] for name, data in events if name == "report_delta") == CANNED_REPORT
+    assert events[-1][1] == {"ai_report": CANNED_REPORT}
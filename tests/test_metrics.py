@@ -0,0 +1,22 @@
+import pytest
+
+from app.routes import metrics
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_metrics_are_closed_without_a_token(api, monkeypatch):
+    monkeypatch.setattr(metrics, "METRICS_TOKEN", None)
+
+    response = await api.get("/metrics")
+
+    assert response.status_code == 503
+
+
+async def test_metrics_need_the_scrape_token(api, monkeypatch):
+    monkeypatch.setattr(metrics, "METRICS_TOKEN", "scrape-me")
+
+    assert (await api.get("/metrics")).status_code == 401
+    assert (await api.get("/metrics", headers={"Authorization": "Bearer wrong"})).status_code == 401
+    response = await api.get("/metrics", headers={"Authorization": "Bearer scrape-me"})
+    assert response.status_code == 200 and "admission_queued" in response.text
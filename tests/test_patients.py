@@ -0,0 +1,39 @@
+import pytest
+
+from app.core.database import users_collection
+from app.core.realtime import realtime_store
+from app.core.securitycore import invalidate_user_cache
+
+pytestmark = pytest.mark.anyio
+
+
+async def clinician(register, email="clinician@example.com"):
+    headers, _ = await register(email)
+    await users_collection().update_one({"email": email}, {"$set": {"role": "clinician"}})
+    invalidate_user_cache(email)
+    return headers
+
+
+async def test_snapshot_scores_only_usable_heart_rates(api, register):
+    headers = await clinician(register)
+    ids = []
+    for name, value in (("steady", 74), ("nan", float("nan")), ("none", None)):
+        _, user_id = await register(f"{name}@example.com")
+        realtime_store.update_local(user_id, {"heart_rate": value})
+        ids.append(user_id)
+
+    response = await api.post("/patients/snapshot", json={"user_ids": ids}, headers=headers)
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["user_id"] == ids
+    assert body["heart_rate"] == [74.0, None, None]
+    assert body["risk_probability"][0] is not None and body["risk_probability"][1:] == [None, None]
+
+
+async def test_snapshot_is_for_clinicians_only(api, register):
+    headers, user_id = await register("patient@example.com")
+
+    response = await api.post("/patients/snapshot", json={"user_ids": [user_id]}, headers=headers)
+
+    assert response.status_code == 403
@@ -0,0 +1,107 @@
+import asyncio
+import time
+
+import pytest
+
+from app.core import realtime
+from app.core.realtime import RealtimeStore
+from app.routes import predict
+
+pytestmark = pytest.mark.anyio
+
+
+class FakeRef:
+    """Stands in for a firebase_admin db.Reference; counts reads."""
+
+    def __init__(self, nodes):
+        self.nodes = nodes
+        self.reads = 0
+
+    def __call__(self, path):
+        self.path = path
+        return self
+
+    def get(self):
+        self.reads += 1
+        time.sleep(0.05)
+        return self.nodes.get(self.path)
+
+
+@pytest.fixture
+def firebase(monkeypatch):
+    ref = FakeRef({"/users/u1/realtime": {"heart_rate": 81, "timestamp": "2026-10-18 12:00:00"}})
+    monkeypatch.setattr(realtime, "_ref", ref)
+    return ref
+
+
+def use_store(monkeypatch, store):
+    monkeypatch.setattr(predict, "realtime_store", store)
+    return store
+
+
+async def test_fetch_realtime_serves_memory_without_singleflight(monkeypatch, firebase):
+    store = use_store(monkeypatch, RealtimeStore(mode="listen"))
+    store.ready = True
+    store.update_local("u2", {"heart_rate": 70})
+    started = predict.inflight.started
+
+    data, meta = await predict.fetch_realtime("u2")
+
+    assert data == {"heart_rate": 70} and meta["version"] == 1
+    assert predict.inflight.started == started
+    assert firebase.reads == 0
+
+
+async def test_fetch_realtime_shares_one_remote_read(monkeypatch, firebase):
+    store = use_store(monkeypatch, RealtimeStore(mode="listen"))
+
+    results = await asyncio.gather(*(predict.fetch_realtime("u1") for _ in range(5)))
+
+    assert firebase.reads == 1 and store.fallback_reads == 1
+    assert all(data["heart_rate"] == 81 for data, _ in results)
+    # kept for the next request
+    assert store.cached("u1")[0]["heart_rate"] == 81
+
+
+async def test_cache_off_still_serves_ingested_snapshots(firebase):
+    store = RealtimeStore(mode="off")
+    store.update_local("u2", {"heart_rate": 64})
+
+    data, meta = await store.get("u2")
+
+    assert data == {"heart_rate": 64} and meta["version"] == 1
+    assert firebase.reads == 0
+
+
+async def test_cache_off_reads_firebase_every_time(firebase):
+    store = RealtimeStore(mode="off")
+
+    for _ in range(2):
+        data, _ = await store.get("u1")
+        assert data["heart_rate"] == 81
+    assert firebase.reads == 2 and store.snapshot("u1") is None
+
+
+def device_time(seconds_ago=0):
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(time.time() - seconds_ago))
+
+
+def test_reloaded_snapshot_is_aged_by_its_device_time():
+    store = RealtimeStore(mode="listen")
+    # a restart (or poll refresh) receives every snapshot again, including long-offline devices
+    store.apply_event("put", "/", {"u1": {"realtime": {"heart_rate": 70, "timestamp": device_time(3 * 3600)}}})
+
+    _, meta = store.cached("u1")
+
+    assert meta["stale"] and meta["age_s"] > 3 * 3600 - 60
+
+
+def test_age_falls_back_to_receipt_without_a_device_time():
+    store = RealtimeStore(mode="listen")
+    store.update_local("a", {"heart_rate": 70})
+    store.update_local("b", {"heart_rate": 70, "timestamp": "not a time"})
+    store.update_local("c", {"heart_rate": 70, "timestamp": device_time(3600)})
+
+    assert not store._meta(store.snapshot("a"))["stale"]
+    assert not store._meta(store.snapshot("b"))["stale"]
+    assert store._meta(store.snapshot("c"))["stale"]
@@ -0,0 +1,64 @@
+import asyncio
+import time
+
+import pytest
+
+from app.core import realtime
+from app.core.realtime import RealtimeStore
+from benchmarks.fakes import firebase_server
+
+pytestmark = pytest.mark.anyio
+
+firebase_admin = pytest.importorskip("firebase_admin")
+
+
+def device_time(seconds_ago=0):
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(time.time() - seconds_ago))
+
+
+@pytest.fixture
+def rtdb(monkeypatch):
+    server, store = firebase_server.start(keepalive=0.2)
+    host = f"127.0.0.1:{server.server_address[1]}"
+    monkeypatch.setenv("FIREBASE_DATABASE_EMULATOR_HOST", host)
+    monkeypatch.setattr(realtime, "FIREBASE_DB_URL", f"http://{host}?ns=tests")
+    realtime.init_firebase()
+    yield store
+    firebase_admin.delete_app(firebase_admin.get_app())
+    server.shutdown()
+
+
+async def until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out waiting for the listener"
+        await asyncio.sleep(0.02)
+
+
+async def test_listener_loads_patches_and_reports_device_age(rtdb):
+    rtdb.write(["users"], {
+        "offline": {"realtime": {"heart_rate": 70, "timestamp": device_time(3 * 3600)}},
+        "live": {"realtime": {"heart_rate": 80, "timestamp": device_time()}},
+    })
+    store = RealtimeStore(mode="listen")
+    await store.start()
+    try:
+        await until(lambda: store.ready)
+
+        # the initial full load receives both just now, but only one was taken recently
+        offline, meta = store.cached("offline")
+        assert offline["heart_rate"] == 70
+        assert meta["stale"] and meta["age_s"] > 3 * 3600 - 60
+        assert not store.cached("live")[1]["stale"]
+
+        # the device comes back: its upload arrives as a patch on the realtime node
+        rtdb.write(["users", "offline", "realtime"], {"heart_rate": 75, "timestamp": device_time()}, patch=True)
+        await until(lambda: store.snapshot("offline")["data"]["heart_rate"] == 75)
+
+        data, meta = store.cached("offline")
+        assert data == {"heart_rate": 75, "timestamp": data["timestamp"]}
+        assert not meta["stale"] and meta["age_s"] < 60
+        assert store.cached("missing") == (None, store._meta(None))
+    finally:
+        await store.stop()
+
@@ -0,0 +1,39 @@
+import math
+from datetime import datetime
+
+from bson import ObjectId
+
+from app.core import riskjob
+from app.core.realtime import RealtimeStore
+from app.core.scorer import FEATURES, PROFILE_FEATURES, RiskScorer, build_feature_matrix, format_prediction
+
+
+def test_latest_heart_rates_maps_unusable_values_to_nan(monkeypatch):
+    store = RealtimeStore(mode="listen")
+    for user_id, value in (("ok", 72), ("text", "n/a"), ("none", None), ("nan", float("nan")), ("inf", float("inf"))):
+        store.update_local(user_id, {"heart_rate": value})
+    store.update_local("missing", {"ecg_data": [1, 2, 3]})
+    monkeypatch.setattr(riskjob, "realtime_store", store)
+
+    rates = riskjob.latest_heart_rates()
+
+    assert rates.pop("ok") == 72.0
+    assert set(rates) == {"text", "none", "nan", "inf", "missing"}
+    assert all(math.isnan(v) for v in rates.values())
+
+
+
+def test_stored_scores_match_live_predictions():
+    # a small weight on heart rate only, so the probabilities land between 0 and 1
+    scorer = RiskScorer([0.0] * (len(FEATURES) - 1) + [0.0123], [-0.9])
+    docs = [{"_id": ObjectId(), **{f: 0 for f in PROFILE_FEATURES}} for _ in range(3)]
+    rates = {str(doc["_id"]): hr for doc, hr in zip(docs, (61.3, 77.7, 94.1))}
+
+    ops, counts = riskjob.score_chunk(docs, rates, scorer, b"k", datetime.utcnow())
+
+    # /predict formats the scorer's probability with format_prediction
+    live = [format_prediction(p) for p in scorer.score(build_feature_matrix(docs, list(rates.values())))]
+    stored = [op._doc["$set"] for op in ops]
+    assert counts["scored"] == 3
+    for row, expected in zip(stored, live):
+        assert {key: row[key] for key in expected} == expected
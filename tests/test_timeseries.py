@@ -0,0 +1,34 @@
+import numpy as np
+
+from app.core import timeseries
+from app.core.timeseries import Series
+
+DAY_MS = 86_400_000
+
+
+def test_sealed_chunk_round_trips_gaps_longer_than_int32(monkeypatch):
+    monkeypatch.setattr(timeseries, "TS_CHUNK_SIZE", 4)
+    t0 = 1_792_000_000_000
+    ts = np.array([t0, t0 + 60_000, t0 + 40 * DAY_MS, t0 + 40 * DAY_MS + 60_000], dtype=np.int64)
+    series = Series(np.float32, rollups=())
+
+    series.append(ts, [70, 71, 72, 73])
+
+    assert len(series.chunks) == 1
+    out_ts, out_vals = series.range(t0, t0 + 41 * DAY_MS)
+    np.testing.assert_array_equal(out_ts, ts)
+    np.testing.assert_array_equal(out_vals, [70, 71, 72, 73])
+
+
+def test_regular_chunks_keep_int32_deltas(monkeypatch):
+    monkeypatch.setattr(timeseries, "TS_CHUNK_SIZE", 256)
+    t0 = 1_792_000_000_000
+    ts = t0 + 4 * np.arange(256, dtype=np.int64)
+    series = Series(np.int16, rollups=())
+
+    series.append(ts, np.arange(256))
+
+    assert series.chunks[0].delta_dtype == np.int32
+    out_ts, out_vals = series.range(t0, ts[-1])
+    np.testing.assert_array_equal(out_ts, ts)
+    np.testing.assert_array_equal(out_vals, np.arange(256))
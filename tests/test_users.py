@@ -0,0 +1,126 @@
+from datetime import datetime
+
+import pytest
+from pymongo.errors import OperationFailure, ServerSelectionTimeoutError
+
+from app.core import database
+from app.core.securitycore import invalidate_user_cache
+
+pytestmark = pytest.mark.anyio
+
+
+class FailingUsers:
+    def __init__(self, error, indexes=None):
+        self.error = error
+        self.indexes = indexes or {"_id_": {"key": [("_id", 1)]}}
+
+    async def create_index(self, *args, **kwargs):
+        raise self.error
+
+    async def index_information(self):
+        return self.indexes
+
+
+@pytest.mark.parametrize("error", [
+    OperationFailure("E11000 duplicate key error", code=11000),
+    OperationFailure("Index with name: email_unique already exists with different options", code=85),
+])
+async def test_startup_fails_when_the_unique_email_index_cannot_be_built(monkeypatch, error):
+    monkeypatch.setattr(database, "users_collection", lambda: FailingUsers(error))
+
+    with pytest.raises(RuntimeError, match="unique index"):
+        await database.ensure_indexes()
+
+
+UNAUTHORIZED = OperationFailure("not authorized on cardio to execute command { createIndexes: ... }", code=13)
+
+
+async def test_missing_create_index_privilege_uses_an_existing_index(monkeypatch):
+    indexes = {"_id_": {"key": [("_id", 1)]}, "email_1": {"key": [("email", 1)], "unique": True}}
+    monkeypatch.setattr(database, "users_collection", lambda: FailingUsers(UNAUTHORIZED, indexes))
+    monkeypatch.setattr(database, "_email_index_ready", False)
+
+    await database.ensure_indexes()
+
+    assert database.email_index_ready()
+
+
+async def test_missing_create_index_privilege_without_the_index_is_not_fatal(monkeypatch):
+    indexes = {"_id_": {"key": [("_id", 1)]}, "email_1": {"key": [("email", 1)]}}
+    monkeypatch.setattr(database, "users_collection", lambda: FailingUsers(UNAUTHORIZED, indexes))
+    monkeypatch.setattr(database, "_email_index_ready", True)
+
+    await database.ensure_indexes()
+
+    assert not database.email_index_ready()
+
+
+async def test_unreachable_mongo_leaves_the_index_unconfirmed(monkeypatch):
+    monkeypatch.setattr(database, "users_collection", lambda: FailingUsers(ServerSelectionTimeoutError("down")))
+    monkeypatch.setattr(database, "_email_index_ready", False)
+
+    await database.ensure_indexes()
+
+    assert not database.email_index_ready()
+
+
+async def test_registration_checks_duplicates_without_a_confirmed_index(api, monkeypatch):
+    # a collection without the unique index, as after a startup that could not build it
+    monkeypatch.setattr(database, "_email_index_ready", False)
+    await database.users_collection().drop_indexes()
+
+    payload = {"email": "twice@example.com", "password": "secret-pw", "male": 0, "age": 40, "currentSmoker": 0,
+               "cigsPerDay": 0, "BPMeds": 0, "prevalentStroke": 0, "prevalentHyp": 0, "diabetes": 0,
+               "totChol": 190, "sysBP": 118, "diaBP": 76, "BMI": 23.1, "glucose": 84}
+    first = await api.post("/registration", json=payload)
+    second = await api.post("/registration", json=payload)
+
+    assert first.status_code == 201
+    assert second.status_code == 400 and second.json()["detail"] == "Email already registered"
+    assert await database.users_collection().count_documents({"email": "twice@example.com"}) == 1
+
+
+async def test_me_answers_304_until_the_profile_changes(api, register):
+    headers, _ = await register("etag@example.com")
+
+    first = await api.get("/me", headers=headers)
+    etag = first.headers["etag"]
+    again = await api.get("/me", headers={**headers, "If-None-Match": etag})
+    assert again.status_code == 304 and again.headers["etag"] == etag
+
+    assert (await api.put("/update-user", json={"age": 61}, headers=headers)).status_code == 200
+    changed = await api.get("/me", headers={**headers, "If-None-Match": etag})
+    assert changed.status_code == 200 and changed.json()["user"]["age"] == 61
+    assert changed.headers["etag"] != etag
+
+    assert (await api.delete("/delete-user", headers=headers)).status_code == 200
+    gone = await api.get("/me", headers={**headers, "If-None-Match": changed.headers["etag"]})
+    assert gone.status_code == 401
+
+
+async def test_profile_responses_leave_out_server_bookkeeping(api, register):
+    email = "bookkeeping@example.com"
+    headers, _ = await register(email)
+    # what the risk job writes onto the user document
+    await database.users_collection().update_one(
+        {"email": email}, {"$set": {"risk_fingerprint": "ab12", "risk_scored_at": datetime.utcnow()}})
+    invalidate_user_cache(email)
+    internal = {"password", "risk_fingerprint", "risk_scored_at", "profile_updated_at"}
+
+    updated = (await api.put("/update-user", json={"age": 62}, headers=headers)).json()["updated_user"]
+    me = await api.get("/me", headers=headers)
+    login = await api.post("/login", json={"email": email, "password": "secret-pw"})
+
+    for user in (updated, me.json()["user"], login.json()["user"]):
+        assert user["age"] == 62 and not internal & set(user)
+    # still the source of Last-Modified
+    assert "last-modified" in me.headers
+
+
+async def test_cross_origin_clients_can_read_the_etag(api, register):
+    headers, _ = await register("browser@example.com")
+
+    response = await api.get("/me", headers={**headers, "Origin": "https://app.example.com"})
+
+    exposed = {h.strip().lower() for h in response.headers["access-control-expose-headers"].split(",")}
+    assert "etag" in exposed and response.headers["etag"]